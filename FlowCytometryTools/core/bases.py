@@ -12,8 +12,16 @@ factory methods for construction from files.
 - consider always reading in data in measurements, perhaps storing on disk
 using shelve|PyTables|pandas HDFStore
 '''
+import hashlib
 import inspect
 import os
+import warnings
+from functools import partial
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 
 import decorator
 import pylab as pl
@@ -23,11 +31,13 @@ from pandas import DataFrame as DF
 
 from FlowCytometryTools.core import graph
 from FlowCytometryTools.core.common_doc import doc_replacer
-from FlowCytometryTools.core.utils import get_tag_value, get_files, save, load, to_list
+from FlowCytometryTools.core.utils import (get_tag_value, get_files, save, load, to_list, Cache,
+                                           parallel_map)
 
 
 @doc_replacer
-def _assign_IDS_to_datafiles(datafiles, parser, measurement_class=None, **kwargs):
+def _assign_IDS_to_datafiles(datafiles, parser, measurement_class=None, meta_index=None,
+                             **kwargs):
     """
     Assign measurement IDS to datafiles using specified parser.
 
@@ -41,6 +51,8 @@ def _assign_IDS_to_datafiles(datafiles, parser, measurement_class=None, **kwargs
         Used to create a temporary object when reading the ID from the datafile.
         The measurement class needs to have an `ID_from_data` method.
         Only used when parser='read'.
+    meta_index: MetaIndex | None
+        Index used to read the metadata of the datafiles, when parser='read'.
     kwargs: dict
         Additional parameters to be passed to parser is it is a callable, or 'read'.
         If parser is 'read', kwargs are passed to the measurement class's `ID_from_data` method.
@@ -49,6 +61,16 @@ def _assign_IDS_to_datafiles(datafiles, parser, measurement_class=None, **kwargs
     -------
     Dict of ID:datafile
     """
+    fparse = _get_ID_parser(parser, measurement_class, meta_index, **kwargs)
+    d = dict((fparse(dfile), dfile) for dfile in datafiles)
+    return d
+
+
+def _get_ID_parser(parser, measurement_class=None, meta_index=None, **kwargs):
+    """
+    Return a function that gets a datafile and returns its ID.
+    See _assign_IDS_to_datafiles for a description of the parameters.
+    """
     if isinstance(parser, collections.Mapping):
         fparse = lambda x: parser[x]
     elif hasattr(parser, '__call__'):
@@ -61,11 +83,40 @@ def _assign_IDS_to_datafiles(datafiles, parser, measurement_class=None, **kwargs
     elif parser == 'number':
         fparse = lambda x: int(x.split('.')[-2])
     elif parser == 'read':
-        fparse = lambda x: measurement_class(ID='temporary', datafile=x).ID_from_data(**kwargs)
+        def fparse(x):
+            measurement = measurement_class(ID='temporary', datafile=x, readmeta=False)
+            measurement.meta_index = meta_index
+            return measurement.ID_from_data(**kwargs)
     else:
         raise ValueError('Encountered unsupported value "%s" for parser parameter.' % parser)
-    d = dict((fparse(dfile), dfile) for dfile in datafiles)
-    return d
+    return fparse
+
+
+def _load_measurement(measurement_class, readdata_kwargs, readmeta_kwargs, readdata, item):
+    """
+    Create the measurement of a datafile, reading its metadata (unless given)
+    and, if readdata is True, its data.
+
+    Parameters
+    ----------
+    item : (datafile, metadata | None)
+
+    Returns
+    -------
+    (measurement, None) if successful, and (None, exception) otherwise.
+    Module level so that it can be used with a pool of processes.
+    """
+    datafile, meta = item
+    try:
+        measurement = measurement_class('temporary', datafile=datafile, readmeta=False,
+                                        readdata_kwargs=readdata_kwargs,
+                                        readmeta_kwargs=readmeta_kwargs)
+        measurement.set_meta(meta)
+        if readdata:
+            measurement.set_data()
+        return measurement, None
+    except Exception as e:
+        return None, e
 
 
 def int2letters(x, alphabet):
@@ -97,6 +148,23 @@ def int2letters(x, alphabet):
 _now = 'apply_now'
 
 
+def _nbytes(data):
+    """ Approximate memory footprint (in bytes) of measurement data. """
+    if hasattr(data, 'memory_usage'):
+        return int(data.memory_usage(index=True).sum())
+    return getattr(data, 'nbytes', 1)
+
+
+#: Data parsed from measurement datafiles, shared by all measurements by default.
+#: Entries are keyed by datafile path, modification time, size and read parameters,
+#: so measurements of the same file share a single parsed copy (bounded to 256 MB).
+data_cache = Cache(maxsize=2 ** 28, getsizeof=_nbytes)
+
+#: Data resulting from applying queued operations to the data of datafiles, keyed by the
+#: datafile (as in data_cache) and the contents of the queue (bounded to 256 MB).
+queue_cache = Cache(maxsize=2 ** 28, getsizeof=_nbytes)
+
+
 @decorator.decorator
 def queueable(fun, *args, **kwargs):
     params = inspect.getcallargs(fun, *args, **kwargs)
@@ -166,7 +234,24 @@ class Measurement(BaseObject):
     '''
     A class for holding data from a single measurement, i.e.
     a single well or a single tube.
+
+    Data read from the datafile is not stored on the measurement (unless readdata=True
+    or set_data is called), but kept in the Cache given by the data_cache attribute
+    (the module-level bases.data_cache by default; set to None to disable caching).
+    The data held in the cache is shared: get_data returns a copy of it.
+
+    Similarly, metadata is read through the MetaIndex given by the meta_index attribute
+    (None by default, i.e., the metadata is read from the datafile).
+
+    When operations are queued (apply_now=False), the data resulting from applying them
+    to the data of the datafile is kept in the Cache given by the queue_cache attribute
+    (bases.queue_cache by default), so that it is only computed once. As for the data
+    cache, get_data returns a copy of it.
     '''
+    data_cache = data_cache
+    queue_cache = queue_cache
+    meta_index = None
+    _owns_data = True  # False while the data in memory is shared with copies
 
     def __init__(self, ID,
                  datafile=None, readdata=False, readdata_kwargs={},
@@ -178,15 +263,54 @@ class Measurement(BaseObject):
         self._meta = None
         self.readdata_kwargs = readdata_kwargs
         self.readmeta_kwargs = readmeta_kwargs
-        if readdata: self.set_data()
-        if readmeta: self.set_meta()
         self.position = {}
         self.history = []
         self.queue = []
+        if readdata: self.set_data()
+        if readmeta: self.set_meta()
 
     def _set_position(self, orderedcollection_id, pos):
         self.position[orderedcollection_id] = pos
 
+    def copy(self, deep=True):
+        '''
+        Make a copy of this measurement.
+
+        The data is shared with the copy rather than duplicated (copy-on-write).
+        Methods deriving new measurements (e.g., transform, gate) allocate new arrays only for
+        what they change, and the data is only duplicated when get_data hands it out to be
+        modified. Use copy.deepcopy to obtain a copy with independent data.
+
+        .. note::
+
+            Copying also marks the data of this measurement as shared, so that get_data
+            duplicates it before handing it out, here as well as in the copy.
+
+        Parameters
+        ----------
+        deep : boolean, default True
+            Also copy the metadata dictionary and the bookkeeping attributes (position,
+            history, queue, read kwargs), so that changes to them do not affect the
+            original measurement. The values held in the metadata are still shared.
+
+        Returns
+        -------
+        copy : type of caller
+        '''
+        from copy import copy
+        new = copy(self)
+        if self._data is not None:
+            self._owns_data = new._owns_data = False
+        if deep:
+            if self._meta is not None:
+                new._meta = copy(self._meta)
+            new.position = self.position.copy()
+            new.history = list(self.history)
+            new.queue = list(self.queue)
+            new.readdata_kwargs = self.readdata_kwargs.copy()
+            new.readmeta_kwargs = self.readmeta_kwargs.copy()
+        return new
+
     @property
     def shape(self):
         if self.data is None:
@@ -251,6 +375,7 @@ class Measurement(BaseObject):
         if data is None:
             data = self.get_data(**kwargs)
         setattr(self, '_data', data)
+        self._owns_data = True
         self.history += self.queue
         self.queue = []
 
@@ -281,20 +406,140 @@ class Measurement(BaseObject):
             value = current_value
         else:
             parser_kwargs = getattr(self, 'read%s_kwargs' % name, {})
-            value = getattr(self, 'read_%s' % name)(**parser_kwargs)
+            if name == 'data' and self.data_cache is not None:
+                value = self._read_data_cached(**parser_kwargs)
+            elif name == 'meta' and self.meta_index is not None:
+                value = self._read_meta_indexed(**parser_kwargs)
+            else:
+                value = getattr(self, 'read_%s' % name)(**parser_kwargs)
         return value
 
+    def _datafile_key(self, **kwargs):
+        '''
+        Key identifying the data read from the datafile with the given read parameters.
+        None if the datafile cannot be accessed or the parameters are not hashable.
+        '''
+        try:
+            stat = os.stat(self.datafile)
+        except (TypeError, OSError):
+            return None
+        key = (type(self).__name__, os.path.abspath(self.datafile),
+               stat.st_mtime, stat.st_size, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _read_data_cached(self, **kwargs):
+        '''
+        Read the data using self.read_data, going through self.data_cache.
+        '''
+        key = self._datafile_key(**kwargs)
+        if key is None:
+            return self.read_data(**kwargs)
+        data = self.data_cache.get(key)
+        if data is None:
+            data = self.read_data(**kwargs)
+            if data is not None:
+                self.data_cache.put(key, data)
+        return data
+
+    def _meta_params(self, **kwargs):
+        '''
+        String describing the parameters used to read the metadata (see MetaIndex).
+        '''
+        return repr((type(self).__name__, sorted(kwargs.items())))
+
+    def _read_meta_indexed(self, **kwargs):
+        '''
+        Read the metadata using self.read_meta, going through self.meta_index.
+        '''
+        params = self._meta_params(**kwargs)
+        meta = self.meta_index.get(self.datafile, params)
+        if meta is None:
+            meta = self.read_meta(**kwargs)
+            if meta is not None:
+                self.meta_index.put(self.datafile, meta, params)
+        return meta
+
     def get_data(self, **kwargs):
         '''
         Get the measurement data.
         If data is not set, read from 'self.datafile' using 'self.read_data'.
+
+        Data that is shared (with copies of the measurement, or held in the data cache
+        or the queue cache) is copied, so that the data returned can be modified in place.
+        '''
+        data = self._get_shared_data(**kwargs)
+        if data is not None and hasattr(data, 'copy') and self._data_is_shared():
+            data = data.copy()
+            if self._data is not None and not self.queue:
+                self.set_data(data)  # Keep the private copy
+        return data
+
+    def _get_shared_data(self, **kwargs):
+        '''
+        Get the measurement data without copying it: it may be shared with other
+        measurements or held in a cache, and must not be modified in place.
         '''
         if self.queue:
-            new = self.apply_queued()
-            return new.get_data()
+            return self._get_queued_data()
         else:
             return self._get_attr_from_file('data', **kwargs)
 
+    def _data_is_shared(self):
+        '''
+        Whether the data returned by _get_shared_data may be shared (see get_data).
+        '''
+        if self.queue:
+            return True  # e.g., held in the queue cache
+        if self._data is not None:
+            return not self._owns_data
+        return self.data_cache is not None
+
+    def _queue_key(self):
+        '''
+        Key identifying the result of applying the queued operations to the data of the
+        datafile. None if the data is not read from the datafile, if the queue holds
+        random operations, or if it cannot be pickled.
+        '''
+        if not self._data_from_file():
+            return None
+        source = self._datafile_key(**self.readdata_kwargs)
+        if source is None:
+            return None
+        for name, params in self.queue:
+            if name == 'subsample' and params.get('order', 'random') == 'random' and \
+                    not isinstance(params.get('key'), (slice, tuple)):
+                return None
+        try:
+            queue = pickle.dumps(self.queue, protocol=2)
+        except Exception:  # e.g., lambdas
+            return None
+        return source + (hashlib.sha1(queue).hexdigest(),)
+
+    def _data_from_file(self):
+        '''
+        Whether the data (that the queued operations are applied to) is the data read
+        from the datafile, rather than data in memory.
+        '''
+        return self._data is None
+
+    def _get_queued_data(self):
+        '''
+        The data resulting from applying the queued operations, going through self.queue_cache.
+        '''
+        key = self._queue_key() if self.queue_cache is not None else None
+        if key is not None:
+            data = self.queue_cache.get(key)
+            if data is not None:
+                return data
+        data = self.apply_queued()._get_shared_data()
+        if key is not None and data is not None:
+            self.queue_cache.put(key, data)
+        return data
+
     def get_meta(self, **kwargs):
         '''
         Get the measurement metadata.
@@ -363,6 +608,11 @@ class Measurement(BaseObject):
 
 Well = Measurement
 
+
+def _apply_to_measurement(measurement, func, applyto, noneval, setdata):
+    """ Module level (and hence picklable) helper used by MeasurementCollection.apply. """
+    return measurement.apply(func, applyto, noneval, setdata)
+
 import collections
 
 
@@ -388,15 +638,75 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
         '''
         self.ID = ID
         self.data = {}
+        self.load_errors = {}
         if isinstance(measurements, collections.Mapping):
             self.update(measurements)
         else:
             for m in measurements:
                 self[m.ID] = m
 
+    @classmethod
+    def _measurements_from_files(cls, datafiles, parser, readdata_kwargs, readmeta_kwargs,
+                                 meta_index=None, ID_kwargs={}, readdata=False, n_jobs=-1,
+                                 executor='thread', errors='raise'):
+        """
+        Create the measurements of a set of data files (see from_files).
+
+        Returns
+        -------
+        (list of measurements, dict of datafile:exception for the files that failed)
+        """
+        if errors not in ('raise', 'skip'):
+            raise ValueError("errors must be 'raise' or 'skip'. %s given." % repr(errors))
+        datafiles = list(datafiles)
+        metas = [None] * len(datafiles)
+        if meta_index is not None:
+            params = cls._measurement_class('temporary', readmeta=False,
+                                            readdata_kwargs=readdata_kwargs,
+                                            readmeta_kwargs=readmeta_kwargs
+                                            )._meta_params(**readmeta_kwargs)
+            metas = [meta_index.get(dfile, params) for dfile in datafiles]
+
+        # Parse the files concurrently (only the metadata, unless readdata is True)
+        load = partial(_load_measurement, cls._measurement_class, readdata_kwargs,
+                       readmeta_kwargs, readdata)
+        loaded = parallel_map(load, zip(datafiles, metas), n_jobs=n_jobs, executor=executor)
+        if meta_index is not None:
+            meta_index.put_many([(dfile, m.meta) for dfile, meta, (m, _) in
+                                 zip(datafiles, metas, loaded) if meta is None and m is not None],
+                                params)
+
+        if parser != 'read':
+            fparse = _get_ID_parser(parser, cls._measurement_class, **ID_kwargs)
+        load_errors = {}
+        d = {}
+        for dfile, (measurement, error) in zip(datafiles, loaded):
+            if error is None:
+                try:
+                    if parser == 'read':
+                        measurement.ID = measurement.ID_from_data(**ID_kwargs)
+                    else:
+                        measurement.ID = fparse(dfile)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                if errors == 'raise':
+                    msg = 'Error occurred while trying to parse file: %s (%r)' % (dfile, error)
+                    raise IOError(msg)
+                load_errors[dfile] = error
+                continue
+            measurement.meta_index = meta_index
+            d[measurement.ID] = measurement
+        if load_errors:
+            warnings.warn('%d of %d files could not be loaded (see load_errors).'
+                          % (len(load_errors), len(datafiles)))
+        return list(d.values()), load_errors
+
     @classmethod
     @doc_replacer
-    def from_files(cls, ID, datafiles, parser, readdata_kwargs={}, readmeta_kwargs={}, **ID_kwargs):
+    def from_files(cls, ID, datafiles, parser, readdata_kwargs={}, readmeta_kwargs={},
+                   meta_index=None, readdata=False, n_jobs=-1, executor='thread',
+                   errors='raise', **ID_kwargs):
         """
         Create a Collection of measurements from a set of data files.
 
@@ -405,24 +715,22 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
         {_bases_ID}
         {_bases_data_files}
         {_bases_filename_parser}
+        {_bases_meta_index}
+        {_bases_load_pars}
         {_bases_ID_kwargs}
         """
-        d = _assign_IDS_to_datafiles(datafiles, parser, cls._measurement_class, **ID_kwargs)
-        measurements = []
-        for sID, dfile in d.items():
-            try:
-                measurements.append(cls._measurement_class(sID, datafile=dfile,
-                                                           readdata_kwargs=readdata_kwargs,
-                                                           readmeta_kwargs=readmeta_kwargs))
-            except:
-                msg = 'Error occurred while trying to parse file: %s' % dfile
-                raise IOError(msg)
-        return cls(ID, measurements)
+        measurements, load_errors = cls._measurements_from_files(
+            datafiles, parser, readdata_kwargs, readmeta_kwargs, meta_index, ID_kwargs,
+            readdata=readdata, n_jobs=n_jobs, executor=executor, errors=errors)
+        new = cls(ID, measurements)
+        new.load_errors = load_errors
+        return new
 
     @classmethod
     @doc_replacer
     def from_dir(cls, ID, datadir, parser, pattern='*.fcs', recursive=False,
-                 readdata_kwargs={}, readmeta_kwargs={}, **ID_kwargs):
+                 readdata_kwargs={}, readmeta_kwargs={}, meta_index=None, readdata=False,
+                 n_jobs=-1, executor='thread', errors='raise', **ID_kwargs):
         """
         Create a Collection of measurements from data files contained in a directory.
 
@@ -437,12 +745,15 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
         recursive : bool
             Recursively look for files matching pattern in subdirectories.
         {_bases_filename_parser}
+        {_bases_meta_index}
+        {_bases_load_pars}
         {_bases_ID_kwargs}
         """
         datafiles = get_files(datadir, pattern, recursive)
         return cls.from_files(ID, datafiles, parser,
                               readdata_kwargs=readdata_kwargs, readmeta_kwargs=readmeta_kwargs,
-                              **ID_kwargs)
+                              meta_index=meta_index, readdata=readdata, n_jobs=n_jobs,
+                              executor=executor, errors=errors, **ID_kwargs)
 
     # ----------------------
     # MutableMapping methods
@@ -470,11 +781,35 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
     def __len__(self):
         return len(self.data)
 
+    def copy(self, deep=True):
+        """
+        Make a copy of this collection.
+
+        Parameters
+        ----------
+        deep : boolean, default True
+            If True, the measurements are copied as well (see Measurement.copy;
+            their data is shared until modified).
+            If False, the copy holds the same measurement objects.
+
+        Returns
+        -------
+        copy : type of caller
+        """
+        from copy import copy
+        new = copy(self)
+        if deep:
+            new.data = dict((k, v.copy()) for k, v in self.data.items())
+        else:
+            new.data = self.data.copy()
+        return new
+
     # ----------------------
     # User methods
     # ----------------------
+    @doc_replacer
     def apply(self, func, ids=None, applyto='measurement', noneval=nan,
-              setdata=False, output_format='dict', ID=None,
+              setdata=False, output_format='dict', ID=None, n_jobs=None, executor='thread',
               **kwargs):
         '''
         Apply func to each of the specified measurements.
@@ -498,6 +833,8 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
             * collection : keeps result as collection
             WARNING: For collection, func should return a copy of the measurement instance rather
             than the original measurement instance.
+        {_bases_parallel_pars}
+
         Returns
         -------
         Dictionary keyed by measurement keys containing the corresponding output of func
@@ -507,7 +844,11 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
             ids = self.keys()
         else:
             ids = to_list(ids)
-        result = dict((i, self[i].apply(func, applyto, noneval, setdata)) for i in ids)
+        call = partial(_apply_to_measurement, func=func, applyto=applyto, noneval=noneval,
+                       setdata=setdata)
+        ids = list(ids)
+        results = parallel_map(call, [self[i] for i in ids], n_jobs, executor, keys=ids)
+        result = dict(zip(ids, results))
 
         if output_format == 'collection':
             can_keep_as_collection = all(
@@ -533,6 +874,34 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
             # Return a dictionary
             return result
 
+    def set_data_cache(self, cache, ids=None):
+        """
+        Set the cache used by the specified measurements (all if None given)
+        to hold the data read from their datafiles.
+
+        Parameters
+        ----------
+        cache : Cache | None
+            For example, Cache(maxsize=2 ** 30, getsizeof=bases._nbytes, policy='lfu')
+            shares up to 1GB of parsed data between the measurements of the collection.
+            If None, caching is disabled and data is read from file on every access.
+        """
+        fun = lambda x: setattr(x, 'data_cache', cache)
+        self.apply(fun, ids=ids, applyto='measurement')
+
+    def set_meta_index(self, meta_index, ids=None):
+        """
+        Set the MetaIndex through which the specified measurements (all if None given)
+        read their metadata.
+
+        Parameters
+        ----------
+        meta_index : MetaIndex | None
+            If None, metadata is read from the datafiles.
+        """
+        fun = lambda x: setattr(x, 'meta_index', meta_index)
+        self.apply(fun, ids=ids, applyto='measurement')
+
     def set_data(self, ids=None):
         """
         Set the data for all specified measurements (all if None given).
@@ -663,7 +1032,40 @@ class MeasurementCollection(collections.MutableMapping, BaseObject):
         return self.filter_by_attr('ID', fil, ID)
 
     def filter_by_meta(self, criteria, ID=None):
-        raise NotImplementedError
+        """
+        Keep only Measurements whose metadata matches the criteria.
+
+        Parameters
+        ----------
+        criteria : callable | mapping
+            callable : gets the metadata (dict) of a measurement and returns bool.
+            mapping  : field:value. Keeps measurements for which each field is equal to
+                       the value (or, if the value is callable, for which value(field value)
+                       returns True).
+        ID : str
+            ID of the filtered collection.
+            If None is given, the ID of the current collection is used.
+
+        Examples
+        --------
+        >>> plate.filter_by_meta({'$CYT': 'FACSCanto II', '$TOT': lambda x: int(x) > 1000})
+        """
+        if isinstance(criteria, collections.Mapping):
+            fields = criteria
+
+            def criteria(meta):
+                for field, value in fields.items():
+                    if field not in meta:
+                        return False
+                    if hasattr(value, '__call__'):
+                        if not value(meta[field]):
+                            return False
+                    elif meta[field] != value:
+                        return False
+                return True
+
+        fil = lambda x: criteria(x.get_meta())
+        return self.filter(fil, applyto='measurement', ID=ID)
 
     def filter_by_rows(self, rows, ID=None):
         """
@@ -750,7 +1152,8 @@ class OrderedCollection(MeasurementCollection):
     @doc_replacer
     def from_files(cls, ID, datafiles, parser='name',
                    position_mapper=None,
-                   readdata_kwargs={}, readmeta_kwargs={}, ID_kwargs={}, **kwargs):
+                   readdata_kwargs={}, readmeta_kwargs={}, ID_kwargs={}, meta_index=None,
+                   readdata=False, n_jobs=-1, executor='thread', errors='raise', **kwargs):
         """
         Create an OrderedCollection of measurements from a set of data files.
 
@@ -761,6 +1164,8 @@ class OrderedCollection(MeasurementCollection):
         {_bases_filename_parser}
         {_bases_position_mapper}
         {_bases_ID_kwargs}
+        {_bases_meta_index}
+        {_bases_load_pars}
         kwargs : dict
             Additional key word arguments to be passed to constructor.
         """
@@ -770,24 +1175,20 @@ class OrderedCollection(MeasurementCollection):
             else:
                 msg = "When using a custom parser, you must specify the position_mapper keyword."
                 raise ValueError(msg)
-        d = _assign_IDS_to_datafiles(datafiles, parser, cls._measurement_class, **ID_kwargs)
-        measurements = []
-        for sID, dfile in d.items():
-            try:
-                measurements.append(cls._measurement_class(sID, datafile=dfile,
-                                                           readdata_kwargs=readdata_kwargs,
-                                                           readmeta_kwargs=readmeta_kwargs))
-            except:
-                msg = 'Error occured while trying to parse file: %s' % dfile
-                raise IOError(msg)
-        return cls(ID, measurements, position_mapper, **kwargs)
+        measurements, load_errors = cls._measurements_from_files(
+            datafiles, parser, readdata_kwargs, readmeta_kwargs, meta_index, ID_kwargs,
+            readdata=readdata, n_jobs=n_jobs, executor=executor, errors=errors)
+        new = cls(ID, measurements, position_mapper, **kwargs)
+        new.load_errors = load_errors
+        return new
 
     @classmethod
     @doc_replacer
     def from_dir(cls, ID, path,
                  parser='name',
                  position_mapper=None, pattern='*.fcs', recursive=False,
-                 readdata_kwargs={}, readmeta_kwargs={}, ID_kwargs={}, **kwargs):
+                 readdata_kwargs={}, readmeta_kwargs={}, ID_kwargs={}, meta_index=None,
+                 readdata=False, n_jobs=-1, executor='thread', errors='raise', **kwargs):
         """
         Create a Collection of measurements from data files contained in a directory.
 
@@ -803,13 +1204,16 @@ class OrderedCollection(MeasurementCollection):
         {_bases_filename_parser}
         {_bases_position_mapper}
         {_bases_ID_kwargs}
+        {_bases_meta_index}
+        {_bases_load_pars}
         kwargs : dict
             Additional key word arguments to be passed to constructor.
         """
         datafiles = get_files(path, pattern, recursive)
         return cls.from_files(ID, datafiles, parser=parser, position_mapper=position_mapper,
                               readdata_kwargs=readdata_kwargs, readmeta_kwargs=readmeta_kwargs,
-                              ID_kwargs=ID_kwargs, **kwargs)
+                              ID_kwargs=ID_kwargs, meta_index=meta_index, readdata=readdata,
+                              n_jobs=n_jobs, executor=executor, errors=errors, **kwargs)
 
     def set_labels(self, labels, axis='rows'):
         '''
@@ -919,6 +1323,15 @@ class OrderedCollection(MeasurementCollection):
             self._positions[k] = pos
             self[k]._set_position(self.ID, pos)
 
+    def copy(self, deep=True):
+        new = super(OrderedCollection, self).copy(deep)
+        new._positions = self._positions.copy()
+        new.row_labels = list(self.row_labels)
+        new.col_labels = list(self.col_labels)
+        return new
+
+    copy.__doc__ = MeasurementCollection.copy.__doc__
+
     def get_positions(self, copy=True):
         '''
         Get a dictionary of measurement positions.
@@ -961,9 +1374,10 @@ class OrderedCollection(MeasurementCollection):
     def shape(self):
         return (len(self.row_labels), len(self.col_labels))
 
+    @doc_replacer
     def apply(self, func, ids=None, applyto='measurement',
               output_format='DataFrame', noneval=nan,
-              setdata=False, dropna=False, ID=None):
+              setdata=False, dropna=False, ID=None, n_jobs=None, executor='thread'):
         """
         Apply func to each of the specified measurements.
 
@@ -989,6 +1403,7 @@ class OrderedCollection(MeasurementCollection):
             ID is used as the new ID for the collection.
             If None, then the old ID is retained.
             Note: Only applicable when output is a collection.
+        {_bases_parallel_pars}
 
         Returns
         -------
@@ -997,7 +1412,8 @@ class OrderedCollection(MeasurementCollection):
         _output = 'collection' if output_format == 'collection' else 'dict'
         result = super(OrderedCollection, self).apply(func, ids, applyto,
                                                       noneval, setdata,
-                                                      output_format=_output)
+                                                      output_format=_output, ID=ID,
+                                                      n_jobs=n_jobs, executor=executor)
 
         # Note: result should be of type dict or collection for the code
         # below to work
@@ -1082,7 +1498,8 @@ class OrderedCollection(MeasurementCollection):
 
         for ID in ids:
             measurement = self[ID]
-            if not hasattr(measurement, 'data'):
+            # Checked on the type, so that the data is not read just to check for it
+            if not hasattr(type(measurement), 'data'):
                 continue
 
             row, col = self._positions[ID]
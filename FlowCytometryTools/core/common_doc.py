@@ -81,6 +81,39 @@ ID_kwargs: dict
     Additional parameters to be used when assigning IDs.
     Passed to '_assign_IDS_to_datafiles' method.""",
 
+_bases_meta_index="""\
+meta_index : MetaIndex | None
+    Index holding the metadata of the data files (see meta_index.MetaIndex).
+    Files missing from the index are read concurrently and added to it; the others
+    are not opened. If None, the metadata is read from each file.""",
+
+_bases_load_pars="""\
+readdata : bool
+    Also read the data of the files (in the same pass as the metadata).
+n_jobs : int | None
+    Number of files parsed concurrently. -1 (default) uses one worker per CPU;
+    None or 1 parses the files serially.
+executor : ['thread' | 'process' | executor]
+    How files are fanned out when n_jobs > 1 (see apply). Threads by default.
+errors : ['raise' | 'skip']
+    * 'raise' : raise an IOError for the first file that cannot be parsed.
+    * 'skip' : leave out the files that cannot be parsed. The exceptions are kept in
+      the load_errors attribute of the collection (a dict of datafile:exception).""",
+
+_bases_parallel_pars="""\
+n_jobs : int | None
+    Number of measurements processed concurrently.
+    None or 1 processes the measurements serially; -1 uses one worker per CPU.
+executor : ['thread' | 'process' | executor]
+    How measurements are fanned out when n_jobs > 1.
+
+    * 'thread' : a pool of threads (suited for I/O bound work, e.g., parsing files).
+    * 'process' : a pool of processes (suited for CPU bound work, e.g., transformations).
+      The function and measurements must be picklable, and changes that the function makes
+      to the measurements (e.g., setdata=True) are not seen by the caller.
+    * executor : any object with a ``map(func, iterable)`` method that preserves ordering
+      (e.g., a multiprocessing pool or a concurrent.futures executor).""",
+
 _gate_available_classes="""\
 [:class:`~FlowCytometryTools.ThresholdGate` | :class:`~FlowCytometryTools.IntervalGate` | \
 :class:`~FlowCytometryTools.QuadGate` | :class:`~FlowCytometryTools.PolyGate` | \
@@ -94,7 +127,7 @@ gates : [None | Gate | iterable of Gate]
     The gates are applied by default.""",
 
 FCMeasurement_transform_pars="""\
-transform : ['hlog' | 'tlog' | 'glog' | callable]
+transform : ['hlog' | 'tlog' | 'glog' | 'logicle' | callable]
     Specifies the transformation to apply to the data.
 
     * callable : a callable that does a transformation (should accept a number or array), or one of the supported named transformations.
@@ -120,6 +153,11 @@ auto_range : bool
 use_spln : bool
     If True th transform is done using a spline.
     See Transformation.transform for more details.
+use_lut : bool
+    If True, channels stored as integers ($DATATYPE = I) of up to 20 bits are transformed
+    with a lookup table of the transformation over all their possible values (exact, and
+    faster than evaluating the transformation). Takes precedence over use_spln for these
+    channels. See Transformation.lut for more details.
 get_transformer : bool
     If True the transformer is returned in addition to the new Measurement.
 args :
@@ -134,6 +172,77 @@ FCMeasurement_transform_examples="""\
 >>> trans = original.transform('hlog', r=1000, use_spln=True, get_transformer=True)
 >>> trans = original.transform('hlog', channels=['FSC-A', 'SSC-A'], b=500).transform('hlog', channels='B1-A', b=100)""",
 
+FCCollection_spline_range_pars="""\
+spline_range : 'auto' | 'meta' | 'data' | (xmin, xmax)
+    Range over which shared splines are fitted (if share_transform and use_spln).
+
+    * 'meta' : the range of values given by $PnR (no data is read): [0, 2 ** bits - 1] for
+      channels stored as integers, [-$PnR, $PnR] for channels stored as floats (whose values
+      may lie outside of it, and are then extrapolated by the spline).
+      Only available for measurements to which no operation was applied.
+    * 'data' : the minimum and maximum of the data of all measurements. For data read from
+      the datafiles, these are computed in a single pass and kept in
+      containers.extremes_cache.
+    * 'auto' : 'meta' for the measurements stored as integers for which it is available
+      (their values cannot lie outside of it), 'data' for the others.
+    * (xmin, xmax) : the given range.""",
+
+FCMeasurement_transform_channels_pars="""\
+transforms : dict
+    Mapping of channel name to the transformation of the channel, given as:
+
+    * Transformation : used as is.
+    * str | callable : a named transformation (see Transformation) or a callable, with
+      default parameters.
+    * (str | callable, dict) : a named transformation or a callable, with the parameters
+      given in the dict.
+
+    With auto_range, the range parameter of named transformations ('d' for hlog and tlog,
+    'T' for logicle) is set from the $PnR of each channel.
+direction : ['forward' | 'inverse']
+    Direction of the transformations that are not given as a Transformation.
+return_all : bool
+    True -  return all columns, with specified ones transformed.
+    False - return only specified columns.
+auto_range : bool
+    If True data range (machine range) of each channel is extracted from the $PnR field of
+    the metadata.
+use_spln : bool
+    If True the transforms are done using splines.
+    See Transformation.transform for more details.
+use_lut : bool
+    If True, channels stored as integers ($DATATYPE = I) of up to 20 bits are transformed
+    with a lookup table. See the use_lut parameter of transform.""",
+
+FCMeasurement_transform_channels_examples="""\
+>>> trans = original.transform_channels({{'FSC-A': 'hlog', 'SSC-A': ('hlog', {{'b': 100}}),
+...                                       'B1-A': 'logicle', 'Time': 'tlog'}})
+>>> trans = original.transform_channels({{'B1-A': Transformation('logicle', T=2**18, W=1)}})""",
+
+FCMeasurement_compensate_pars="""\
+spillover : DataFrame | None
+    Spillover matrix, giving for each fluorochrome (rows) the fraction of its signal detected
+    in each channel (columns), with channel names as index and columns
+    (see compensation.parse_spillover).
+    If None, the matrix is read from the metadata ($SPILLOVER, SPILL or $SPILL keyword).""",
+
+FCCollection_stats_pars="""\
+channels : str | list of str | None
+    Names of the channels. If None all channels are used.
+stats : list of str
+    Statistics to compute, among 'count', 'mean', 'std', 'cv' (std / mean), 'min', 'max',
+    'median' and 'p<q>' for the q-th percentile (e.g., 'p5', 'p97.5').
+    NaN values are ignored.
+gate : Gate | None
+    If given, the statistics are computed over the events in the gate.
+approximate : bool
+    If True, each datafile is read in chunks (in bounded memory), and the median and
+    percentiles are approximated with quantile sketches (see stats.QuantileSketch).
+    A column 'rank_error' gives the bound on their normalized rank error.
+    If False, the values of each channel are held in memory, and the statistics are exact.
+k : int
+    Size of the quantile sketches (if approximate). The rank error decreases as about 1 / k.""",
+
 FCMeasurement_subsample_parameters="""\
 key : [int | float | tuple | slice]
     When key is a single number, it specifies a number/fraction of events
@@ -0,0 +1,99 @@
+"""
+Spillover compensation.
+
+The spillover matrix of a measurement (stored in its metadata under $SPILLOVER in FCS 3.1,
+or under SPILL or $SPILL by some instruments) gives, for each fluorochrome (rows), the
+fraction of its signal that is detected in each channel (columns). Compensated values are
+obtained by multiplying the observed values of these channels by the inverse of the matrix.
+"""
+from __future__ import division
+
+import numpy
+from pandas import DataFrame
+
+from FlowCytometryTools.core.utils import Cache
+
+#: Metadata keywords that may hold the spillover matrix, in order of preference.
+spillover_keywords = ('$SPILLOVER', 'SPILL', '$SPILL', 'SPILLOVER')
+
+#: Inverses of spillover matrices, keyed by the channels and the values of the matrix.
+inverse_cache = Cache(maxsize=256)
+
+
+def parse_spillover(text):
+    """
+    Parse the value of a spillover keyword: the number of channels n, followed by the names
+    of the n channels and by the n * n values of the matrix (row by row), separated by commas.
+
+    Returns
+    -------
+    DataFrame
+        The spillover matrix, indexed by channel name (in both dimensions).
+    """
+    fields = [f.strip() for f in text.split(',')]
+    try:
+        n = int(fields[0])
+        if len(fields) != 1 + n + n * n:
+            raise ValueError
+        values = numpy.array(fields[n + 1:], dtype=float).reshape(n, n)
+    except ValueError:
+        raise ValueError('Invalid spillover matrix: {0}'.format(text))
+    channels = fields[1:n + 1]
+    return DataFrame(values, index=channels, columns=channels)
+
+
+def get_spillover(meta):
+    """
+    The spillover matrix found in the metadata of a measurement (see parse_spillover),
+    or None if there is none.
+    """
+    keywords = dict((k.upper(), k) for k in meta if hasattr(k, 'upper'))
+    for keyword in spillover_keywords:
+        text = meta.get(keywords.get(keyword))
+        if text and text.strip() and text.strip() != '0':
+            return parse_spillover(text)
+    return None
+
+
+def inverse(spillover):
+    """
+    The inverse of a spillover matrix (a DataFrame, see parse_spillover).
+    Inverses are cached, so that measurements sharing a matrix only invert it once.
+    """
+    values = numpy.ascontiguousarray(spillover.values, dtype=float)
+    key = (tuple(spillover.columns), values.shape, values.tobytes())
+    result = inverse_cache.get(key)
+    if result is None:
+        result = numpy.linalg.inv(values)
+        inverse_cache.put(key, result)
+    return result
+
+
+def compensate(columns, inverse, chunksize=2 ** 16):
+    """
+    Compensate the values of the channels of a spillover matrix.
+
+    Parameters
+    ----------
+    columns : list of arrays
+        Values of the channels, in the order of the spillover matrix.
+    inverse : 2d array
+        Inverse of the spillover matrix.
+    chunksize : int
+        Number of events compensated by each matrix product
+        (bounds the size of the temporary arrays).
+
+    Returns
+    -------
+    2d array (events x channels, in Fortran order) of compensated values.
+    """
+    num_events = len(columns[0]) if columns else 0
+    out = numpy.empty((num_events, len(columns)), order='F')
+    block = numpy.empty((min(chunksize, num_events), len(columns)))
+    for start in range(0, num_events, chunksize):
+        stop = min(start + chunksize, num_events)
+        chunk = block[:stop - start]
+        for j, values in enumerate(columns):
+            chunk[:, j] = values[start:stop]
+        out[start:stop] = chunk.dot(inverse)
+    return out
@@ -3,28 +3,71 @@ from __future__ import absolute_import
 import collections
 import inspect
 import warnings
+from functools import partial
 from itertools import cycle
 from random import sample
 
 import matplotlib
 import numpy as np
 from fcsparser import parse as parse_fcs
-from pandas import DataFrame
+from pandas import DataFrame, Series, concat
 
 import FlowCytometryTools.core.graph as graph
+from FlowCytometryTools.core import compensation, fcs_io, store
 from FlowCytometryTools.core.bases import (Measurement, MeasurementCollection, OrderedCollection,
                                            queueable)
 from FlowCytometryTools.core.common_doc import doc_replacer
 from FlowCytometryTools.core.graph import plot_ndpanel
-from FlowCytometryTools.core.transforms import Transformation
-from FlowCytometryTools.core.utils import to_list
+from FlowCytometryTools.core.planner import depends_on_events, plan_queue
+from FlowCytometryTools.core.stats import (QuantileSketch, RunningStats, extremes, summarize,
+                                           summarize_chunks)
+from FlowCytometryTools.core.transforms import Transformation, max_lut_bits
+from FlowCytometryTools.core.utils import Cache, to_list
+from FlowCytometryTools.core.views import EventView
+
+
+#: Minimum and maximum of the channels of datafiles (see FCMeasurement._channel_range),
+#: keyed by the data cache key of the datafile and the channel.
+extremes_cache = Cache(maxsize=2 ** 16)
+
+
+def _set_range_kwargs(transform, data_range, kwargs):
+    """
+    Set the range parameter of the named transformations that have one
+    ('d' for hlog and tlog, 'T' for logicle) from the data range of a channel ($PnR).
+    """
+    if transform in {'hlog', 'tlog', 'hlog_inv', 'tlog_inv'}:
+        # Hacky fix to make sure that 'd' is provided only
+        # for hlog / tlog transformations
+        kwargs['d'] = np.log10(data_range)
+    elif transform in {'logicle', 'logicle_inv'}:
+        # A top of scale given by the user takes precedence
+        kwargs.setdefault('T', data_range)
+
+
+def _integer_bits(info):
+    """
+    Number of bits holding the values of a channel stored as integers ($DATATYPE = I),
+    given the row of the channel in FCMeasurement.channels.
+    Values are masked to the bits needed for $PnR (see fcs_io.DataLayout).
+    """
+    return min(int(info['$PnB']), int(np.ceil(np.log2(float(info['$PnR'])))))
 
 
 class FCMeasurement(Measurement):
     """
     A class for holding flow cytometry data from
     a single well or a single tube.
+
+    Measurements derived from this one (e.g., by transform) share its event data
+    through an EventView, which holds new arrays only for the channels that changed.
+
+    With readdata_kwargs={'memory_map': True}, the DATA segment of the datafile is
+    mapped into memory instead of being parsed, and values are only read for the
+    channels and events that are accessed (e.g., counts reads nothing and gating
+    reads the channels of the gate). The data attribute still returns a DataFrame.
     """
+    _view = None
 
     @property
     def channels(self):
@@ -38,7 +81,7 @@ class FCMeasurement(Measurement):
         if self.meta is not None:
             return self.meta['_channel_names_']
 
-    def read_data(self, **kwargs):
+    def read_data(self, channels=None, **kwargs):
         '''
         Read the datafile specified in Sample.datafile and
         return the resulting object.
@@ -46,10 +89,337 @@ class FCMeasurement(Measurement):
 
         It's advised not to use this method, but instead to access
         the data through the FCMeasurement.data attribute.
+
+        Parameters
+        ----------
+        channels : list of str | None
+            Channels to read. If None, all channels are read.
+            When possible, the values of the other channels are not converted.
         '''
+        if kwargs.pop('memory_map', False):
+            mapped = self._map_data(kwargs.get('dtype', 'float32'))
+            if mapped is not None:
+                return mapped.frame(channels)
+        if channels is not None:
+            layout = self._data_layout()
+            if layout is not None:
+                with open(self.datafile, 'rb') as fileobj:
+                    return layout.read(fileobj, channels=to_list(channels),
+                                       dtype=kwargs.get('dtype', 'float32'))
         meta, data = parse_fcs(self.datafile, **kwargs)
+        return data if channels is None else data[to_list(channels)]
+
+    def _data_layout(self):
+        """
+        The layout of the DATA segment of the datafile (see fcs_io.DataLayout).
+        Returns None if the data cannot be read with fcs_io (with the read parameters
+        in self.readdata_kwargs).
+        """
+        if self.datafile is None or self.readdata_kwargs.get('data_set', 0) != 0:
+            return None
+        if set(self.readdata_kwargs) - set(['dtype', 'channel_naming', 'data_set', 'memory_map']):
+            return None
+        try:
+            return fcs_io.DataLayout(self.meta)
+        except ValueError:
+            return None
+
+    def _map_data(self, dtype='float32'):
+        """
+        Map the DATA segment of the datafile into memory (see fcs_io.MappedData).
+        Returns None if the file cannot be memory mapped.
+        """
+        layout = self._data_layout()
+        if layout is None:
+            return None
+        return fcs_io.MappedData(self.datafile, layout, dtype)
+
+    def _get_view(self, channels=None):
+        """
+        Return an EventView of the measurement's data (None if no data is available).
+
+        Parameters
+        ----------
+        channels : list of str | None
+            The channels that the caller needs. If the data is not in memory (nor in the
+            data cache), only these channels are read from the datafile (see fcs_io.FileData);
+            the other channels are read if they are accessed later. The view is not kept on
+            the measurement: the values read are held by the view, by the measurements derived
+            from it, and by the data cache (one entry per channel), so that other views of the
+            datafile do not read them again.
+        """
+        if self._view is not None and not self.queue:
+            return self._view
+        if self._data is None and not self.queue and self.datafile is not None:
+            base = None
+            dtype = self.readdata_kwargs.get('dtype', 'float32')
+            if self.readdata_kwargs.get('memory_map', False):
+                base = self._map_data(dtype)
+            elif channels is not None and not self._data_in_cache():
+                layout = self._data_layout()
+                if layout is not None:
+                    key = None
+                    if self.data_cache is not None:
+                        key = self._datafile_key(**self.readdata_kwargs)
+                    base = fcs_io.FileData(self.datafile, layout, dtype, self.data_cache, key)
+            if base is not None:
+                return EventView(base)
+        data = self._get_shared_data()
+        return None if data is None else EventView(data)
+
+    def _data_from_file(self):
+        view = self._view
+        if view is None:
+            return self._data is None
+        # A view of the whole datafile (e.g., a memory map) holds the data of the file
+        return (isinstance(view.base, (fcs_io.FileData, fcs_io.MappedData)) and
+                view.rows is None and not view.overrides and
+                view.columns == list(view.base.columns))
+
+    _data_from_file.__doc__ = Measurement._data_from_file.__doc__
+
+    def _data_in_cache(self):
+        """ Whether the data of the datafile is in the data cache. """
+        if self.data_cache is None:
+            return False
+        key = self._datafile_key(**self.readdata_kwargs)
+        return key is not None and key in self.data_cache
+
+    def _set_view(self, view):
+        """
+        Set the data of the measurement to the given EventView.
+        Like set_data, the queue is moved to the history.
+        """
+        self._view = view
+        self._data = None
+        self.history += self.queue
+        self.queue = []
+
+    def get_data(self, channels=None, **kwargs):
+        '''
+        Get the measurement data.
+        If the data is held as an EventView, it is materialized as a DataFrame (once).
+        If data is not set, read from 'self.datafile' using 'self.read_data'.
+        The data returned is not shared with other measurements (nor with the caches),
+        and can be modified in place.
+
+        Parameters
+        ----------
+        channels : list of str | None
+            Only return these channels. If the data is not in memory, only these
+            channels are read from the datafile.
+        '''
+        if channels is not None:
+            view = self._get_view(to_list(channels))
+            if view is None:
+                return None
+            frame = view.frame(to_list(channels))
+            return frame.copy() if frame is view.base else frame
+        data = super(FCMeasurement, self).get_data(**kwargs)
+        if self._view is not None and data is not None and data is self._data:
+            self._view = None  # The data may now be modified by the caller
         return data
 
+    def _get_shared_data(self, **kwargs):
+        if self._view is not None and self._data is None and not self.queue:
+            self._data = self._view.frame()
+            self._owns_data = self._data is not self._view.base
+        return super(FCMeasurement, self)._get_shared_data(**kwargs)
+
+    _get_shared_data.__doc__ = Measurement._get_shared_data.__doc__
+
+    def set_data(self, data=None, **kwargs):
+        super(FCMeasurement, self).set_data(data, **kwargs)
+        self._view = None
+
+    set_data.__doc__ = Measurement.set_data.__doc__
+
+    data = property(get_data, set_data, doc='Data may be stored in memory or on disk')
+
+    def apply_queued(self):
+        """
+        Applies the queued operations (following the plan given by explain),
+        and returns the new measurement.
+        """
+        new = self.copy()
+        new.queue = []
+        new = plan_queue(self.queue).apply(new)
+        new.history = list(self.history) + list(self.queue)
+        return new
+
+    def explain(self):
+        """
+        The plan by which the queued operations are applied (see planner.plan_queue):
+        gates and subsamples are moved ahead of the transformations that they do not depend
+        on, consecutive gates are combined, and consecutive transformations are fused.
+
+        Returns
+        -------
+        QueuePlan
+            Its string representation lists the steps of the plan.
+
+        Examples
+        --------
+        >>> queued = sample.transform('hlog', channels='B1-A', use_spln=False, apply_now=False)
+        >>> queued = queued.gate(ThresholdGate(1000, 'FSC-A', 'above'), apply_now=False)
+        >>> print(queued.explain())
+        0: gate: gate ...
+        1: transform: transform hlog of ['B1-A']
+        """
+        return plan_queue(self.queue)
+
+    def _iter_source(self, chunksize, channels=None):
+        """
+        Iterate over chunks of the data that the queued operations are applied to.
+        The data is read from the datafile one chunk at a time, unless it is already in memory.
+        """
+        view = self._view
+        if view is None and self._data is not None:
+            view = EventView(self._data)
+        if view is None and self.readdata_kwargs.get('memory_map', False):
+            mapped = self._map_data(self.readdata_kwargs.get('dtype', 'float32'))
+            view = None if mapped is None else EventView(mapped)
+        if view is None and self._data_in_cache():
+            cached = self.data_cache.get(self._datafile_key(**self.readdata_kwargs))
+            view = None if cached is None else EventView(cached)
+
+        # If the data is not supported by fcs_io, fall back to reading all of it
+        if view is None and self._data_layout() is not None:
+            dtype = self.readdata_kwargs.get('dtype', 'float32')
+            for chunk in fcs_io.iter_data(self.datafile, self.meta, chunksize, channels, dtype):
+                yield chunk
+            return
+
+        if view is None:
+            view = EventView(self._get_attr_from_file('data'))
+        for start in range(0, len(view), chunksize):
+            rows = np.arange(start, min(start + chunksize, len(view)))
+            yield view.select(rows).frame(channels)
+
+    def iter_data(self, chunksize=100000, channels=None):
+        """
+        Iterates over the events of the measurement in chunks.
+
+        If the data is not in memory, it is read from the datafile one chunk at a time,
+        so that files larger than the available memory can be processed.
+        Queued operations (see the apply_now parameter of gate and transform) are applied
+        to each chunk.
+
+        .. note::
+
+            Queued operations whose result depends on all the events (subsample, and
+            transformations that fit a spline to the range of the data, i.e., use_spln=True)
+            cannot be applied to each chunk separately. If the queue holds any of them,
+            it is applied to all the events at once (see planner.depends_on_events), and
+            the result is iterated over in chunks. Use use_spln=False (or a fitted spline)
+            to keep the memory bounded.
+
+        Parameters
+        ----------
+        chunksize : int
+            Number of events read at a time.
+            Chunks may hold fewer events (e.g., if the events are gated).
+        channels : str | list of str | None
+            Names of the channels to return. If None all channels are returned.
+
+        Yields
+        ------
+        DataFrame
+            Events of the chunk (indexed by their position in the datafile).
+
+        Examples
+        --------
+        >>> gated = sample.transform('hlog', use_spln=False, apply_now=False).gate(gate, apply_now=False)
+        >>> for chunk in gated.iter_data(channels=['FSC-A', 'SSC-A']):
+        ...     process(chunk)
+        """
+        channels = to_list(channels)
+        if not self.queue:
+            for chunk in self._iter_source(chunksize, channels):
+                yield chunk
+            return
+        if depends_on_events(self.queue):
+            view = EventView(self._get_shared_data())
+            for start in range(0, len(view), chunksize):
+                rows = np.arange(start, min(start + chunksize, len(view)))
+                yield view.select(rows).frame(channels)
+            return
+        owns_data = self._owns_data
+        template = self.copy()
+        template._data = None
+        template._view = None
+        self._owns_data = owns_data  # The copy does not share the data
+        for chunk in self._iter_source(chunksize):
+            sample = template.copy()
+            sample._data = chunk
+            data = sample._get_shared_data()  # applies the queue
+            yield data if channels is None else data[channels]
+
+    def stats(self, channels=None, chunksize=100000, percentiles=None, k=200):
+        """
+        Summary statistics of the events: count, mean, std, min and max of each channel,
+        and optionally approximate percentiles.
+
+        The statistics are computed in a single pass over iter_data, so they
+        can be computed for files that do not fit in memory.
+
+        Parameters
+        ----------
+        channels : str | list of str | None
+            Names of the channels. If None all channels are used.
+        chunksize : int
+            Number of events read at a time.
+        percentiles : list of floats | None
+            Percentiles (between 0 and 100) to approximate with quantile sketches
+            (see stats.QuantileSketch). They are returned as rows 'p<q>' (e.g., 'p5'),
+            followed by a row 'rank_error' that bounds their normalized rank error.
+        k : int
+            Size of the quantile sketches. The rank error decreases as about 1 / k.
+
+        Returns
+        -------
+        DataFrame
+            Statistics (rows) of each channel (columns).
+        """
+        if percentiles is None:
+            running = RunningStats()
+            for chunk in self.iter_data(chunksize, channels):
+                running.update(chunk)
+            return running.result()
+        stats = list(RunningStats.index) + ['p{0:g}'.format(q) for q in to_list(percentiles)]
+        return summarize_chunks(self.iter_data(chunksize, channels), stats + ['rank_error'], k)
+
+    def quantile_sketches(self, channels=None, chunksize=100000, k=200):
+        """
+        Quantile sketches of the values of the channels, computed in a single pass over
+        iter_data. Sketches can be merged with the sketches of other measurements
+        (see FCCollection.quantile_sketches).
+
+        Parameters
+        ----------
+        channels : str | list of str | None
+            Names of the channels. If None all channels are used.
+        chunksize : int
+            Number of events read at a time.
+        k : int
+            Size of the sketches (see stats.QuantileSketch).
+
+        Returns
+        -------
+        Dictionary of channel:QuantileSketch
+
+        Examples
+        --------
+        >>> sketches = sample.quantile_sketches(['FSC-A', 'SSC-A'])
+        >>> sketches['FSC-A'].quantile(0.5)
+        """
+        sketches = collections.OrderedDict((c, QuantileSketch(k)) for c in to_list(channels) or
+                                           self.channel_names)
+        for chunk in self.iter_data(chunksize, channels):
+            for c, sketch in sketches.items():
+                sketch.update(chunk[c].values)
+        return sketches
+
     def read_meta(self, **kwargs):
         '''
         Read only the annotation of the FCS file (without reading DATA segment).
@@ -68,6 +438,11 @@ class FCMeasurement(Measurement):
                          meta_data_only=True, **kwargs)
         return meta
 
+    def _meta_params(self, **kwargs):
+        if 'channel_naming' in self.readdata_kwargs:
+            kwargs['channel_naming'] = self.readdata_kwargs['channel_naming']
+        return super(FCMeasurement, self)._meta_params(**kwargs)
+
     def get_meta_fields(self, fields, kwargs={}):
         '''
         Return a dictionary of metadata fields
@@ -125,7 +500,8 @@ class FCMeasurement(Measurement):
         channel_names = to_list(channel_names)
         gates = to_list(gates)
 
-        plot_output = graph.plotFCM(self.data, channel_names, kind=kind, **kwargs)
+        plot_output = graph.plotFCM(self.get_data(channels=channel_names), channel_names,
+                                    kind=kind, **kwargs)
 
         if gates is not None:
             if gate_colors is None:
@@ -209,14 +585,14 @@ class FCMeasurement(Measurement):
     def transform(self, transform, direction='forward',
                   channels=None, return_all=True, auto_range=True,
                   use_spln=True, get_transformer=False, ID=None,
-                  apply_now=True,
+                  apply_now=True, use_lut=False,
                   args=(), **kwargs):
         """
         Applies a transformation to the specified channels.
 
         The transformation parameters are shared between all transformed channels.
         If different parameters need to be applied to different channels,
-        use several calls to `transform`.
+        use `transform_channels`.
 
         Parameters
         ----------
@@ -236,13 +612,32 @@ class FCMeasurement(Measurement):
         --------
         {FCMeasurement_transform_examples}
         """
-        # Create new measurement
         new = self.copy()
-        data = new.data
+        view, transformer = self._transform_view(
+            self._get_view(), transform, direction, channels, return_all, auto_range, use_spln,
+            use_lut=use_lut, args=args, **kwargs)
+        new._set_view(view)
+
+        if ID is not None:
+            new.ID = ID
+        if get_transformer:
+            return new, transformer
+        else:
+            return new
+
+    def _transform_view(self, view, transform, direction='forward', channels=None,
+                        return_all=True, auto_range=True, use_spln=True, get_transformer=False,
+                        ID=None, apply_now=True, use_lut=False, args=(), **kwargs):
+        """
+        Transforms the events of an EventView (see transform, which takes the same parameters).
 
+        Returns
+        -------
+        (new view, Transformation)
+        """
         channels = to_list(channels)
         if channels is None:
-            channels = data.columns
+            channels = list(view.columns)
         ## create transformer
         if isinstance(transform, Transformation):
             transformer = transform
@@ -264,30 +659,222 @@ class FCMeasurement(Measurement):
                             HINT: Try transforming one channel at a time.
                             You'll need to provide the name of the channel in the transform.""")
 
-                    if transform in {'hlog', 'tlog', 'hlog_inv', 'tlog_inv'}:
-                        # Hacky fix to make sure that 'd' is provided only
-                        # for hlog / tlog transformations
-                        kwargs['d'] = np.log10(ranges[0])
+                    _set_range_kwargs(transform, ranges[0], kwargs)
             transformer = Transformation(transform, direction, args, **kwargs)
-        ## create new data
-        transformed = transformer(data[channels], use_spln)
+        ## create new data (the untransformed channels are shared with self)
+        lut_bits = self._lut_bits(channels) if use_lut else {}
+        view.prefetch(channels)
+        new_columns = dict((c, transformer(view.column(c), lut_bits=lut_bits[c]))
+                           for c in channels if c in lut_bits)
+        other = [c for c in channels if c not in lut_bits]
+        if other:
+            transformed = transformer(view.values(other), use_spln)
+            new_columns.update((c, transformed[:, i]) for i, c in enumerate(other))
         if return_all:
-            new_data = data
+            columns = None
         else:
-            new_data = data.filter(channels)
-        new_data[channels] = transformed
-        ## update new Measurement
-        new.data = new_data
+            columns = [c for c in view.columns if c in channels]
+        return view.with_columns(new_columns, columns), transformer
+
+    @queueable
+    @doc_replacer
+    def transform_channels(self, transforms, direction='forward', return_all=True,
+                           auto_range=True, use_spln=True, use_lut=False, ID=None,
+                           apply_now=True):
+        """
+        Applies a different transformation to each of the specified channels, in a single pass.
+
+        Unlike `transform`, the channels do not need to share their data range or the parameters
+        of their transformation. All the transformed channels are written to a single new
+        array (the untransformed channels are shared with this measurement).
+
+        Parameters
+        ----------
+        {FCMeasurement_transform_channels_pars}
+        ID : hashable | None
+            ID for the resulting measurement. If None is passed, the original ID is used.
+
+        Returns
+        -------
+        new : FCMeasurement
+            New measurement containing the transformed data.
 
+        Examples
+        --------
+        {FCMeasurement_transform_channels_examples}
+        """
+        new = self.copy()
+        new._set_view(self._transform_channels_view(self._get_view(), transforms, direction,
+                                                    return_all, auto_range, use_spln, use_lut))
         if ID is not None:
             new.ID = ID
-        if get_transformer:
-            return new, transformer
-        else:
-            return new
+        return new
+
+    def _transform_channels_view(self, view, transforms, direction='forward', return_all=True,
+                                 auto_range=True, use_spln=True, use_lut=False, ID=None,
+                                 apply_now=True):
+        """
+        Transforms the events of an EventView (see transform_channels, which takes the
+        same parameters). Returns the new view.
+        """
+        transformers = self._channel_transformers(transforms, direction, auto_range)
+        for c in transformers:
+            if c not in view.columns:
+                raise KeyError(c)
+        channels = [c for c in view.columns if c in transformers]
+        lut_bits = self._lut_bits(channels) if use_lut else {}
+        transformed = np.empty((len(view), len(channels)), order='F')
+        view.prefetch(channels)
+        for i, c in enumerate(channels):
+            transformed[:, i] = transformers[c](view.column(c), use_spln, lut_bits=lut_bits.get(c))
+        new_columns = dict((c, transformed[:, i]) for i, c in enumerate(channels))
+        columns = None if return_all else channels
+        return view.with_columns(new_columns, columns)
+
+    def _channel_transformers(self, transforms, direction='forward', auto_range=True):
+        """
+        The Transformation of each channel in a mapping given to transform_channels.
+        With auto_range, the range parameter of named transformations is set from the
+        $PnR of each channel.
+
+        Returns
+        -------
+        Dictionary of channel:Transformation
+        """
+        names = list(self.channel_names)
+        transformers = {}
+        for channel, transform in transforms.items():
+            if not isinstance(transform, Transformation):
+                if isinstance(transform, tuple):
+                    transform, kwargs = transform[0], dict(transform[1])
+                else:
+                    kwargs = {}
+                if auto_range and channel in names:
+                    data_range = float(self.channels.iloc[names.index(channel)]['$PnR'])
+                    _set_range_kwargs(transform, data_range, kwargs)
+                transform = Transformation(transform, direction, **kwargs)
+            transformers[channel] = transform
+        return transformers
 
+    @queueable
     @doc_replacer
-    def subsample(self, key, order='random', auto_resize=False):
+    def compensate(self, spillover=None, ID=None, apply_now=True):
+        """
+        Applies spillover compensation to the channels of the spillover matrix.
+
+        The compensated values of all the channels are computed with a single matrix
+        product (in chunks of events); the other channels are shared with this measurement.
+
+        Parameters
+        ----------
+        {FCMeasurement_compensate_pars}
+        ID : hashable | None
+            ID for the resulting measurement. If None is passed, the original ID is used.
+
+        Returns
+        -------
+        new : FCMeasurement
+            New measurement containing the compensated data.
+        """
+        if spillover is None:
+            spillover = compensation.get_spillover(self.meta)
+            if spillover is None:
+                raise ValueError('No spillover matrix ({0}) in the metadata of {1}.'.format(
+                    ', '.join(compensation.spillover_keywords), self))
+        view = self._get_view()
+        # The matrix refers to channels by $PnN, which may differ from the channel names
+        names = list(self.channel_names)
+        short_names = list(self.channels['$PnN'])
+        channels = []
+        for c in spillover.columns:
+            if c not in view.columns and c in short_names:
+                c = names[short_names.index(c)]
+            if c not in view.columns:
+                raise KeyError(c)
+            channels.append(c)
+        view.prefetch(channels)
+        compensated = compensation.compensate([view.column(c) for c in channels],
+                                              compensation.inverse(spillover))
+        new = self.copy()
+        new._set_view(view.with_columns(
+            dict((c, compensated[:, i]) for i, c in enumerate(channels))))
+        if ID is not None:
+            new.ID = ID
+        return new
+
+    def _channel_range(self, channels, source='auto'):
+        """
+        Range of the values of the given channels.
+
+        Parameters
+        ----------
+        channels : list of str
+        source : 'auto' | 'meta' | 'data'
+            * 'meta' : the range of values given by $PnR: [0, 2 ** bits - 1] for integers
+              (the largest value that the bits of the channel can hold), [-$PnR, $PnR] for
+              floats (which may lie outside of it). Only available if no operation was applied
+              to the data.
+            * 'data' : the minimum and maximum of the data. For data read from the
+              datafile, these are computed once and kept in extremes_cache.
+            * 'auto' : 'meta' for integers if available (it bounds the data), otherwise 'data'.
+
+        Returns
+        -------
+        (xmin, xmax) : Series indexed by channel
+        """
+        raw = not self.history and not self.queue and self.meta is not None
+        if source in ('auto', 'meta'):
+            integer = raw and self.meta.get('$DATATYPE') == 'I'
+            if raw and '_channels_' in self.meta and (integer or source == 'meta'):
+                names = list(self.channel_names)
+                info = [self.channels.iloc[names.index(c)] for c in channels]
+                if integer:
+                    high = Series([2. ** _integer_bits(i) - 1 for i in info], index=channels)
+                    return 0 * high, high
+                high = Series([float(i['$PnR']) for i in info], index=channels)
+                return -high, high
+            if source == 'meta':
+                raise ValueError('The range of the data of {0} cannot be determined from its '
+                                 'metadata.'.format(self))
+
+        key = self._datafile_key(**self.readdata_kwargs) if raw else None
+        ranges = dict((c, extremes_cache.get(key + (c,))) for c in channels) if key else {}
+        missing = [c for c in channels if ranges.get(c) is None]
+        if missing:
+            view = self._get_view(missing)
+            view.prefetch(missing)
+            for c in missing:
+                ranges[c] = extremes(view.column(c))
+                if key is not None:
+                    extremes_cache.put(key + (c,), ranges[c])
+        return (Series([ranges[c][0] for c in channels], index=channels),
+                Series([ranges[c][1] for c in channels], index=channels))
+
+    def _lut_bits(self, channels):
+        """
+        Bit depth of the raw values of the given channels, for those that are stored
+        as integers ($DATATYPE = I) small enough to be transformed with a lookup table.
+
+        Returns
+        -------
+        Dictionary of channel:bits
+        """
+        meta = self.meta
+        if meta is None or meta.get('$DATATYPE') != 'I':
+            return {}
+        names = list(self.channel_names)
+        bits = {}
+        for c in channels:
+            if c not in names:
+                continue
+            nbits = _integer_bits(self.channels.iloc[names.index(c)])
+            if 0 < nbits <= max_lut_bits:
+                bits[c] = nbits
+        return bits
+
+    @queueable
+    @doc_replacer
+    def subsample(self, key, order='random', auto_resize=False, apply_now=True):
         """
         Allows arbitrary slicing (subsampling) of the data.
 
@@ -301,8 +888,8 @@ class FCMeasurement(Measurement):
             Sample with subsampled data.
         """
 
-        data = self.get_data()
-        num_events = data.shape[0]
+        view = self._get_view()
+        num_events = len(view)
 
         if isinstance(key, float):
             if (key > 1.0) or (key < 0.0):
@@ -316,36 +903,36 @@ class FCMeasurement(Measurement):
             stop = int(num_events * key[1])
             key = slice(start, stop)  # Convert to a slice
 
-        try:
-            if isinstance(key, slice):
-                if auto_resize:
-                    stop = key.stop if key.stop < num_events else num_events
-                    start = key.start if key.start < num_events else num_events
-                    key = slice(start, stop, key.step)  # Generate new slice
-                newdata = data.iloc[key]
-            elif isinstance(key, int):
-                if auto_resize:
-                    if key > num_events:
-                        key = num_events
-                if key < 1:
-                    # EDGE CAES: Must return an empty sample
-                    order = 'start'
-                if order == 'random':
-                    newdata = data.loc[sample(list(data.index), key)]  # Use loc not iloc here!!
-                elif order == 'start':
-                    newdata = data.iloc[:key]
-                elif order == 'end':
-                    newdata = data.iloc[-key:]
-                else:
-                    raise ValueError("order must be in ('random', 'start', 'end')")
+        # Positions (in the view) of the events to keep
+        if isinstance(key, slice):
+            if auto_resize:
+                stop = key.stop if key.stop < num_events else num_events
+                start = key.start if key.start < num_events else num_events
+                key = slice(start, stop, key.step)  # Generate new slice
+            positions = np.arange(num_events)[key]
+        elif isinstance(key, int):
+            if auto_resize:
+                if key > num_events:
+                    key = num_events
+            if key < 1:
+                # EDGE CAES: Must return an empty sample
+                order = 'start'
+                key = 0
+            if order not in ('random', 'start', 'end'):
+                raise ValueError("order must be in ('random', 'start', 'end')")
+            if order == 'random':
+                if key > num_events:
+                    print("If you're encountering an out-of-bounds error, "
+                          "try to setting 'auto_resize' to True.")
+                positions = sample(range(num_events), key)
+            elif order == 'start':
+                positions = np.arange(min(key, num_events))
             else:
-                raise TypeError("'key' must be of type int, float, tuple or slice.")
-        except IndexError:
-            print("If you're encountering an out-of-bounds error, "
-                  "try to setting 'auto_resize' to True.")
-            raise
+                positions = np.arange(max(num_events - key, 0), num_events)
+        else:
+            raise TypeError("'key' must be of type int, float, tuple or slice.")
         newsample = self.copy()
-        newsample.set_data(data=newdata)
+        newsample._set_view(view.select(np.asarray(positions, dtype=np.intp)))
         return newsample
 
     @queueable
@@ -364,17 +951,81 @@ class FCMeasurement(Measurement):
         FCMeasurement
             Sample with data that passes gates
         '''
-        data = self.get_data()
-        newdata = gate(data)
+        view = self._get_view(gate.channels)
+        gate._check_channels(view)
+        mask = gate.mask(view.frame(gate.channels))
         newsample = self.copy()
-        newsample.data = newdata
+        newsample._set_view(view.select(mask))
         return newsample
 
+    def _estimated_nbytes(self):
+        """
+        Estimated size of the data read from the datafile (0 if the data is in memory).
+        """
+        if self._data is not None or self._view is not None or self.meta is None:
+            return 0
+        itemsize = np.dtype(self.readdata_kwargs.get('dtype', 'float32')).itemsize
+        return int(self.meta['$TOT']) * int(self.meta['$PAR']) * itemsize
+
     @property
     def counts(self):
-        """ Returns total number of events. """
-        data = self.get_data()
-        return data.shape[0]
+        """
+        Returns total number of events.
+        If the data is not in memory, the events are counted without loading all of it.
+        """
+        if self._view is None and self._data is None and self.datafile is not None:
+            if not self.queue and not self._data_in_cache():
+                return int(self.meta['$TOT'])
+            return sum(len(chunk) for chunk in self.iter_data())
+        return len(self._get_view())
+
+    @property
+    def shape(self):
+        view = self._get_view()
+        if view is None:
+            return None
+        return view.shape
+
+
+def _call_method(measurement, name, kwargs):
+    """ Call a method of the measurement. Module level so that it can be pickled. """
+    return getattr(measurement, name)(**kwargs)
+
+
+def _get_counts(measurement):
+    return measurement.counts
+
+
+def _compute(measurement):
+    """ Apply the queued operations of a measurement and set its data. Module level (pickling). """
+    new = measurement.apply_queued()
+    new.set_data(new.get_data())
+    return new
+
+
+def _summarize(measurement, channels, stats, gate, approximate=False, k=200):
+    """ Summary statistics of a measurement (see FCCollection.stats). Module level (pickling). """
+    if approximate:
+        if gate is not None:
+            measurement = measurement.gate(gate, apply_now=False)
+        return summarize_chunks(measurement.iter_data(channels=channels), stats, k)
+    if channels is None:
+        channels = list(measurement.channel_names)
+    needed = list(channels)
+    if gate is not None:
+        needed += [c for c in gate.channels if c not in needed]
+    view = measurement._get_view(needed)  # Temporary: not kept on the measurement
+    view.prefetch(needed)  # A single read of the datafile, for the gate and the statistics
+    if gate is not None:
+        gate._check_channels(view)
+        view = view.select(gate.mask(view.frame(gate.channels)))
+    return summarize(collections.OrderedDict((c, view.column(c)) for c in channels), stats)
+
+
+def _quantile_sketches(measurement, channels, gate, k):
+    if gate is not None:
+        measurement = measurement.gate(gate, apply_now=False)
+    return measurement.quantile_sketches(channels, k=k)
 
 
 class FCCollection(MeasurementCollection):
@@ -387,8 +1038,8 @@ class FCCollection(MeasurementCollection):
     def transform(self, transform, direction='forward', share_transform=True,
                   channels=None, return_all=True, auto_range=True,
                   use_spln=True, get_transformer=False, ID=None,
-                  apply_now=True,
-                  args=(), **kwargs):
+                  apply_now=True, n_jobs=None, executor='thread', use_lut=False,
+                  spline_range='auto', args=(), **kwargs):
         '''
         Apply transform to each Measurement in the Collection.
 
@@ -399,8 +1050,10 @@ class FCCollection(MeasurementCollection):
         Parameters
         ----------
         {FCMeasurement_transform_pars}
+        {FCCollection_spline_range_pars}
         ID : hashable | None
             ID for the resulting collection. If None is passed, the original ID is used.
+        {_bases_parallel_pars}
 
         Returns
         -------
@@ -414,9 +1067,7 @@ class FCCollection(MeasurementCollection):
         --------
         {FCMeasurement_transform_examples}
         '''
-        new = self.copy()
         if share_transform:
-
             channel_meta = list(self.values())[0].channels
             channel_names = list(self.values())[0].channel_names
             if channels is None:
@@ -442,34 +1093,138 @@ class FCCollection(MeasurementCollection):
                                             'data range, therefore they cannot be '
                                             'transformed together.')
 
-                        if transform in {'hlog', 'tlog', 'hlog_inv', 'tlog_inv'}:
-                            # Hacky fix to make sure that 'd' is provided only
-                            # for hlog / tlog transformations
-                            kwargs['d'] = np.log10(ranges[0])
+                        _set_range_kwargs(transform, ranges[0], kwargs)
                 transformer = Transformation(transform, direction, args, **kwargs)
-                if use_spln:
-                    xmax = self.apply(lambda x: x[channels].max().max(), applyto='data').max().max()
-                    xmin = self.apply(lambda x: x[channels].min().min(), applyto='data').min().min()
-                    transformer.set_spline(xmin, xmax)
+                # No spline is needed if every channel is transformed with a lookup table
+                if use_spln and not (use_lut and all(
+                        set(m._lut_bits(channels)) == set(channels) for m in self.values())):
+                    xmin, xmax = self._channel_range(channels, spline_range)
+                    transformer.set_spline(xmin.min(), xmax.max())
             ## transform all measurements
-            for k, v in new.items():
-                new[k] = v.transform(transformer, channels=channels, return_all=return_all,
-                                     use_spln=use_spln, apply_now=apply_now)
+            transform_kwargs = dict(transform=transformer, channels=channels,
+                                    return_all=return_all, use_spln=use_spln, apply_now=apply_now,
+                                    use_lut=use_lut)
         else:
-            for k, v in new.items():
-                new[k] = v.transform(transform, direction=direction, channels=channels,
-                                     return_all=return_all, auto_range=auto_range,
-                                     get_transformer=False,
-                                     use_spln=use_spln, apply_now=apply_now, args=args, **kwargs)
-        if ID is not None:
-            new.ID = ID
+            transform_kwargs = dict(kwargs, transform=transform, direction=direction,
+                                    channels=channels, return_all=return_all,
+                                    auto_range=auto_range, get_transformer=False,
+                                    use_spln=use_spln, apply_now=apply_now, use_lut=use_lut,
+                                    args=args)
+        func = partial(_call_method, name='transform', kwargs=transform_kwargs)
+        new = self.apply(func, output_format='collection', ID=ID, n_jobs=n_jobs, executor=executor)
         if share_transform and get_transformer:
             return new, transformer
         else:
             return new
 
     @doc_replacer
-    def gate(self, gate, ID=None, apply_now=True):
+    def transform_channels(self, transforms, direction='forward', share_transform=True,
+                           return_all=True, auto_range=True, use_spln=True, use_lut=False,
+                           spline_range='auto', ID=None, apply_now=True, n_jobs=None,
+                           executor='thread'):
+        '''
+        Apply a different transformation to each of the specified channels,
+        for each Measurement in the Collection.
+
+        Return a new Collection with transformed data.
+
+        Parameters
+        ----------
+        {FCMeasurement_transform_channels_pars}
+        share_transform : bool
+            If True, the transformations are created once (with the data ranges of the first
+            measurement) and shared by all measurements; splines are fitted once, over the
+            range of the data of all measurements.
+        {FCCollection_spline_range_pars}
+        ID : hashable | None
+            ID for the resulting collection. If None is passed, the original ID is used.
+        {_bases_parallel_pars}
+
+        Returns
+        -------
+        new : FCCollection
+            New collection containing the transformed measurements.
+
+        Examples
+        --------
+        {FCMeasurement_transform_channels_examples}
+        '''
+        if share_transform:
+            transforms = list(self.values())[0]._channel_transformers(transforms, direction,
+                                                                      auto_range)
+            # No spline is needed for channels transformed with a lookup table
+            spline_channels = [c for c, t in transforms.items() if t.spln is None]
+            if use_spln and use_lut:
+                spline_channels = [c for c in spline_channels if not all(
+                    c in m._lut_bits([c]) for m in self.values())]
+            if use_spln and spline_channels:
+                xmin, xmax = self._channel_range(spline_channels, spline_range)
+                # Channels sharing a Transformation share its spline
+                shared = {}
+                for c in spline_channels:
+                    shared.setdefault(id(transforms[c]), []).append(c)
+                for group in shared.values():
+                    # Fit the spline on a copy, leaving the caller's Transformation unchanged
+                    transformer = transforms[group[0]].copy(deep=False)
+                    transformer.set_spline(xmin[group].min(), xmax[group].max())
+                    for c in group:
+                        transforms[c] = transformer
+            auto_range = False
+        transform_kwargs = dict(transforms=transforms, direction=direction, return_all=return_all,
+                                auto_range=auto_range, use_spln=use_spln, use_lut=use_lut,
+                                apply_now=apply_now)
+        func = partial(_call_method, name='transform_channels', kwargs=transform_kwargs)
+        return self.apply(func, output_format='collection', ID=ID, n_jobs=n_jobs,
+                          executor=executor)
+
+    def _channel_range(self, channels, source='auto'):
+        """
+        Range of the values of the given channels over all measurements
+        (see FCMeasurement._channel_range), used to fit shared splines.
+
+        Parameters
+        ----------
+        channels : list of str
+        source : 'auto' | 'meta' | 'data' | (xmin, xmax)
+
+        Returns
+        -------
+        (xmin, xmax) : Series indexed by channel
+        """
+        if isinstance(source, tuple):
+            return (Series(float(source[0]), index=channels),
+                    Series(float(source[1]), index=channels))
+        ranges = [m._channel_range(channels, source) for m in self.values()]
+        return (DataFrame([r[0] for r in ranges]).min(),
+                DataFrame([r[1] for r in ranges]).max())
+
+    @doc_replacer
+    def compensate(self, spillover=None, ID=None, apply_now=True, n_jobs=None,
+                   executor='thread'):
+        '''
+        Applies spillover compensation to each Measurement in the Collection.
+
+        The inverse of each distinct spillover matrix is only computed once.
+
+        Parameters
+        ----------
+        {FCMeasurement_compensate_pars}
+        ID : hashable | None
+            ID for the resulting collection. If None is passed, the original ID is used.
+        {_bases_parallel_pars}
+
+        Returns
+        -------
+        new : FCCollection
+            New collection containing the compensated measurements.
+        '''
+        func = partial(_call_method, name='compensate',
+                       kwargs=dict(spillover=spillover, apply_now=apply_now))
+        return self.apply(func, output_format='collection', ID=ID, n_jobs=n_jobs,
+                          executor=executor)
+
+    @doc_replacer
+    def gate(self, gate, ID=None, apply_now=True, n_jobs=None, executor='thread'):
         '''
         Applies the gate to each Measurement in the Collection, returning a new Collection with gated data.
 
@@ -481,15 +1236,15 @@ class FCCollection(MeasurementCollection):
 
         ID : [ str, numeric, None]
             New ID to be given to the output. If None, the ID of the current collection will be used.
+        {_bases_parallel_pars}
         '''
-
-        def func(well):
-            return well.gate(gate, apply_now=apply_now)
-
-        return self.apply(func, output_format='collection', ID=ID)
+        func = partial(_call_method, name='gate', kwargs=dict(gate=gate, apply_now=apply_now))
+        return self.apply(func, output_format='collection', ID=ID, n_jobs=n_jobs,
+                          executor=executor)
 
     @doc_replacer
-    def subsample(self, key, order='random', auto_resize=False, ID=None):
+    def subsample(self, key, order='random', auto_resize=False, ID=None, apply_now=True,
+                  n_jobs=None, executor='thread'):
         """
         Allows arbitrary slicing (subsampling) of the data.
 
@@ -501,19 +1256,22 @@ class FCCollection(MeasurementCollection):
         Parameters
         ----------
         {FCMeasurement_subsample_parameters}
+        {_bases_parallel_pars}
 
         Returns
         -------
         FCCollection or a subclass
             new collection of subsampled event data.
         """
+        func = partial(_call_method, name='subsample',
+                       kwargs=dict(key=key, order=order, auto_resize=auto_resize,
+                                   apply_now=apply_now))
+        return self.apply(func, output_format='collection', ID=ID, n_jobs=n_jobs,
+                          executor=executor)
 
-        def func(well):
-            return well.subsample(key=key, order=order, auto_resize=auto_resize)
-
-        return self.apply(func, output_format='collection', ID=ID)
-
-    def counts(self, ids=None, setdata=False, output_format='DataFrame'):
+    @doc_replacer
+    def counts(self, ids=None, setdata=False, output_format='DataFrame', n_jobs=None,
+               executor='thread'):
         """
         Return the counts in each of the specified measurements.
 
@@ -527,13 +1285,202 @@ class FCCollection(MeasurementCollection):
             Used only if data is not already set.
         output_format : DataFrame | dict
             Specifies the output format for that data.
+        {_bases_parallel_pars}
 
         Returns
         -------
         [DataFrame | Dictionary]
             Dictionary keys correspond to measurement keys.
         """
-        return self.apply(lambda x: x.counts, ids=ids, setdata=setdata, output_format=output_format)
+        return self.apply(_get_counts, ids=ids, setdata=setdata, output_format=output_format,
+                          n_jobs=n_jobs, executor=executor)
+
+    @doc_replacer
+    def stats(self, channels=None, stats=('count', 'mean', 'median', 'cv', 'p5', 'p95'),
+              gate=None, ids=None, approximate=False, k=200, n_jobs=None, executor='thread'):
+        """
+        Summary statistics of the events of each measurement, as a tidy table.
+
+        All the statistics of a measurement are computed from a single read of
+        the requested channels (see stats.summarize).
+
+        Parameters
+        ----------
+        {FCCollection_stats_pars}
+        ids : hashable | iterable of hashables | None
+            Keys of measurements to summarize. If None is given, all measurements are used.
+        {_bases_parallel_pars}
+
+        Returns
+        -------
+        DataFrame
+            One row per measurement and channel (indexed by (ID, channel)),
+            and one column per statistic (and a column 'rank_error' for approximate
+            percentiles).
+
+        Examples
+        --------
+        >>> plate.stats(['Y2-A', 'B1-A'], stats=['count', 'median', 'p95'], gate=y2_gate)
+        """
+        stats = list(stats) + (['rank_error'] if approximate else [])
+        results = self.apply(partial(_summarize, channels=to_list(channels), stats=stats,
+                                     gate=gate, approximate=approximate, k=k),
+                             ids=ids, output_format='dict', n_jobs=n_jobs, executor=executor)
+        tables = [(key, results[key].T) for key in self.keys() if key in results]
+        if not tables:
+            return DataFrame(columns=list(stats))
+        table = concat([t for _, t in tables], keys=[k for k, _ in tables])
+        table.index.names = ['ID', 'channel']
+        return table
+
+    @doc_replacer
+    def quantile_sketches(self, channels=None, gate=None, ids=None, k=200, n_jobs=None,
+                          executor='thread'):
+        """
+        Quantile sketches of the values of the channels over all measurements
+        (see FCMeasurement.quantile_sketches). Each datafile is read in chunks,
+        and the sketches of the measurements are merged.
+
+        Parameters
+        ----------
+        channels : str | list of str | None
+            Names of the channels. If None all channels are used.
+        gate : Gate | None
+            If given, only the events in the gate are used.
+        ids : hashable | iterable of hashables | None
+            Keys of measurements to use. If None is given, all measurements are used.
+        k : int
+            Size of the sketches (see stats.QuantileSketch).
+        {_bases_parallel_pars}
+
+        Returns
+        -------
+        Dictionary of channel:QuantileSketch
+
+        Examples
+        --------
+        >>> sketches = plate1.quantile_sketches('Y2-A')
+        >>> sketches['Y2-A'].merge(plate2.quantile_sketches('Y2-A')['Y2-A'])
+        >>> sketches['Y2-A'].quantile([0.05, 0.5, 0.95])  # over both plates
+        """
+        results = self.apply(partial(_quantile_sketches, channels=to_list(channels), gate=gate,
+                                     k=k),
+                             ids=ids, output_format='dict', n_jobs=n_jobs, executor=executor)
+        sketches = collections.OrderedDict()
+        for key in self.keys():
+            for c, sketch in results.get(key, {}).items():
+                if c in sketches:
+                    sketches[c].merge(sketch)
+                else:
+                    sketches[c] = sketch
+        return sketches
+
+    @doc_replacer
+    def compute(self, ID=None, n_jobs=None, executor='thread', max_memory=None):
+        """
+        Applies the queued operations (see apply_now) of all measurements,
+        and returns a new collection of measurements holding the resulting data.
+
+        The measurements are processed concurrently (each worker reads a datafile and applies
+        the planned operations, see FCMeasurement.explain), in batches whose data fits in
+        max_memory.
+
+        Parameters
+        ----------
+        ID : hashable | None
+            ID for the resulting collection. If None is passed, the original ID is used.
+        {_bases_parallel_pars}
+        max_memory : int | None
+            Bound (in bytes) on the total size of the data read by the measurements processed
+            at the same time, estimated from $TOT and $PAR. Applying the operations may take
+            a few times more. A measurement larger than max_memory is processed alone.
+            If None, all measurements are processed in a single batch.
+
+        Returns
+        -------
+        new : FCCollection
+            New collection of measurements with their data set and no queued operations.
+
+        Examples
+        --------
+        >>> gated = plate.transform('hlog', channels=['FSC-A', 'SSC-A'], use_spln=False,
+        ...                         apply_now=False).gate(gate, apply_now=False)
+        >>> result = gated.compute(n_jobs=4, max_memory=2 ** 30)
+        """
+        if max_memory is None:
+            batches = [list(self.keys())]
+        else:
+            batches = [[]]
+            batch_nbytes = 0
+            for key, measurement in self.items():
+                nbytes = measurement._estimated_nbytes()
+                if batches[-1] and batch_nbytes + nbytes > max_memory:
+                    batches.append([])
+                    batch_nbytes = 0
+                batches[-1].append(key)
+                batch_nbytes += nbytes
+        results = {}
+        for batch in batches:
+            results.update(self.apply(_compute, ids=batch, output_format='dict',
+                                      n_jobs=n_jobs, executor=executor))
+        new = self.copy()
+        for key in new.keys():
+            new[key] = results[key]
+        if ID is not None:
+            new.ID = ID
+        return new
+
+    def to_store(self, path, ids=None, compress=True, n_jobs=None):
+        """
+        Save the measurements to a store: a directory with one compressed archive of the
+        events of each measurement (one array per channel), and a manifest holding the
+        metadata, positions and history of the measurements.
+
+        Unlike save, the events can be loaded back lazily (see from_store).
+        Queued operations are applied to the measurements before they are saved.
+
+        Parameters
+        ----------
+        path : str
+            Directory of the store (created if needed).
+        ids : [hashable | iterable of hashables | None]
+            Keys of the measurements to save. If None, all measurements are saved.
+        compress : bool
+            Compress the archives of the measurements.
+        n_jobs : int | None
+            Number of threads used to write the measurements.
+        """
+        store.write_store(self, path, ids=ids, compress=compress, n_jobs=n_jobs)
+
+    @classmethod
+    def _from_store_entries(cls, path, manifest, ids=None):
+        entries = manifest['measurements']
+        if ids is not None:
+            ids = to_list(ids)
+            entries = [e for e in entries if e['key'] in ids]
+        return dict((e['key'], store.read_measurement(path, e, cls._measurement_class))
+                    for e in entries)
+
+    @classmethod
+    def from_store(cls, path, ids=None, ID=None):
+        """
+        Load a collection saved with to_store.
+
+        Only the manifest of the store is read. The events of a measurement are read
+        when they are accessed, one channel at a time.
+
+        Parameters
+        ----------
+        path : str
+            Directory of the store.
+        ids : [hashable | iterable of hashables | None]
+            Keys of the measurements to load. If None, all measurements are loaded.
+        ID : hashable | None
+            ID of the collection. If None, the ID of the saved collection is used.
+        """
+        manifest = store.read_manifest(path)
+        measurements = cls._from_store_entries(path, manifest, ids)
+        return cls(manifest['ID'] if ID is None else ID, measurements)
 
 
 class FCOrderedCollection(OrderedCollection, FCCollection):
@@ -541,6 +1488,61 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
     A dict-like class for holding flow cytometry samples that are arranged in a matrix.
     '''
 
+    @classmethod
+    def from_store(cls, path, ids=None, ID=None):
+        manifest = store.read_manifest(path)
+        layout = manifest['layout']
+        if layout is None:
+            raise ValueError('The store at {0} does not hold an ordered collection.'.format(path))
+        measurements = cls._from_store_entries(path, manifest, ids)
+        positions = dict((k, layout['positions'][k]) for k in measurements)
+        return cls(manifest['ID'] if ID is None else ID, measurements, 'name',
+                   shape=layout['shape'], positions=positions,
+                   row_labels=layout['row_labels'], col_labels=layout['col_labels'])
+
+    from_store.__func__.__doc__ = FCCollection.from_store.__doc__
+
+    @doc_replacer
+    def stats(self, channels=None, stats=('count', 'mean', 'median', 'cv', 'p5', 'p95'),
+              gate=None, ids=None, approximate=False, k=200, output_format='DataFrame',
+              n_jobs=None, executor='thread'):
+        """
+        Summary statistics of the events of each measurement.
+
+        All the statistics of a measurement are computed from a single read of
+        the requested channels (see stats.summarize).
+
+        Parameters
+        ----------
+        {FCCollection_stats_pars}
+        ids : hashable | iterable of hashables | None
+            Keys of measurements to summarize. If None is given, all measurements are used.
+        output_format : ['DataFrame' | 'layout']
+            * 'DataFrame' : a tidy table, with one row per measurement and channel
+              (indexed by (ID, channel)) and one column per statistic.
+            * 'layout' : a dictionary of (channel, statistic):DataFrame, where each
+              DataFrame holds the values of the statistic in the layout of the collection.
+        {_bases_parallel_pars}
+
+        Examples
+        --------
+        >>> medians = plate.stats('Y2-A', stats=['median'], output_format='layout')
+        >>> plot_heat_map(medians['Y2-A', 'median'])
+        """
+        table = FCCollection.stats(self, channels, stats, gate, ids, approximate, k, n_jobs,
+                                   executor)
+        if output_format == 'DataFrame':
+            return table
+        elif output_format != 'layout':
+            raise ValueError("output_format must be either 'DataFrame' or 'layout'. "
+                             "Encountered unsupported value %s." % repr(output_format))
+        layouts = collections.OrderedDict()
+        for channel in table.index.get_level_values('channel').unique():
+            values = table.xs(channel, level='channel')
+            for stat in table.columns:
+                layouts[channel, stat] = self._dict2DF(values[stat].to_dict(), np.nan)
+        return layouts
+
     @doc_replacer
     def plot(self, channel_names, kind='histogram',
              gates=None, gate_colors=None,
@@ -614,8 +1616,9 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
                 min_list = []
                 max_list = []
                 for sample in self:
-                    min_list.append(self[sample].data[channel_names].min().values)
-                    max_list.append(self[sample].data[channel_names].max().values)
+                    data = self[sample].get_data(channels=channel_names)
+                    min_list.append(data.min().values)
+                    max_list.append(data.max().values)
 
                 min_list = list(zip(*min_list))
                 max_list = list(zip(*max_list))
@@ -0,0 +1,377 @@
+"""
+Reading the DATA segment of FCS files in chunks of events, by channel, or through a memory map.
+
+Events in list mode DATA segments are fixed size records, so any range of events
+can be read without reading the rest of the file. This allows files larger than
+the available memory to be processed one chunk at a time (iter_data), or to be
+mapped into memory and read on demand (MappedData). Similarly, the values of a few
+channels can be extracted without converting the others (DataLayout.read, FileData).
+
+Supported files are the ones in list mode ($MODE = L) whose parameters are
+stored as floats ($DATATYPE = F or D) or as 8, 16, 32 or 64 bit integers ($DATATYPE = I),
+in data set 0. Values are the same as the ones returned by fcsparser.parse.
+"""
+from __future__ import division
+
+import threading
+
+import numpy
+from pandas import DataFrame, Index, RangeIndex
+
+_kinds = {'F': 'f', 'D': 'f', 'I': 'u'}
+
+
+class DataLayout(object):
+    """
+    Describes where and how the events are stored in the DATA segment of an FCS file.
+    """
+
+    def __init__(self, meta):
+        """
+        Parameters
+        ----------
+        meta : dict
+            The metadata of the file (as returned by fcsparser.parse,
+            with or without reformat_meta).
+
+        Raises
+        ------
+        ValueError
+            If the DATA segment is not in a supported format, or if a keyword
+            describing it is missing.
+        """
+        try:
+            self._from_meta(meta)
+        except KeyError as e:
+            raise ValueError('Keyword {0} is missing from the metadata.'.format(e))
+
+    def _from_meta(self, meta):
+        if meta.get('$MODE', 'L') != 'L':
+            raise ValueError('Only list mode ($MODE = L) data can be read in chunks.')
+        datatype = meta.get('$DATATYPE')
+        if datatype not in _kinds:
+            raise ValueError('$DATATYPE = {0} cannot be read in chunks.'.format(datatype))
+
+        byteord = meta['$BYTEORD'].strip()
+        if byteord in ('1,2,3,4', '1,2'):
+            endian = '<'
+        elif byteord in ('4,3,2,1', '2,1'):
+            endian = '>'
+        else:
+            raise ValueError('Unrecognized byte order ({0})'.format(byteord))
+
+        num_pars = int(meta['$PAR'])
+        if '_channels_' in meta:
+            channels = meta['_channels_']
+            bits = [int(b) for b in channels['$PnB']]
+            ranges = [float(r) for r in channels['$PnR']]
+        else:
+            bits = [int(meta['$P{0}B'.format(i)]) for i in range(1, num_pars + 1)]
+            ranges = [float(meta['$P{0}R'.format(i)]) for i in range(1, num_pars + 1)]
+
+        fields = []
+        masks = []
+        for i, (b, r) in enumerate(zip(bits, ranges)):
+            width = b // 8
+            if b % 8 or width not in (1, 2, 4, 8) or (datatype != 'I' and width not in (4, 8)):
+                raise ValueError('Parameters stored with {0} bits cannot be read in chunks.'.format(b))
+            fields.append(('f{0}'.format(i), '{0}{1}{2}'.format(endian, _kinds[datatype], width)))
+            mask = None
+            if datatype == 'I':
+                # Bits above the range of the parameter are not part of the value
+                mask = int(2 ** numpy.ceil(numpy.log2(r)) - 1)
+                if mask >= 2 ** b - 1:
+                    mask = None
+            masks.append(mask)
+
+        header = meta.get('__header__', {})
+        self.offset = header.get('data start', 0) or int(meta['$BEGINDATA'])
+        self.dtype = numpy.dtype(fields)
+        self.num_events = int(meta['$TOT'])
+        self.masks = masks
+        if '_channel_names_' in meta:
+            self.channel_names = list(meta['_channel_names_'])
+        else:
+            self.channel_names = [meta.get('$P{0}S'.format(i)) or meta['$P{0}N'.format(i)]
+                                  for i in range(1, num_pars + 1)]
+
+    def __repr__(self):
+        return '<DataLayout: {0} events x {1} parameters>'.format(self.num_events,
+                                                                  len(self.channel_names))
+
+    def read(self, fileobj, start=0, stop=None, channels=None, dtype='float32'):
+        """
+        Reads the events in [start, stop) from an open FCS file.
+
+        Parameters
+        ----------
+        fileobj : file
+            The FCS file, opened in binary mode.
+        start, stop : int
+            Range of events to read. If stop is None, events are read until the end.
+        channels : list of str | None
+            Channels to return. If None, all channels are returned.
+        dtype : str | None
+            Type of the returned values. If None, the values keep their stored type
+            (if channels are stored with different types, a type that can hold all of them is used).
+
+        Returns
+        -------
+        DataFrame
+            Events as rows, indexed by their position in the file.
+        """
+        stop = self.num_events if stop is None else min(stop, self.num_events)
+        start = min(start, stop)
+        if channels is None:
+            channels = self.channel_names
+        positions = []
+        for c in channels:
+            try:
+                positions.append(self.channel_names.index(c))
+            except ValueError:
+                raise KeyError(c)
+
+        count = stop - start
+        fileobj.seek(self.offset + start * self.dtype.itemsize)
+        buf = fileobj.read(count * self.dtype.itemsize)
+        if len(buf) < count * self.dtype.itemsize:
+            raise ValueError('The DATA segment of the FCS file is truncated.')
+        records = numpy.frombuffer(buf, dtype=self.dtype, count=count)
+
+        if dtype is None:
+            dtype = numpy.result_type(*[self.dtype[i].newbyteorder('=') for i in positions])
+        values = numpy.empty((count, len(positions)), dtype=dtype, order='F')
+        for j, i in enumerate(positions):
+            column = records['f{0}'.format(i)]
+            if self.masks[i] is not None:
+                column = column & self.masks[i]
+            values[:, j] = column
+        return DataFrame(values, columns=list(channels), index=RangeIndex(start, stop))
+
+    def memmap(self, path):
+        """
+        Maps the DATA segment of the file into memory.
+
+        Returns
+        -------
+        memmap
+            Structured array with one record per event, and one field per channel
+            (named 'f0', 'f1', ... in the order of the channels). The values are stored
+            as in the file (i.e., in the byte order of the file, without masking).
+        """
+        if self.num_events == 0:
+            return numpy.empty(0, dtype=self.dtype)
+        return numpy.memmap(path, dtype=self.dtype, mode='r', offset=self.offset,
+                            shape=(self.num_events,))
+
+
+def iter_data(path, meta, chunksize=100000, channels=None, dtype='float32'):
+    """
+    Iterates over the events of an FCS file in chunks.
+
+    Parameters
+    ----------
+    path : str
+        Path of the FCS file.
+    meta : dict
+        Metadata of the file (e.g., FCMeasurement.meta).
+    chunksize : int
+        Number of events in each chunk.
+    channels : list of str | None
+        Channels to read. If None, all channels are read.
+    dtype : str | None
+        Type of the returned values. See DataLayout.read.
+
+    Yields
+    ------
+    DataFrame
+        Up to chunksize events, indexed by their position in the file.
+    """
+    layout = DataLayout(meta)
+    with open(path, 'rb') as fileobj:
+        for start in range(0, layout.num_events, chunksize):
+            yield layout.read(fileobj, start, start + chunksize, channels, dtype)
+
+
+class MappedData(object):
+    """
+    Read-only access to the events of an FCS file through a memory map.
+
+    Values are only read from the file (and converted to the requested type) for the
+    channels and events that are accessed, and the pages of the file are shared
+    through the OS page cache by all the processes that map it.
+    Pickling a MappedData pickles the path of the file rather than the data.
+    """
+
+    def __init__(self, path, layout, dtype='float32'):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the FCS file.
+        layout : DataLayout
+            Layout of the DATA segment of the file.
+        dtype : str
+            Type of the values returned.
+        """
+        self.path = path
+        self.layout = layout
+        self.dtype = dtype
+        self.records = layout.memmap(path)
+        self.columns = Index(layout.channel_names)
+        self.index = RangeIndex(layout.num_events)
+
+    def __getstate__(self):
+        return {'path': self.path, 'layout': self.layout, 'dtype': self.dtype}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return '<MappedData of {0}: {1} events x {2} channels>'.format(self.path, *self.shape)
+
+    def __len__(self):
+        return self.layout.num_events
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    def column(self, name, rows=None):
+        """
+        The values of a channel, as a new array.
+
+        Parameters
+        ----------
+        name : str
+            Name of the channel.
+        rows : int array | None
+            Positions of the events to read. If None, all events are read.
+        """
+        try:
+            i = self.layout.channel_names.index(name)
+        except ValueError:
+            raise KeyError(name)
+        values = self.records['f{0}'.format(i)]
+        if rows is not None:
+            values = values[rows]  # Only the pages holding these events are read
+        if self.layout.masks[i] is not None:
+            values = values & self.layout.masks[i]
+        dtype = values.dtype.newbyteorder('=') if self.dtype is None else self.dtype
+        return numpy.asarray(values).astype(dtype)
+
+    def frame(self, columns=None, rows=None):
+        """ Materialize the events (or a subset of them) as a DataFrame. """
+        columns = list(self.columns) if columns is None else list(columns)
+        index = self.index if rows is None else self.index[rows]
+        data = dict((c, self.column(c, rows)) for c in columns)
+        return DataFrame(data, index=index, columns=columns)
+
+
+class FileData(object):
+    """
+    Read-only access to the events of an FCS file, read one set of channels at a time.
+
+    The values of a channel are read (and converted to the requested type) the first time
+    the channel is accessed, and then kept, so that only the channels that are used are
+    ever converted. The channels that are missing when several are accessed together
+    (see prefetch and frame) are read in a single pass over the file.
+    Pickling a FileData pickles the path of the file rather than the data.
+    """
+
+    def __init__(self, path, layout, dtype='float32', cache=None, key=None):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the FCS file.
+        layout : DataLayout
+            Layout of the DATA segment of the file.
+        dtype : str
+            Type of the values returned.
+        cache : Cache | None
+            If given, the values of each channel are looked up in the cache (under
+            key + (channel name,)) before being read, and put in the cache once read,
+            so that they are shared with the other FileData of the file.
+        key : tuple | None
+            Key identifying the file and the read parameters in the cache.
+            Required if cache is given.
+        """
+        self.path = path
+        self.layout = layout
+        self.dtype = dtype
+        self.cache = cache if key is not None else None
+        self.key = key
+        self.columns = Index(layout.channel_names)
+        self.index = RangeIndex(layout.num_events)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'path': self.path, 'layout': self.layout, 'dtype': self.dtype,
+                'cache': self.cache, 'key': self.key}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return '<FileData of {0}: {1} events x {2} channels ({3} read)>'.format(
+            self.path, len(self), len(self.columns), len(self._values))
+
+    def __len__(self):
+        return self.layout.num_events
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    def _read(self, names):
+        """ Read the channels that were not read yet (in a single pass over the file). """
+        with self._lock:
+            missing = [c for c in names if c not in self._values]
+            if self.cache is not None:
+                for c in missing:
+                    values = self.cache.get(self.key + (c,))
+                    if values is not None:
+                        self._values[c] = values
+                missing = [c for c in missing if c not in self._values]
+            if missing:
+                with open(self.path, 'rb') as fileobj:
+                    frame = self.layout.read(fileobj, channels=missing, dtype=self.dtype)
+                for c in missing:
+                    self._values[c] = frame[c].values
+                    if self.cache is not None:
+                        self.cache.put(self.key + (c,), self._values[c])
+
+    def prefetch(self, columns):
+        """ Read the given channels (those not read yet, in a single pass over the file). """
+        columns = list(columns)
+        for c in columns:
+            if c not in self.columns:
+                raise KeyError(c)
+        self._read(columns)
+
+    def column(self, name, rows=None):
+        """
+        The values of a channel (an array that must not be modified in place).
+
+        Parameters
+        ----------
+        name : str
+            Name of the channel.
+        rows : int array | None
+            Positions of the events to return. If None, all events are returned.
+        """
+        if name not in self.columns:
+            raise KeyError(name)
+        self._read([name])
+        values = self._values[name]
+        return values if rows is None else values.take(rows)
+
+    def frame(self, columns=None, rows=None):
+        """ Materialize the events (or a subset of them) as a DataFrame. """
+        columns = list(self.columns) if columns is None else list(columns)
+        self.prefetch(columns)
+        index = self.index if rows is None else self.index[rows]
+        data = dict((c, self.column(c, rows)) for c in columns)
+        return DataFrame(data, index=index, columns=columns)
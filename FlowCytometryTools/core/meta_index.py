@@ -0,0 +1,170 @@
+"""
+A persistent index of the metadata of data files.
+
+Reading the metadata of a directory of FCS files requires opening every file
+and parsing its TEXT segment. A MetaIndex keeps the parsed metadata in an SQLite
+database, keyed by file path and read parameters, so that it is only parsed
+again when a file changes (i.e., when its modification time or size changes).
+"""
+import os
+import sqlite3
+import threading
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from FlowCytometryTools.core.utils import parallel_map
+
+_schema = """
+CREATE TABLE IF NOT EXISTS meta (
+    path TEXT NOT NULL,
+    params TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    meta BLOB NOT NULL,
+    PRIMARY KEY (path, params)
+)
+"""
+
+
+def _stat(path):
+    """ (mtime, size) of a file, or None if it cannot be accessed. """
+    try:
+        stat = os.stat(path)
+    except (TypeError, OSError):
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+class MetaIndex(object):
+    """
+    Metadata of data files, stored in an SQLite database.
+
+    Entries are keyed by the absolute path of the file and by a string describing
+    the parameters used to read the metadata. An entry is ignored (and replaced when
+    the metadata is read again) if the file was modified since it was added.
+
+    The index is thread-safe. Like a Cache, it is shared rather than copied, and
+    pickling it keeps only the path of its database.
+
+    Examples
+    --------
+    >>> index = MetaIndex('~/fcs_meta.sqlite')
+    >>> plate = FCPlate.from_dir('plate', datadir, meta_index=index)
+    """
+
+    def __init__(self, path=':memory:'):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the database file (created if needed).
+            ':memory:' keeps the index in memory, for the lifetime of the object.
+        """
+        if path != ':memory:':
+            path = os.path.abspath(os.path.expanduser(path))
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(_schema)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return '<MetaIndex of {0}: {1} entries>'.format(self.path, len(self))
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM meta').fetchone()[0]
+
+    def get(self, path, params=''):
+        """
+        Return the metadata of the file read with the given parameters,
+        or None if it is not in the index or the file was modified since.
+        """
+        stat = _stat(path)
+        if stat is None:
+            return None
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT mtime, size, meta FROM meta WHERE path = ? AND params = ?',
+                (os.path.abspath(path), params)).fetchone()
+        if row is None or tuple(row[:2]) != stat:
+            return None
+        return pickle.loads(bytes(row[2]))
+
+    def put(self, path, meta, params=''):
+        """ Add the metadata of a file (read with the given parameters) to the index. """
+        self.put_many([(path, meta)], params)
+
+    def put_many(self, items, params=''):
+        """
+        Add the metadata of several files (read with the given parameters)
+        to the index, in a single transaction.
+
+        Parameters
+        ----------
+        items : iterable of (path, meta)
+        """
+        rows = []
+        for path, meta in items:
+            stat = _stat(path)
+            if stat is None:
+                continue
+            blob = sqlite3.Binary(pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL))
+            rows.append((os.path.abspath(path), params, stat[0], stat[1], blob))
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, ?)', rows)
+
+    def scan(self, paths, read_meta, params='', n_jobs=-1):
+        """
+        Return the metadata of the given files, reading the files that are not in the index.
+
+        Parameters
+        ----------
+        paths : iterable of str
+        read_meta : callable
+            Takes a path and returns the metadata of the file
+            (read with the parameters described by params).
+        params : str
+            Describes the parameters used to read the metadata.
+        n_jobs : int | None
+            Number of threads reading files concurrently.
+            None or 1 reads the files serially; -1 uses one thread per CPU.
+
+        Returns
+        -------
+        Dictionary of path:metadata
+        """
+        metas = dict((path, self.get(path, params)) for path in paths)
+        missing = [path for path, meta in metas.items() if meta is None]
+        read = parallel_map(read_meta, missing, n_jobs=n_jobs)
+        metas.update(zip(missing, read))
+        self.put_many(zip(missing, read), params)
+        return metas
+
+    def clear(self):
+        """ Remove all the entries of the index. """
+        with self._lock:
+            with self._connection:
+                self._connection.execute('DELETE FROM meta')
+
+    def close(self):
+        """ Close the connection to the database. """
+        with self._lock:
+            self._connection.close()
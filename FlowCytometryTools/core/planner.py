@@ -0,0 +1,192 @@
+"""
+Planning the execution of queued operations (see the apply_now parameter of gate, transform
+and subsample).
+
+Before the operations queued on a measurement are applied, the queue is rewritten into a
+QueuePlan:
+
+- Gates and subsamples are moved ahead of the transformations that they do not depend on
+  (transformations of other channels), so that these transformations only process the
+  events that are kept.
+- Consecutive gates are combined into a single gate, evaluated in one compiled pass
+  (see gates.compile_gate).
+- Consecutive transformations are fused into a single step, which transforms the
+  columns of the events one after the other without creating intermediate measurements.
+
+Operations are only reordered when this cannot change the result. In particular, a
+transformation that fits a spline to the range of its input (use_spln=True without a
+fitted spline) depends on the events, so gates and subsamples are never moved ahead of it.
+Other operations (e.g., compensate) are applied as they are, and are never reordered.
+
+For the same reason, operations that depend on the events (see depends_on_events) cannot be
+applied to chunks of events separately (e.g., by FCMeasurement.iter_data).
+"""
+from FlowCytometryTools.core.gates import CompositeGate
+from FlowCytometryTools.core.transforms import Transformation
+from FlowCytometryTools.core.utils import to_list
+
+_transform_names = ('transform', 'transform_channels')
+
+
+def _transformed_channels(name, params):
+    """
+    The channels that a queued transformation changes, or None if it may change
+    (or drop) any channel.
+    """
+    if not params.get('return_all', True):
+        return None
+    if name == 'transform':
+        return to_list(params.get('channels'))
+    return list(params['transforms'])
+
+
+def _depends_on_events(name, params):
+    """ Whether a queued transformation depends on the events it is applied to. """
+    if not params.get('use_spln', True):
+        return False
+    if name == 'transform':
+        transforms = [params['transform']]
+    else:
+        transforms = params['transforms'].values()
+    return not all(isinstance(t, Transformation) and t.spln is not None for t in transforms)
+
+
+def depends_on_events(queue):
+    """
+    Whether the result of applying the queued operations to an event depends on the other
+    events: subsamples (that select events by their number or position), and transformations
+    that fit a spline to the range of their input.
+    Gates, compensation and other transformations are applied to each event independently.
+    """
+    for name, params in queue:
+        if name in _transform_names:
+            if _depends_on_events(name, params):
+                return True
+        elif name not in ('gate', 'compensate'):
+            return True
+    return False
+
+
+def _can_move_ahead(name, params, step):
+    """ Whether a queued gate or subsample can be applied before a step of the plan. """
+    if step[0] != 'transform':
+        return False
+    for transform_name, transform_params in step[1]:
+        if _depends_on_events(transform_name, transform_params):
+            return False
+        if name == 'gate':
+            changed = _transformed_channels(transform_name, transform_params)
+            if changed is None or set(changed) & set(params['gate'].channels):
+                return False
+    return True
+
+
+class QueuePlan(object):
+    """
+    An execution plan for the operations queued on a measurement, produced by plan_queue.
+
+    The plan is a list of steps (kind, operations), where kind is 'gate', 'subsample',
+    'transform' or 'call', and operations is the list of the queued (name, params)
+    that the step applies.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        def describe(name, params):
+            if name == 'gate':
+                return 'gate {0}'.format(params['gate'].name)
+            elif name == 'subsample':
+                return 'subsample {0!r} ({1})'.format(params['key'], params.get('order', 'random'))
+            elif name == 'transform':
+                transform = params['transform']
+                if isinstance(transform, Transformation):
+                    transform = transform.tname or transform.tfun
+                channels = params.get('channels')
+                return 'transform {0} of {1}'.format(
+                    getattr(transform, '__name__', transform),
+                    'all channels' if channels is None else channels)
+            elif name == 'transform_channels':
+                return 'transform_channels of {0}'.format(sorted(params['transforms']))
+            return name
+
+        lines = []
+        for i, (kind, operations) in enumerate(self.steps):
+            join = ' & '.join if kind == 'gate' else '; '.join
+            lines.append('{0}: {1}: {2}'.format(
+                i, kind, join(describe(*operation) for operation in operations)))
+        return '\n'.join(lines)
+
+    def apply(self, measurement):
+        """
+        Applies the plan to a measurement (without a queue).
+        Returns the new measurement.
+        """
+        for kind, operations in self.steps:
+            if kind == 'gate':
+                gate = operations[0][1]['gate']
+                for name, params in operations[1:]:
+                    gate = CompositeGate(gate, 'and', params['gate'])
+                measurement = measurement.gate(gate)
+            elif kind == 'transform':
+                measurement = _apply_transforms(measurement, operations)
+            else:
+                name, params = operations[0]
+                measurement = getattr(measurement, name)(**params)
+        return measurement
+
+
+def _apply_transforms(measurement, operations):
+    """ Applies consecutive transformations to the view of a measurement, in one step. """
+    view = measurement._get_view()
+    ID = None
+    for name, params in operations:
+        if name == 'transform':
+            view = measurement._transform_view(view, **params)[0]
+        else:
+            view = measurement._transform_channels_view(view, **params)
+        if params.get('ID') is not None:
+            ID = params['ID']
+    new = measurement.copy()
+    new._set_view(view)
+    if ID is not None:
+        new.ID = ID
+    return new
+
+
+def plan_queue(queue):
+    """
+    Plans the execution of the operations queued on a measurement (see module documentation).
+
+    Parameters
+    ----------
+    queue : list of (name, params)
+        The queued operations (e.g., Measurement.queue).
+
+    Returns
+    -------
+    QueuePlan
+    """
+    steps = []
+    for name, params in queue:
+        operation = (name, params)
+        if name in ('gate', 'subsample'):
+            position = len(steps)
+            while position > 0 and _can_move_ahead(name, params, steps[position - 1]):
+                position -= 1
+            if name == 'gate' and position > 0 and steps[position - 1][0] == 'gate':
+                steps[position - 1][1].append(operation)
+            else:
+                steps.insert(position, (name, [operation]))
+        elif name in _transform_names:
+            if steps and steps[-1][0] == 'transform':
+                steps[-1][1].append(operation)
+            else:
+                steps.append(('transform', [operation]))
+        else:
+            steps.append(('call', [operation]))
+    return QueuePlan(steps)
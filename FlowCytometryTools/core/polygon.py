@@ -0,0 +1,209 @@
+"""
+Point-in-polygon tests used by polygon gates.
+
+The polygon is split into horizontal slabs (one between every two consecutive vertex
+y values). Within a slab the same few edges are crossed by every horizontal ray, so each
+event is only tested against those edges rather than against all edges of the polygon.
+Events outside the bounding box of the polygon are rejected before any edge is tested.
+
+A point is inside the polygon if a ray cast from it crosses the edges of the polygon an
+odd number of times (even-odd rule, as used by matplotlib.path.Path.contains_points).
+The crossing test is the one used by matplotlib, so results agree with it, including
+for points on the edges. Points with a NaN coordinate are outside the polygon.
+"""
+from __future__ import division
+
+import numpy
+
+from FlowCytometryTools.core.utils import Cache, parallel_map
+
+#: Process-wide cache of EdgeTables, keyed by the vertices of the polygon.
+edge_cache = Cache(maxsize=256)
+
+_chunksize = 2 ** 18  # Number of events tested at a time
+
+
+class EdgeTable(object):
+    """
+    The edges of a polygon, arranged for fast point-in-polygon tests.
+
+    Use edge_table(vert) to get the (cached) table of a polygon.
+    """
+
+    def __init__(self, vert):
+        """
+        Parameters
+        ----------
+        vert : list of 2-tuples
+            [(x1, y1), (x2, y2), (x3, y3)]
+            The vertices of the polygon (the polygon is closed implicitly).
+        """
+        vert = numpy.asarray(vert, dtype=float).reshape(-1, 2)
+        self.vert = vert
+        x0, y0 = vert[:, 0], vert[:, 1]
+        x1, y1 = numpy.roll(x0, -1), numpy.roll(y0, -1)
+        self.xmin, self.xmax = x0.min(), x0.max()
+        self.ymin, self.ymax = y0.min(), y0.max()
+
+        # A horizontal ray at height y crosses the edges for which min(y0, y1) < y <= max(y0, y1).
+        # This set of edges is the same for all y between two consecutive vertex y values.
+        self.ys = numpy.unique(y0)
+        lo, hi = numpy.minimum(y0, y1), numpy.maximum(y0, y1)
+        self.slabs = [None]  # slab k holds ys[k - 1] < y <= ys[k]
+        for k in range(1, len(self.ys)):
+            i = numpy.flatnonzero((lo <= self.ys[k - 1]) & (hi >= self.ys[k]))
+            # (x0, y0, x1, y1, whether the edge goes up) for each edge crossed in the slab
+            self.slabs.append([(x0[j], y0[j], x1[j], y1[j], y1[j] > y0[j]) for j in i])
+        self.edges = (x0, y0, x1, y1)
+        self._grids = {}
+
+    def __repr__(self):
+        return '<EdgeTable with {0} vertices>'.format(len(self.vert))
+
+    def contains(self, x, y, grid=None, n_jobs=None):
+        """
+        Returns a boolean array which is True for the points (x, y) that are inside the polygon.
+
+        Parameters
+        ----------
+        x, y : array
+            Coordinates of the points.
+        grid : None | int
+            If None, each point inside the bounding box is tested against the edges.
+            If int, the bounding box is first divided into grid x grid cells, and points
+            are only tested against the edges if they fall in a cell that an edge passes through;
+            the other points take the value of their cell. Worthwhile for millions of points.
+        n_jobs : int | None
+            Number of threads used to test the points (in chunks).
+            None or 1 tests the points in the calling thread; -1 uses one thread per CPU.
+        """
+        x = numpy.asarray(x)
+        y = numpy.asarray(y)
+        starts = range(0, len(x), _chunksize)
+        if len(starts) <= 1:
+            return self._contains(x, y, grid)
+
+        def contains_chunk(start):
+            stop = start + _chunksize
+            return self._contains(x[start:stop], y[start:stop], grid)
+
+        return numpy.concatenate(parallel_map(contains_chunk, starts, n_jobs=n_jobs))
+
+    def _contains(self, x, y, grid=None):
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+        result = numpy.zeros(len(x), dtype=bool)
+        # Bounding box
+        candidates = numpy.flatnonzero((x >= self.xmin) & (x <= self.xmax) &
+                                       (y >= self.ymin) & (y <= self.ymax))
+        if grid is None or self.xmin == self.xmax or self.ymin == self.ymax:
+            result[candidates] = self._crossings(x[candidates], y[candidates])
+            return result
+
+        cells, dx, dy = self._grid(grid)
+        px, py = x[candidates], y[candidates]
+        i = numpy.minimum(((py - self.ymin) / dy).astype(int), grid - 1)
+        j = numpy.minimum(((px - self.xmin) / dx).astype(int), grid - 1)
+        state = cells[i, j]
+        result[candidates[state == 1]] = True
+        boundary = numpy.flatnonzero(state == 2)
+        result[candidates[boundary]] = self._crossings(px[boundary], py[boundary])
+        return result
+
+    def _crossings(self, x, y):
+        """ The even-odd test for points inside the bounding box. """
+        inside = numpy.zeros(len(x), dtype=bool)
+        # Group the points by slab
+        k = numpy.searchsorted(self.ys, y, side='left')
+        k = k.astype(numpy.int16 if len(self.ys) < 2 ** 15 else numpy.intp)
+        order = numpy.argsort(k, kind='stable')
+        bounds = numpy.r_[0, numpy.cumsum(numpy.bincount(k, minlength=len(self.ys) + 1))]
+        for s in range(1, len(self.ys)):
+            a, b = bounds[s], bounds[s + 1]
+            if a == b or not self.slabs[s]:
+                continue
+            index = order[a:b]
+            px, py = x[index], y[index]
+            odd = numpy.zeros(len(index), dtype=bool)
+            lhs = numpy.empty(len(index))
+            rhs = numpy.empty(len(index))
+            for x0, y0, x1, y1, up in self.slabs[s]:
+                # Same expression as matplotlib (the ray points toward +x).
+                numpy.multiply(numpy.subtract(y1, py, out=lhs), x0 - x1, out=lhs)
+                numpy.multiply(numpy.subtract(x1, px, out=rhs), y0 - y1, out=rhs)
+                crossed = lhs >= rhs
+                if not up:
+                    numpy.logical_not(crossed, out=crossed)
+                numpy.logical_xor(odd, crossed, out=odd)
+            inside[index] = odd
+        return inside
+
+    def _grid(self, grid):
+        """
+        Classify the cells of a grid over the bounding box as
+        outside (0), inside (1) or crossed by an edge (2).
+        """
+        if grid in self._grids:
+            return self._grids[grid]
+        dx = (self.xmax - self.xmin) / grid
+        dy = (self.ymax - self.ymin) / grid
+        cells = numpy.zeros((grid, grid), dtype=numpy.uint8)
+        # Cells are slightly enlarged so that points assigned to a cell
+        # with rounding errors are still covered by it.
+        eps = 1e-6
+        for x0, y0, x1, y1 in zip(*self.edges):
+            j0, j1 = [int(numpy.clip(numpy.floor((v - self.xmin) / dx + d), 0, grid - 1))
+                      for v, d in ((min(x0, x1), -eps), (max(x0, x1), eps))]
+            i0, i1 = [int(numpy.clip(numpy.floor((v - self.ymin) / dy + d), 0, grid - 1))
+                      for v, d in ((min(y0, y1), -eps), (max(y0, y1), eps))]
+            jj, ii = numpy.meshgrid(numpy.arange(j0, j1 + 1), numpy.arange(i0, i1 + 1))
+            # The edge passes through a cell if the corners of the cell are not all
+            # strictly on the same side of the edge.
+            side = []
+            for cj in (jj - eps, jj + 1 + eps):
+                for ci in (ii - eps, ii + 1 + eps):
+                    cx = self.xmin + cj * dx
+                    cy = self.ymin + ci * dy
+                    side.append((x1 - x0) * (cy - y0) - (y1 - y0) * (cx - x0))
+            side = numpy.array(side)
+            crossed = (side.min(axis=0) <= 0) & (side.max(axis=0) >= 0)
+            cells[ii[crossed], jj[crossed]] = 2
+        # Cells that no edge passes through are entirely inside or outside.
+        i, j = numpy.nonzero(cells != 2)
+        centers_x = self.xmin + (j + 0.5) * dx
+        centers_y = self.ymin + (i + 0.5) * dy
+        cells[i, j] = self._crossings(centers_x, centers_y)
+        self._grids[grid] = cells, dx, dy
+        return self._grids[grid]
+
+
+def edge_table(vert):
+    """
+    Returns the EdgeTable of the polygon with the given vertices.
+    Tables are kept in edge_cache, so that they are built once per polygon.
+    """
+    key = tuple(tuple(float(c) for c in v) for v in vert)
+    table = edge_cache.get(key)
+    if table is None:
+        table = EdgeTable(key)
+        edge_cache.put(key, table)
+    return table
+
+
+def contains_points(vert, x, y, grid=None, n_jobs=None):
+    """
+    Returns a boolean array which is True for the points (x, y) inside the polygon.
+
+    Parameters
+    ----------
+    vert : list of 2-tuples
+        [(x1, y1), (x2, y2), (x3, y3)]
+        The vertices of the polygon.
+    x, y : array
+        Coordinates of the points.
+    grid : None | int
+        See EdgeTable.contains.
+    n_jobs : int | None
+        See EdgeTable.contains.
+    """
+    return edge_table(vert).contains(x, y, grid=grid, n_jobs=n_jobs)
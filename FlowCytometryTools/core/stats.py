@@ -0,0 +1,373 @@
+"""
+Summary statistics computed incrementally over chunks of events.
+
+RunningStats and QuantileSketch hold the statistics of the events seen so far in
+bounded memory, and can be merged, so that statistics can be computed over files that
+do not fit in memory and combined across chunks, measurements and collections.
+"""
+from __future__ import division
+
+import numpy
+from pandas import DataFrame
+
+_basic_stats = ('count', 'mean', 'std', 'cv', 'min', 'max')
+
+
+def extremes(values, chunksize=2 ** 16):
+    """
+    Minimum and maximum of an array (NaN values are ignored), computed in a single pass:
+    each chunk of values is reduced to both while it is in the CPU cache.
+
+    Returns
+    -------
+    (min, max) : floats (NaN if there are no values)
+    """
+    low = high = numpy.nan
+    for start in range(0, len(values), chunksize):
+        chunk = values[start:start + chunksize]
+        low = numpy.fmin(low, numpy.fmin.reduce(chunk))
+        high = numpy.fmax(high, numpy.fmax.reduce(chunk))
+    return float(low), float(high)
+
+
+def _percentile(name):
+    """ The percentile requested by a statistic named p<q> (e.g., 'p5', 'p97.5'), or None. """
+    if name == 'median':
+        return 50.0
+    if name.startswith('p'):
+        try:
+            q = float(name[1:])
+        except ValueError:
+            return None
+        if 0 <= q <= 100:
+            return q
+    return None
+
+
+def summarize(columns, stats=('count', 'mean', 'median', 'cv', 'p5', 'p95')):
+    """
+    Summary statistics of the values of several channels.
+
+    Parameters
+    ----------
+    columns : dict of name:array | DataFrame
+        Values of each channel.
+    stats : list of str
+        Statistics to compute, among:
+
+        * 'count', 'mean', 'std' (sample standard deviation), 'min', 'max'
+        * 'cv' : coefficient of variation (std / mean)
+        * 'median', and 'p<q>' for the q-th percentile (e.g., 'p5', 'p97.5')
+
+        NaN values are ignored (as in RunningStats). All the percentiles of a channel
+        are computed with a single partition of its values.
+
+    Returns
+    -------
+    DataFrame
+        Statistics (rows) of each channel (columns).
+    """
+    stats = list(stats)
+    percentiles = [_percentile(name) for name in stats]
+    for name, q in zip(stats, percentiles):
+        if q is None and name not in _basic_stats:
+            raise ValueError('Unknown statistic {0!r}.'.format(name))
+    qs = sorted(set(q for q in percentiles if q is not None))
+
+    names = list(columns.keys())
+    result = numpy.full((len(stats), len(names)), numpy.nan)
+    for j, name in enumerate(names):
+        values = numpy.asarray(columns[name], dtype=float)
+        values = values[~numpy.isnan(values)]
+        count = len(values)
+        computed = {'count': count}
+        if count:
+            computed['mean'] = mean = values.mean()
+            computed['min'] = values.min()
+            computed['max'] = values.max()
+            if count > 1:
+                computed['std'] = std = values.std(ddof=1)
+                with numpy.errstate(invalid='ignore', divide='ignore'):
+                    computed['cv'] = std / mean
+            if qs:
+                computed.update(zip(qs, numpy.percentile(values, qs)))
+        for i, (stat, q) in enumerate(zip(stats, percentiles)):
+            result[i, j] = computed.get(stat if q is None else q, numpy.nan)
+    return DataFrame(result, index=stats, columns=names)
+
+
+class RunningStats(object):
+    """
+    Count, mean, standard deviation, min and max of each channel,
+    updated one chunk of events at a time.
+
+    NaN values are ignored (as in DataFrame.describe).
+    Statistics accumulated over different chunks (e.g., in different processes)
+    can be combined with merge.
+
+    Examples
+    --------
+    >>> running = RunningStats()
+    >>> for chunk in measurement.iter_data():
+    ...     running.update(chunk)
+    >>> running.result()
+    """
+    index = ['count', 'mean', 'std', 'min', 'max']
+
+    def __init__(self):
+        self.columns = None
+        self.count = None
+        self.mean = None
+        self.m2 = None  # Sum of squared deviations from the mean
+        self.min = None
+        self.max = None
+
+    def update(self, data):
+        """
+        Adds a chunk of events (DataFrame) to the statistics.
+        """
+        values = numpy.asarray(data, dtype=float)
+        other = RunningStats()
+        other.columns = list(data.columns)
+        valid = ~numpy.isnan(values)
+        other.count = valid.sum(axis=0)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            other.mean = numpy.where(valid, values, 0).sum(axis=0) / other.count
+            deviations = numpy.where(valid, values - other.mean, 0)
+        other.m2 = (deviations ** 2).sum(axis=0)
+        if len(values):
+            other.min = numpy.fmin.reduce(values, axis=0)
+            other.max = numpy.fmax.reduce(values, axis=0)
+        else:
+            other.min = numpy.full(values.shape[1], numpy.nan)
+            other.max = numpy.full(values.shape[1], numpy.nan)
+        self.merge(other)
+
+    def merge(self, other):
+        """
+        Combines the statistics with those of another RunningStats
+        (computed over other events of the same channels).
+        """
+        if other.columns is None:
+            return
+        if self.columns is None:
+            self.columns = other.columns
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        if list(other.columns) != list(self.columns):
+            raise ValueError('Cannot merge statistics of different channels.')
+        count = self.count + other.count
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            delta = other.mean - self.mean
+            mean = self.mean + delta * other.count / count
+            m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        # Channels for which one of the sides has no values
+        mean = numpy.where(other.count == 0, self.mean, numpy.where(self.count == 0, other.mean, mean))
+        m2 = numpy.where(other.count == 0, self.m2, numpy.where(self.count == 0, other.m2, m2))
+        self.count, self.mean, self.m2 = count, mean, m2
+        self.min = numpy.fmin(self.min, other.min)
+        self.max = numpy.fmax(self.max, other.max)
+
+    def result(self):
+        """
+        Returns a DataFrame with the statistics (rows) of each channel (columns).
+        The standard deviation is the sample standard deviation (normalized by count - 1).
+        """
+        if self.columns is None:
+            return DataFrame(index=self.index)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            std = numpy.sqrt(self.m2 / (self.count - 1))
+        std = numpy.where(self.count > 1, std, numpy.nan)
+        mean = numpy.where(self.count > 0, self.mean, numpy.nan)
+        return DataFrame([self.count, mean, std, self.min, self.max],
+                         index=self.index, columns=self.columns, dtype=float)
+
+
+class QuantileSketch(object):
+    """
+    Approximate quantiles of a stream of values, in bounded memory (a KLL sketch).
+
+    The sketch keeps a hierarchy of compactors: level h holds sorted samples that each
+    stand for 2 ** h values. When the sketch is full, a level is compacted by keeping
+    every other of its values (starting at a random offset), and promoting them to the
+    next level. The sketch holds O(k) values whatever the number of values added, and
+    the rank of the values returned by quantile is within +/- error * count of the
+    requested rank (with 99% confidence).
+
+    Sketches of different chunks, measurements or collections can be combined with merge.
+    NaN values are ignored.
+
+    Examples
+    --------
+    >>> sketch = QuantileSketch()
+    >>> for chunk in measurement.iter_data(channels='FSC-A'):
+    ...     sketch.update(chunk['FSC-A'].values)
+    >>> sketch.quantile([0.05, 0.5, 0.95])
+    """
+
+    def __init__(self, k=200, seed=None):
+        """
+        Parameters
+        ----------
+        k : int
+            Size of the largest compactor. The rank error decreases as about 1 / k.
+        seed : int | None
+            Seed of the random offsets used by the compactions.
+        """
+        self.k = k
+        self.count = 0
+        self.min = numpy.nan
+        self.max = numpy.nan
+        self.levels = [numpy.empty(0)]
+        self._random = numpy.random.RandomState(seed)
+
+    def __repr__(self):
+        return '<QuantileSketch: {0} values, {1} retained>'.format(self.count, self.retained)
+
+    @property
+    def retained(self):
+        """ Number of values held by the sketch. """
+        return sum(len(items) for items in self.levels)
+
+    @property
+    def error(self):
+        """
+        Bound on the normalized rank error of the quantiles (with 99% confidence),
+        or 0 if the sketch holds all the values that were added.
+        """
+        if len(self.levels) == 1:
+            return 0.0
+        return 2.296 / self.k ** 0.9723  # Empirical bound of KLL sketches
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(numpy.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        while self.retained > sum(self._capacity(h) for h in range(len(self.levels))):
+            level = next(h for h, items in enumerate(self.levels)
+                         if len(items) > self._capacity(h))
+            if level + 1 == len(self.levels):
+                self.levels.append(numpy.empty(0))
+            items = numpy.sort(self.levels[level])
+            odd = len(items) % 2  # An odd value out stays at its level
+            promoted = items[odd + self._random.randint(2)::2]
+            self.levels[level] = items[:odd]
+            self.levels[level + 1] = numpy.concatenate([self.levels[level + 1], promoted])
+
+    def update(self, values):
+        """ Adds values (an array) to the sketch. """
+        values = numpy.asarray(values, dtype=float).ravel()
+        values = values[~numpy.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.min = numpy.fmin(self.min, values.min())
+        self.max = numpy.fmax(self.max, values.max())
+        self.levels[0] = numpy.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """ Combines the sketch with another QuantileSketch (of other values). """
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(numpy.empty(0))
+            self.levels[level] = numpy.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = numpy.fmin(self.min, other.min)
+        self.max = numpy.fmax(self.max, other.max)
+        self._compress()
+
+    def quantile(self, q):
+        """
+        Approximate quantiles.
+
+        Parameters
+        ----------
+        q : float | array of floats
+            Quantiles to return (between 0 and 1).
+
+        Returns
+        -------
+        float | array of floats
+            For each q, a value whose rank is within error * count of q * count
+            (NaN if the sketch is empty).
+        """
+        scalar = numpy.isscalar(q)
+        q = numpy.atleast_1d(numpy.asarray(q, dtype=float))
+        if self.count == 0:
+            result = numpy.full(q.shape, numpy.nan)
+        else:
+            items = numpy.concatenate(self.levels)
+            weights = numpy.concatenate([numpy.full(len(l), 2 ** h, dtype=float)
+                                         for h, l in enumerate(self.levels)])
+            order = numpy.argsort(items, kind='mergesort')
+            ranks = numpy.cumsum(weights[order])
+            positions = numpy.searchsorted(ranks, q * ranks[-1], side='left')
+            result = items[order][numpy.clip(positions, 0, len(items) - 1)]
+            result = numpy.where(q <= 0, self.min, numpy.where(q >= 1, self.max, result))
+        return result[0] if scalar else result
+
+    def bounds(self, q):
+        """
+        Bounds of the exact quantiles (with 99% confidence): the approximate quantiles
+        at q - error and q + error.
+
+        Returns
+        -------
+        (low, high) : floats | arrays of floats
+        """
+        q = numpy.asarray(q, dtype=float)
+        return (self.quantile(numpy.clip(q - self.error, 0, 1)),
+                self.quantile(numpy.clip(q + self.error, 0, 1)))
+
+
+def summarize_chunks(chunks, stats=('count', 'mean', 'median', 'cv', 'p5', 'p95'), k=200):
+    """
+    Summary statistics of the channels of chunks of events, computed in a single pass
+    in bounded memory: percentiles are approximated with a QuantileSketch per channel.
+
+    Parameters
+    ----------
+    chunks : iterable of DataFrames
+        Chunks of events (e.g., Measurement.iter_data).
+    stats : list of str
+        Statistics to compute (see summarize), and 'rank_error' for the bound on the
+        normalized rank error of the percentiles (see QuantileSketch.error).
+    k : int
+        Size of the quantile sketches (see QuantileSketch).
+
+    Returns
+    -------
+    DataFrame
+        Statistics (rows) of each channel (columns).
+    """
+    stats = list(stats)
+    percentiles = [_percentile(name) for name in stats]
+    for name, q in zip(stats, percentiles):
+        if q is None and name not in _basic_stats + ('rank_error',):
+            raise ValueError('Unknown statistic {0!r}.'.format(name))
+    running = RunningStats()
+    sketches = None
+    for chunk in chunks:
+        running.update(chunk)
+        if sketches is None:
+            sketches = [QuantileSketch(k) for _ in chunk.columns]
+        for sketch, column in zip(sketches, chunk.columns):
+            sketch.update(chunk[column].values)
+    if sketches is None:
+        return DataFrame(index=stats)
+
+    basic = running.result()
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        basic.loc['cv'] = basic.loc['std'] / basic.loc['mean']
+    result = DataFrame(numpy.nan, index=stats, columns=basic.columns)
+    for name, q in zip(stats, percentiles):
+        if q is not None:
+            result.loc[name] = [sketch.quantile(q / 100) for sketch in sketches]
+        elif name == 'rank_error':
+            result.loc[name] = [sketch.error for sketch in sketches]
+        else:
+            result.loc[name] = basic.loc[name]
+    return result
@@ -0,0 +1,199 @@
+"""
+Storing the events of a collection of measurements on disk, for fast repeated loading.
+
+A store is a directory holding:
+
+- manifest.pkl : the ID of the collection, its layout (for ordered collections),
+  and the ID, metadata, position and history of each measurement.
+- one compressed numpy archive (.npz) per measurement, with one array per channel.
+
+Loading a store only reads the manifest. The events of a measurement are read when
+they are accessed, one channel at a time (e.g., gating on two channels only
+decompresses those two channels of the measurements that are gated).
+"""
+from __future__ import division
+
+import os
+
+import numpy
+from pandas import DataFrame, Index, RangeIndex
+
+from FlowCytometryTools.core.bases import OrderedCollection
+from FlowCytometryTools.core.utils import save, load, parallel_map, to_list
+from FlowCytometryTools.core.views import EventView
+
+manifest_name = 'manifest.pkl'
+_version = 1
+
+
+class StoredData(object):
+    """
+    Read-only access to the events of a measurement saved in a store.
+
+    Channels are read from the archive when they are accessed.
+    Pickling a StoredData pickles the path of the archive rather than the data.
+    """
+
+    def __init__(self, path, columns, num_events):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the .npz archive of the measurement.
+        columns : list of str
+            Names of the channels (stored in the archive as 'c0', 'c1', ...).
+        num_events : int
+            Number of events.
+        """
+        self.path = path
+        self.columns = Index(columns)
+        self.num_events = num_events
+        self._index = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'columns': list(self.columns), 'num_events': self.num_events}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return '<StoredData of {0}: {1} events x {2} channels>'.format(self.path, *self.shape)
+
+    def __len__(self):
+        return self.num_events
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    @property
+    def index(self):
+        if self._index is None:
+            with numpy.load(self.path) as archive:
+                if 'index' in archive.files:
+                    self._index = Index(archive['index'])
+                else:
+                    self._index = RangeIndex(self.num_events)
+        return self._index
+
+    def column(self, name, rows=None):
+        """
+        The values of a channel, as a new array.
+
+        Parameters
+        ----------
+        name : str
+            Name of the channel.
+        rows : int array | None
+            Positions of the events to return. If None, all events are returned.
+        """
+        try:
+            i = self.columns.get_loc(name)
+        except KeyError:
+            raise KeyError(name)
+        with numpy.load(self.path) as archive:
+            values = archive['c{0}'.format(i)]
+        if rows is not None:
+            values = values.take(rows)
+        return values
+
+    def frame(self, columns=None, rows=None):
+        """ Materialize the events (or a subset of them) as a DataFrame. """
+        columns = list(self.columns) if columns is None else list(columns)
+        index = self.index if rows is None else self.index[rows]
+        data = dict((c, self.column(c, rows)) for c in columns)
+        return DataFrame(data, index=index, columns=columns)
+
+
+def _write_measurement(path, view, compress=True):
+    """
+    Write the events of an EventView to an .npz archive.
+    Returns (columns, number of events).
+    """
+    view.prefetch()
+    arrays = dict(('c{0}'.format(i), numpy.asarray(view.column(c)))
+                  for i, c in enumerate(view.columns))
+    index = view.index
+    if not (isinstance(index, RangeIndex) and index.start == 0 and index.step == 1):
+        arrays['index'] = numpy.asarray(index)
+    with open(path, 'wb') as f:
+        if compress:
+            numpy.savez_compressed(f, **arrays)
+        else:
+            numpy.savez(f, **arrays)
+    return list(view.columns), len(view)
+
+
+def write_store(collection, path, ids=None, compress=True, n_jobs=None):
+    """
+    Write the measurements of a collection to a store (see module documentation).
+
+    Queued operations are applied to the measurements before they are written.
+
+    Parameters
+    ----------
+    collection : FCCollection
+    path : str
+        Directory of the store (created if needed).
+    ids : hashable | iterable of hashables | None
+        Keys of the measurements to write. If None, all measurements are written.
+    compress : bool
+        Compress the archives of the measurements.
+    n_jobs : int | None
+        Number of threads used to write the measurements.
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    keys = list(collection.keys()) if ids is None else to_list(ids)
+
+    def write(item):
+        i, key = item
+        measurement = collection[key]
+        view = measurement._get_view()
+        # The measurement an operation was applied to (recorded as 'self') is not saved
+        history = [(name, dict((k, v) for k, v in params.items() if k != 'self'))
+                   for name, params in list(measurement.history) + list(measurement.queue)]
+        entry = {'key': key, 'ID': measurement.ID, 'datafile': measurement.datafile,
+                 'meta': measurement.meta, 'position': dict(measurement.position),
+                 'history': history,
+                 'file': None, 'columns': None, 'num_events': None}
+        if view is not None:
+            entry['file'] = 'measurement_{0}.npz'.format(i)
+            entry['columns'], entry['num_events'] = _write_measurement(
+                os.path.join(path, entry['file']), view, compress)
+        return entry
+
+    manifest = {'version': _version, 'ID': collection.ID,
+                'measurements': parallel_map(write, enumerate(keys), n_jobs=n_jobs),
+                'layout': None}
+    if isinstance(collection, OrderedCollection):
+        positions = collection.get_positions()
+        manifest['layout'] = {'shape': collection.shape,
+                              'row_labels': list(collection.row_labels),
+                              'col_labels': list(collection.col_labels),
+                              'positions': dict((k, positions[k]) for k in keys)}
+    save(manifest, os.path.join(path, manifest_name))
+
+
+def read_manifest(path):
+    """ Read the manifest of the store in the given directory. """
+    manifest = load(os.path.join(path, manifest_name))
+    if manifest.get('version') != _version:
+        raise ValueError('Unsupported store version: {0}'.format(manifest.get('version')))
+    return manifest
+
+
+def read_measurement(path, entry, measurement_class):
+    """
+    Create a measurement from its entry in the manifest of the store in the given directory.
+    The events are not read until they are accessed.
+    """
+    measurement = measurement_class(entry['ID'], datafile=entry['datafile'], readmeta=False)
+    measurement.set_meta(entry['meta'])
+    if entry['file'] is not None:
+        stored = StoredData(os.path.abspath(os.path.join(path, entry['file'])),
+                            entry['columns'], entry['num_events'])
+        measurement._set_view(EventView(stored))
+    measurement.history = list(entry['history'])
+    measurement.position = dict(entry['position'])
+    return measurement
@@ -7,11 +7,11 @@ and an exponential is its inverse).
 References:
 Bagwell. Cytometry Part A, 2005.
 Parks, Roederer, and Moore. Cytometry Part A, 2006.
+Moore and Parks. Cytometry Part A, 2012.
 Trotter, Joseph. In Current Protocols in Cytometry. John Wiley & Sons, Inc., 2001.
 
 TODO:
 - Add scale parameters (r,d) to glog (if needed?)
-- Implement logicle transformation.
 - Add support for transforming a numpy array
 """
 from __future__ import division
@@ -19,17 +19,28 @@ from __future__ import division
 import warnings
 
 from numpy import (log, log10, exp, where, sign, vectorize, min, max, linspace, logspace, r_, abs,
-                   asarray)
-from numpy.lib.shape_base import apply_along_axis
-from scipy.interpolate import InterpolatedUnivariateSpline
+                   asarray, minimum, errstate, arange, intp, interp, empty_like, searchsorted,
+                   clip, flatnonzero, diff, ascontiguousarray)
+from scipy.interpolate import InterpolatedUnivariateSpline, PPoly
 from scipy.optimize import brentq
 
-from FlowCytometryTools.core.utils import to_list, BaseObject
+from FlowCytometryTools.core.utils import to_list, BaseObject, Cache, parallel_map
 
 _machine_max = 2 ** 18
 _l_mmax = log10(_machine_max)
 _display_max = 10 ** 4
 
+#: Process-wide cache of the splines fitted by Transformation.set_spline.
+#: Adjust the capacity by setting spline_cache.maxsize, inspect spline_cache.stats,
+#: and persist it across sessions with spline_cache.save(path) / spline_cache.load(path).
+spline_cache = Cache(maxsize=256)
+
+#: Process-wide cache of the lookup tables computed by Transformation.lut (bounded to 64 MB).
+lut_cache = Cache(maxsize=2 ** 26, getsizeof=lambda table: table.nbytes)
+
+#: Largest bit depth for which lookup tables are used (a 20 bit table takes 8 MB).
+max_lut_bits = 20
+
 
 def linear(x, old_range, new_range):
     """
@@ -222,7 +233,52 @@ def _make_hlog_numeric(b, r, d):
     return find_inv
 
 
-def hlog(x, b=500, r=_display_max, d=_l_mmax):
+def _hlog_newton(x, b, r, d, tol=1e-6, max_iter=50):
+    """
+    Compute the hlog transformation of an array by solving hlog_inv(y) = x with Newton's method.
+
+    hlog_inv is odd, so the equation is solved for |x| and the sign is restored at the end.
+    For y >= 0, hlog_inv(y) = 10**(a*y) - 1 + b*a*y (with a = d/r) is increasing and convex,
+    and both log10(|x| + 1)/a and |x|/(b*a) are upper bounds of the root. Newton's iterations
+    started from the smaller of the two therefore decrease monotonically towards the root,
+    so no bracketing is needed and all events are iterated together as whole arrays.
+
+    Parameters
+    ----------
+    x : array
+        values to be transformed.
+    b, r, d : num
+        hlog parameters (see hlog).
+    tol : float
+        Iterations stop once the largest Newton step (in transformed units) is below tol.
+    max_iter : int
+        Maximal number of iterations.
+
+    Returns
+    -------
+    Array of transformed values.
+    """
+    x = asarray(x, dtype=float)
+    s = sign(x)
+    ax = abs(x)
+    a = 1. * d / r
+    ln10 = log(10)
+
+    with errstate(divide='ignore'):
+        y = log10(ax + 1) / a
+        if b > 0:
+            y = minimum(y, ax / (b * a))
+
+    for _ in range(max_iter):
+        p = 10 ** (a * y)
+        step = (p - 1 + b * a * y - ax) / (a * (ln10 * p + b))
+        y -= step
+        if not step.size or max(abs(step)) < tol:
+            break
+    return s * y
+
+
+def hlog(x, b=500, r=_display_max, d=_l_mmax, tol=1e-6, method='newton'):
     """
     Base 10 hyperlog transform.
 
@@ -238,14 +294,25 @@ def hlog(x, b=500, r=_display_max, d=_l_mmax):
     d : num (default = log10(2**18))
         log10 of maximal possible measured value.
         hlog_inv(r) = 10**d
+    tol : float (default = 1e-6)
+        Absolute accuracy (in transformed units) of the numerical solution.
+        Larger values trade accuracy for speed. Only used if method='newton'.
+    method : 'newton' | 'brentq'
+        'newton' - vectorized Newton iterations over the whole array (fast).
+        'brentq' - per-event root finding with scipy's brentq (slow, kept for reference).
 
     Returns
     -------
-    Array of transformed values.
+    Array of transformed values (a scalar if x is a single number).
     """
-    hlog_fun = _make_hlog_numeric(b, r, d)
+    if method == 'newton':
+        hlog_fun = lambda v: _hlog_newton(v, b, r, d, tol=tol)
+    elif method == 'brentq':
+        hlog_fun = _make_hlog_numeric(b, r, d)
+    else:
+        raise ValueError("method must be in ('newton', 'brentq'). %s given." % method)
     if not hasattr(x, '__len__'):  # if transforming a single number
-        y = hlog_fun(x)
+        y = asarray(hlog_fun(x))[()]
     else:
         n = len(x)
         if not n:  # if transforming empty container
@@ -255,6 +322,235 @@ def hlog(x, b=500, r=_display_max, d=_l_mmax):
     return y
 
 
+class _Logicle(object):
+    """
+    The parameters of a logicle scale, as described in Moore and Parks (2012).
+
+    On the logicle scale (0 to 1 for values up to T), the data value of a scale value y is
+    given by the biexponential function a * exp(b * y) - c * exp(-d * y) + f (for y >= x1,
+    the scale value of 0; the function is odd around x1). Near x1 the function is evaluated
+    with a Taylor series to avoid cancellation.
+    """
+    n_taylor = 16
+    n_table = 4097
+
+    def __init__(self, T, W, M, A):
+        if T <= 0 or M <= 0 or W < 0 or 2 * W > M or -A > W or A + W > M - W:
+            raise ValueError('Invalid logicle parameters: T={0}, W={1}, M={2}, A={3}'.format(
+                T, W, M, A))
+        w = W / (M + A)
+        x2 = A / (M + A)
+        self.x1 = x1 = x2 + w
+        x0 = x2 + 2 * w
+        self.b = b = (M + A) * log(10)
+        if w == 0:
+            d = b
+        else:
+            # d is set so that the second derivative of the function is 0 at x1
+            d = brentq(lambda d: 2 * (log(d) - log(b)) + w * (b + d), 1e-100, b,
+                       xtol=1e-300)
+        self.d = d
+        c_a = exp(x0 * (b + d))
+        mf_a = exp(b * x1) - c_a / exp(d * x1)
+        self.a = a = T / ((exp(b) - mf_a) - c_a / exp(d))
+        self.c = c_a * a
+        self.f = -mf_a * a
+
+        pos = a * exp(b * x1)
+        neg = -self.c / exp(d * x1)
+        taylor = []
+        for i in range(self.n_taylor):
+            pos *= b / (i + 1)
+            neg *= -d / (i + 1)
+            taylor.append(pos + neg)
+        taylor[1] = 0  # exactly, by the choice of d
+        self.taylor = taylor
+        self.x_taylor = x1 + w / 4
+
+        # Table of the data values of evenly spaced scale values, used to start the
+        # iterations of scale from a close estimate.
+        self.table_y = linspace(x1, 1, self.n_table)
+        self.table_x = self.inverse(self.table_y)
+
+    def _series(self, y):
+        dy = y - self.x1
+        total = self.taylor[-1] * dy
+        for t in self.taylor[-2:1:-1]:
+            total = (total + t) * dy
+        return (total * dy + self.taylor[0]) * dy
+
+    def _biexponential(self, y):
+        """ Data value of scale values y >= x1. """
+        with errstate(over='ignore'):
+            x = self.a * exp(self.b * y) + self.f - self.c * exp(-self.d * y)
+        near = y < self.x_taylor
+        if near.any():
+            x[near] = self._series(y[near])
+        return x
+
+    def inverse(self, y):
+        """ Data values of scale values y. """
+        y = asarray(y, dtype=float)
+        shape = y.shape
+        y = y.reshape(-1)
+        negative = y < self.x1
+        x = self._biexponential(where(negative, 2 * self.x1 - y, y))
+        return where(negative, -x, x).reshape(shape)
+
+    def scale(self, x, tol=1e-12, max_iter=20):
+        """ Scale values of data values x, found with Halley's method. """
+        x = asarray(x, dtype=float)
+        shape = x.shape
+        x = x.reshape(-1)
+        negative = x < 0
+        x = abs(x)
+        with errstate(divide='ignore', invalid='ignore'):
+            # Start from the table, or from the asymptote beyond it
+            y = where(x <= self.table_x[-1], interp(x, self.table_x, self.table_y),
+                      log(x / self.a) / self.b)
+            for _ in range(max_iter):
+                ae = self.a * exp(self.b * y)
+                ce = self.c * exp(-self.d * y)
+                value = ae + self.f - ce
+                near = y < self.x_taylor
+                if near.any():
+                    value[near] = self._series(y[near])
+                value -= x
+                slope = self.b * ae + self.d * ce
+                curvature = self.b * self.b * ae - self.d * self.d * ce
+                step = value / (slope * (1 - value * curvature / (2 * slope * slope)))
+                step[value == 0] = 0
+                y -= step
+                if not (abs(step) >= tol).any():
+                    break
+        return where(negative, 2 * self.x1 - y, y).reshape(shape)
+
+
+#: Logicle parameters, keyed by (T, W, M, A).
+_logicle_cache = Cache(maxsize=64)
+
+
+def _get_logicle(T, W, M, A):
+    key = (float(T), float(W), float(M), float(A))
+    params = _logicle_cache.get(key)
+    if params is None:
+        params = _Logicle(*key)
+        _logicle_cache.put(key, params)
+    return params
+
+
+def logicle(x, T=_machine_max, W=0.5, M=4.5, A=0, r=_display_max, tol=1e-12):
+    """
+    Logicle transform (Parks, Roederer and Moore, 2006).
+
+    Linear-like around 0 and logarithmic for large values, with a smooth transition
+    and support for negative values.
+
+    Parameters
+    ----------
+    x : num | num iterable
+        values to be transformed.
+    T : num (default = 2**18)
+        Top of the scale: the largest data value (transformed to r).
+    W : num (default = 0.5)
+        Width of the linear-like region, in decades.
+    M : num (default = 4.5)
+        Number of decades covered by the scale (above the linear-like region).
+    A : num (default = 0)
+        Additional decades of negative data values to include in the scale.
+    r : num (default = 10**4)
+        maximal transformed value.
+    tol : float (default = 1e-12)
+        Accuracy (as a fraction of r) of the numerical solution.
+
+    Returns
+    -------
+    Array of transformed values.
+    """
+    return r * _get_logicle(T, W, M, A).scale(x, tol=tol)
+
+
+def logicle_inv(y, T=_machine_max, W=0.5, M=4.5, A=0, r=_display_max):
+    """
+    Inverse of the logicle transform (see logicle).
+    """
+    return _get_logicle(T, W, M, A).inverse(asarray(y, dtype=float) / r)
+
+
+def _piecewise_polynomial(spln):
+    """
+    Breakpoints and coefficients (highest degree first, one column per interval) of the
+    polynomials making up a spline. Computed once per spline, and kept on the spline object
+    (so that they are shared through the spline_cache).
+    """
+    pieces = getattr(spln, '_pieces', None)
+    if pieces is None:
+        ppoly = PPoly.from_spline(spln._eval_args)
+        # Repeated knots at the ends of the spline give empty intervals
+        keep = flatnonzero(diff(ppoly.x) > 0)
+        breaks = ascontiguousarray(r_[ppoly.x[keep], ppoly.x[keep[-1] + 1]])
+        pieces = breaks, ascontiguousarray(ppoly.c[:, keep])
+        spln._pieces = pieces
+    return pieces
+
+
+def eval_spline(spln, x, chunksize=2 ** 16, n_jobs=None):
+    """
+    Evaluate a spline (e.g., Transformation.spln) at the values of x.
+
+    The values are located among the breakpoints of the spline with searchsorted, and the
+    polynomials are evaluated with Horner's scheme, one chunk of values at a time (so that
+    the temporary arrays stay small) and directly into the output array. Values outside the
+    range of the spline are handled according to the ext mode of the spline (as in
+    UnivariateSpline.__call__): extrapolated with the first or last polynomial (0),
+    set to 0 (1), rejected with a ValueError (2), or set to the boundary value (3).
+
+    Parameters
+    ----------
+    spln : UnivariateSpline
+    x : array of any shape
+    chunksize : int
+        Number of values evaluated at a time.
+    n_jobs : int | None
+        Number of threads evaluating chunks concurrently.
+        None or 1 evaluates in the calling thread; -1 uses one thread per CPU.
+
+    Returns
+    -------
+    Array of the same shape (and memory layout) as x.
+    """
+    breaks, coeffs = _piecewise_polynomial(spln)
+    x = asarray(x, dtype=float)
+    if not (x.flags.c_contiguous or x.flags.f_contiguous):
+        x = ascontiguousarray(x)
+    out = empty_like(x)
+    # Same memory order for x and out, so that the flat views are aligned
+    flat_x = x.ravel(order='K')
+    flat_out = out.ravel(order='K')
+    ext = getattr(spln, 'ext', 0)
+    low, high = breaks[0], breaks[-1]
+    if ext == 2 and ((flat_x < low) | (flat_x > high)).any():
+        raise ValueError('x value out of bounds')
+
+    def eval_chunk(start):
+        values = flat_x[start:start + chunksize]
+        result = flat_out[start:start + chunksize]
+        if ext == 3:
+            values = clip(values, low, high)
+        interval = searchsorted(breaks, values, side='right') - 1
+        clip(interval, 0, len(breaks) - 2, out=interval)
+        dx = values - breaks.take(interval)
+        coeffs[0].take(interval, out=result)
+        for c in coeffs[1:]:
+            result *= dx
+            result += c.take(interval)
+        if ext == 1:
+            result[(values < low) | (values > high)] = 0
+
+    parallel_map(eval_chunk, range(0, len(flat_x), chunksize), n_jobs=n_jobs)
+    return out
+
+
 _canonical_names = {
     'linear': 'linear',
     'lin': 'linear',
@@ -263,6 +559,7 @@ _canonical_names = {
     'hyperlog': 'hlog',
     'glog': 'glog',
     'tlog': 'tlog',
+    'logicle': 'logicle',
 }
 
 
@@ -279,6 +576,7 @@ name_transforms = {
     'hlog': {'forward': hlog, 'inverse': hlog_inv},
     'glog': {'forward': glog, 'inverse': glog_inv},
     'tlog': {'forward': tlog, 'inverse': tlog_inv},
+    'logicle': {'forward': logicle, 'inverse': logicle_inv},
 }
 
 
@@ -355,7 +653,7 @@ class Transformation(BaseObject):
     def __repr__(self):
         return repr(self.name)
 
-    def transform(self, x, use_spln=False, **kwargs):
+    def transform(self, x, use_spln=False, lut_bits=None, n_jobs=None, **kwargs):
         """
         Apply transform to x
 
@@ -368,6 +666,13 @@ class Transformation(BaseObject):
             True - transform using the spline specified in self.slpn.
                     If self.spln is None, set the spline.
             False - transform using self.tfun
+        lut_bits: int | None
+            If given, x holds integers in [0, 2**lut_bits) (e.g., raw values of a channel
+            stored as an integer with $DATATYPE = I), and is transformed by looking the
+            values up in the table of the transformation over all these integers (see lut).
+            Takes precedence over use_spln. If x holds other values, self.tfun is used.
+        n_jobs : int | None
+            Number of threads evaluating the spline (see eval_spline).
         kwargs:
             Keyword arguments to be passed to self.set_spline.
             Only used if use_spln=True & self.spln=None.
@@ -378,10 +683,16 @@ class Transformation(BaseObject):
         """
         x = asarray(x, dtype=float)
 
+        if lut_bits is not None:
+            table = self.lut(lut_bits)
+            index = x.astype(intp)
+            if x.size and index.min() >= 0 and index.max() < len(table) and (index == x).all():
+                return table.take(index)
+            return self.tfun(x, *self.args, **self.kwargs)
         if use_spln:
             if self.spln is None:
                 self.set_spline(x.min(), x.max(), **kwargs)
-            return apply_along_axis(self.spln, 0, x)
+            return eval_spline(self.spln, x, n_jobs=n_jobs)
         else:
             return self.tfun(x, *self.args, **self.kwargs)
 
@@ -400,13 +711,93 @@ class Transformation(BaseObject):
             tinv.direction = direction
         return tinv
 
-    def set_spline(self, xmin, xmax, nx=1000, log_spacing=None, **kwargs):
+    @property
+    def key(self):
+        """
+        A hashable key identifying the transformation (its name, direction and parameters).
+        None for transformations that are not named or that have unhashable parameters.
+        """
+        if self.tname is None:
+            return None
+        key = (self.tname, self.direction, tuple(self.args), tuple(sorted(self.kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def lut(self, bits):
+        """
+        Lookup table of the transformation: its values at the integers 0, 1, ..., 2**bits - 1.
+
+        Tables of named transformations are kept in the process-wide lut_cache.
+
+        Parameters
+        ----------
+        bits : int
+            Bit depth of the integers. At most max_lut_bits.
+        """
+        if not 0 < bits <= max_lut_bits:
+            raise ValueError('Lookup tables are supported for 1 to {0} bits. {1} given.'.format(
+                max_lut_bits, bits))
+        key = self.key
+        if key is not None:
+            key += ('lut', bits)
+            table = lut_cache.get(key)
+            if table is not None:
+                return table
+        with errstate(divide='ignore', invalid='ignore'):
+            table = asarray(self.tfun(arange(2 ** bits, dtype=float), *self.args, **self.kwargs),
+                            dtype=float)
+        table.setflags(write=False)
+        if key is not None:
+            lut_cache.put(key, table)
+        return table
+
+    def set_spline(self, xmin, xmax, nx=1000, log_spacing=None, use_cache=True, **kwargs):
+        """
+        Fit a spline to the transformation over the range [xmin, xmax].
+
+        Splines of named transformations are looked up in (and added to) the
+        process-wide spline_cache.
+
+        Parameters
+        ----------
+        xmin, xmax : num
+            Range of values over which the spline is fitted.
+        nx : int
+            Number of points used to fit the spline.
+        log_spacing : bool | None
+            Whether to space the fitted points logarithmically.
+            If None, log spacing is used for the hlog, tlog, glog and logicle transformations.
+        use_cache : bool
+            Whether to use the spline_cache.
+        kwargs :
+            Keyword arguments to be passed to InterpolatedUnivariateSpline.
+        """
         if log_spacing is None:
-            if self.tname in ['hlog', 'tlog', 'glog']:
+            if self.tname in ['hlog', 'tlog', 'glog', 'logicle']:
                 log_spacing = True
             else:
                 log_spacing = False
+
+        cache_key = self.key if use_cache else None
+        if cache_key is not None:
+            cache_key += (float(xmin), float(xmax), nx, log_spacing,
+                          tuple(sorted(kwargs.items())))
+            try:
+                spln = spline_cache.get(cache_key)
+            except TypeError:  # unhashable spline kwargs
+                cache_key = None
+            else:
+                if spln is not None:
+                    self.spln = spln
+                    return
+
         x_spln = _x_for_spln([xmin, xmax], nx, log_spacing)
         y_spln = self(x_spln)
         spln = InterpolatedUnivariateSpline(x_spln, y_spln, **kwargs)
         self.spln = spln
+
+        if cache_key is not None:
+            spline_cache.put(cache_key, spln)
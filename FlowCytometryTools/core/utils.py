@@ -2,6 +2,7 @@ import re
 import glob
 import os
 import fnmatch
+import sys
 
 try:
     import cPickle as pickle
@@ -173,6 +174,107 @@ def to_list(obj):
         return list(obj)
 
 
+class _Failure(object):
+    """ Holds an exception raised in a worker, so that it can be re-raised by the caller. """
+
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+    def __getstate__(self):
+        # Tracebacks cannot be pickled (e.g., when returned from a process pool)
+        return {'exc_info': (self.exc_info[0], self.exc_info[1], None)}
+
+    def reraise(self, key=None):
+        """ Re-raise the exception, naming the key of the item for which it was raised. """
+        if key is not None:
+            _annotate_exception(self.exc_info[1], key)
+        six.reraise(*self.exc_info)
+
+
+def _annotate_exception(exc, key):
+    """ Add the key of the item being processed to the message of the exception (in place). """
+    note = '(raised for {0!r})'.format(key)
+    if exc.args and isinstance(exc.args[0], six.string_types):
+        exc.args = ('{0} {1}'.format(exc.args[0], note),) + exc.args[1:]
+    else:
+        exc.args = exc.args + (note,)
+
+
+class _Catching(object):
+    """ Wraps func so that exceptions are returned as _Failures rather than raised. """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, arg):
+        try:
+            return self.func(arg)
+        except Exception:
+            return _Failure(sys.exc_info())
+
+
+def parallel_map(func, iterable, n_jobs=None, executor='thread', keys=None):
+    """
+    Return [func(x) for x in iterable], evaluating func concurrently.
+
+    Results are returned in the order of the iterable. If func raises for some of the
+    items, all items are still processed and the exception raised for the first failing
+    item is then re-raised, with the key of the item (or its position) added to its message.
+
+    Parameters
+    ----------
+    func : callable
+    iterable : iterable
+    n_jobs : int | None
+        Number of concurrent workers. None or 1 evaluates serially; -1 uses one worker per CPU.
+    executor : 'thread' | 'process' | executor
+        'thread' - use a pool of threads.
+        'process' - use a pool of processes (func and the items must be picklable).
+        executor - an object with a map(func, iterable) method that preserves ordering.
+    keys : list | None
+        Keys naming the items in error messages (e.g., the IDs of measurements).
+        If None, items are named by their position.
+
+    Returns
+    -------
+    list of results.
+    """
+    items = list(iterable)
+    keys = list(range(len(items))) if keys is None else list(keys)
+    if hasattr(executor, 'map'):
+        results = list(executor.map(_Catching(func), items))
+    else:
+        if n_jobs == -1:
+            from multiprocessing import cpu_count
+            n_jobs = cpu_count()
+        if n_jobs is None or n_jobs <= 1 or len(items) <= 1:
+            results = []
+            for key, x in zip(keys, items):
+                try:
+                    results.append(func(x))
+                except Exception as e:
+                    _annotate_exception(e, key)
+                    raise
+            return results
+        if executor == 'thread':
+            from multiprocessing.pool import ThreadPool as Pool
+        elif executor == 'process':
+            from multiprocessing import Pool
+        else:
+            raise ValueError("executor must be 'thread', 'process' or an executor. "
+                             "%s given." % repr(executor))
+        pool = Pool(min(n_jobs, len(items)))
+        try:
+            results = pool.map(_Catching(func), items, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    for key, r in zip(keys, results):
+        if isinstance(r, _Failure):
+            r.reraise(key)
+    return results
+
+
 class BaseObject(object):
     """
     Object providing common utility methods.
@@ -211,3 +313,154 @@ class BaseObject(object):
             return deepcopy(self)
         else:
             return copy(self)
+
+
+class Cache(object):
+    """
+    A thread-safe key/value cache with a bounded capacity and hit/miss statistics.
+
+    The size of each entry is given by `getsizeof` (1 per entry by default), and entries are
+    evicted according to `policy` once the total size exceeds `maxsize`.
+
+    Caches are meant to be shared: copying a cache returns the cache itself, and pickling it
+    keeps only its configuration (not its content).
+    """
+
+    _policies = ('lru', 'fifo', 'lfu')
+
+    def __init__(self, maxsize=128, getsizeof=None, policy='lru'):
+        """
+        Parameters
+        ----------
+        maxsize : num | None
+            Maximal total size of the cached values. None means unbounded.
+        getsizeof : callable | None
+            Returns the size of a value. If None, each entry has size 1.
+        policy : 'lru' | 'fifo' | 'lfu'
+            Which entries are evicted first:
+            'lru' - least recently used.
+            'fifo' - least recently added.
+            'lfu' - least frequently used (ties are broken by insertion order).
+        """
+        from threading import RLock
+        if policy not in self._policies:
+            raise ValueError('policy must be one of {0}. {1} given.'.format(self._policies, policy))
+        self._lock = RLock()
+        self._maxsize = maxsize
+        self.getsizeof = getsizeof
+        self.policy = policy
+        self._entries = collections.OrderedDict()
+        self._uses = {}
+        self.currsize = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return '<{0} {1}>'.format(type(self).__name__, self.stats)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getstate__(self):
+        return {'_maxsize': self._maxsize, 'getsizeof': self.getsizeof, 'policy': self.policy}
+
+    def __setstate__(self, state):
+        self.__init__(state['_maxsize'], state['getsizeof'], state.get('policy', 'lru'))
+
+    def _sizeof(self, value):
+        return 1 if self.getsizeof is None else self.getsizeof(value)
+
+    @property
+    def maxsize(self):
+        """ Maximal total size of the cached values. Lowering it evicts entries. """
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, value):
+        with self._lock:
+            self._maxsize = value
+            self._evict()
+
+    @property
+    def stats(self):
+        """ A dict with the cache statistics. """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self._entries), 'currsize': self.currsize,
+                'maxsize': self._maxsize, 'policy': self.policy}
+
+    def get(self, key, default=None):
+        """ Return the value cached under key (and mark it as used), or default. """
+        with self._lock:
+            try:
+                size, value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if self.policy == 'lru':
+                self._entries[key] = self._entries.pop(key)
+            self._uses[key] += 1
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """ Cache value under key. Values larger than maxsize are not cached. """
+        size = self._sizeof(value)
+        with self._lock:
+            self.pop(key)
+            if self._maxsize is not None and size > self._maxsize:
+                return
+            # Evict before inserting, so that the new entry is never the one evicted
+            self._evict(size)
+            self._entries[key] = (size, value)
+            self._uses[key] = 0
+            self.currsize += size
+
+    def pop(self, key, default=None):
+        """ Remove key from the cache, returning its value (or default if not cached). """
+        with self._lock:
+            try:
+                size, value = self._entries.pop(key)
+            except KeyError:
+                return default
+            del self._uses[key]
+            self.currsize -= size
+            return value
+
+    def _evict(self, size=0):
+        """ Evict entries until an entry of the given size fits in the cache. """
+        while self._maxsize is not None and self._entries and self.currsize + size > self._maxsize:
+            if self.policy == 'lfu':
+                key = min(self._entries, key=self._uses.__getitem__)
+            else:
+                key = next(iter(self._entries))
+            self.pop(key)
+            self.evictions += 1
+
+    def clear(self):
+        """ Remove all entries and reset the statistics. """
+        with self._lock:
+            self._entries.clear()
+            self._uses.clear()
+            self.currsize = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def save(self, path):
+        """ Pickle the cache content to the given file path. """
+        with self._lock:
+            items = [(k, v) for k, (_, v) in self._entries.items()]
+        save(items, path)
+
+    def load(self, path):
+        """ Add the entries pickled (by Cache.save) in the given file path to the cache. """
+        for key, value in load(path):
+            self.put(key, value)
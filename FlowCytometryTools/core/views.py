@@ -0,0 +1,161 @@
+"""
+Copy-on-write views over event data.
+
+An EventView wraps a DataFrame of events (the base) that is shared, and never modified,
+by all the measurements derived from it. Columns that a derived measurement changes
+are stored as separate arrays (overrides), and events that it keeps (e.g., after gating)
+are stored as an array of row positions in the base; everything else is read from the base.
+A DataFrame is only materialized when one is requested.
+
+The base may also be a memory-mapped FCS file (fcs_io.MappedData), in which case
+values are read from the file when they are accessed.
+"""
+from numpy import empty, asarray, flatnonzero, int32, int64, iinfo
+from pandas import DataFrame
+
+
+class EventView(object):
+    """
+    A read-only view of event data, sharing an immutable base DataFrame.
+    """
+
+    def __init__(self, base, columns=None, overrides=None, rows=None):
+        """
+        Parameters
+        ----------
+        base : DataFrame | MappedData
+            The shared event data. It is never modified.
+        columns : list of str | None
+            Names of the columns in the view (in order). If None, the columns of base are used.
+        overrides : dict | None
+            Mapping of column name to an array holding the values of the column in the view.
+            Columns without an override are read from base.
+            Overrides are aligned with the events of the view (not of base).
+        rows : int array | None
+            Positions of the events of the view in base. If None, all events of base are used.
+        """
+        self.base = base
+        self.columns = list(base.columns) if columns is None else list(columns)
+        self.overrides = {} if overrides is None else overrides
+        self.rows = rows
+
+    def __len__(self):
+        if self.rows is None:
+            return self.base.shape[0]
+        return len(self.rows)
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    @property
+    def index(self):
+        if self.rows is None:
+            return self.base.index
+        return self.base.index[self.rows]
+
+    def column(self, name):
+        """ The values of a column (an array that must not be modified in place). """
+        if name not in self.columns:
+            raise KeyError(name)
+        if name in self.overrides:
+            return self.overrides[name]
+        if not isinstance(self.base, DataFrame):
+            return self.base.column(name, self.rows)
+        values = self.base[name].values
+        if self.rows is None:
+            return values
+        return values.take(self.rows)
+
+    def prefetch(self, columns=None):
+        """
+        Read the given columns (all if None) of a base that reads its values from a file
+        one set of columns at a time (e.g., fcs_io.FileData), in a single pass over the file.
+        Columns that are not in the view, or that are overridden, are ignored.
+        """
+        if not hasattr(self.base, 'prefetch'):
+            return
+        columns = self.columns if columns is None else columns
+        self.base.prefetch([c for c in columns if c in self.columns and c not in self.overrides])
+
+    def values(self, columns=None, dtype=float):
+        """
+        Return the values of the given columns as a new 2d array (events x columns).
+
+        The array is allocated in Fortran order, so that each column is contiguous.
+        """
+        columns = self.columns if columns is None else list(columns)
+        self.prefetch(columns)
+        values = empty((len(self), len(columns)), dtype=dtype, order='F')
+        for i, c in enumerate(columns):
+            values[:, i] = self.column(c)
+        return values
+
+    def with_columns(self, new_columns, columns=None):
+        """
+        Return a new view in which the given columns are replaced.
+
+        Parameters
+        ----------
+        new_columns : dict
+            Mapping of column name to an array with the new values of the column.
+        columns : list of str | None
+            Names of the columns of the new view. If None, the columns of this view are kept.
+        """
+        overrides = dict(self.overrides)
+        overrides.update(new_columns)
+        columns = self.columns if columns is None else columns
+        overrides = dict((k, v) for k, v in overrides.items() if k in columns)
+        return EventView(self.base, columns, overrides, self.rows)
+
+    def select(self, selection):
+        """
+        Return a new view holding only the selected events.
+
+        Parameters
+        ----------
+        selection : bool array | int array
+            Either a mask with one entry per event of the view, or the positions
+            of the selected events in the view.
+        """
+        selection = asarray(selection)
+        if selection.dtype == bool:
+            selection = flatnonzero(selection)
+        if self.rows is None:
+            dtype = int32 if self.base.shape[0] <= iinfo(int32).max else int64
+            rows = selection.astype(dtype, copy=False)
+        else:
+            rows = self.rows.take(selection)
+        overrides = dict((k, v.take(selection)) for k, v in self.overrides.items())
+        return EventView(self.base, self.columns, overrides, rows)
+
+    def frame(self, columns=None):
+        """
+        Materialize the view (or a subset of its columns) as a DataFrame.
+
+        When the view is identical to its base, the base itself is returned.
+        Columns that are read from a base that is not a DataFrame are read at once
+        (see the frame method of the base).
+        """
+        columns = self.columns if columns is None else list(columns)
+        for c in columns:
+            if c not in self.columns:
+                raise KeyError(c)
+        overridden = [c for c in columns if c in self.overrides]
+        if isinstance(self.base, DataFrame):
+            if not overridden and self.rows is None:
+                if columns == list(self.base.columns):
+                    return self.base
+                return self.base[columns]
+            data = dict((c, self.column(c)) for c in columns)
+        else:
+            from_base = [c for c in columns if c not in self.overrides]
+            frame = self.base.frame(from_base, self.rows)
+            if not overridden:
+                return frame
+            data = dict((c, frame[c].values) for c in from_base)
+            data.update((c, self.overrides[c]) for c in overridden)
+        return DataFrame(data, index=self.index, columns=columns)
@@ -0,0 +1,774 @@
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+
+from FlowCytometryTools import (FCCollection, FCMeasurement, FCPlate, ThresholdGate, test_data_dir,
+                                test_data_file)
+from FlowCytometryTools.core import bases, compensation, containers, fcs_io, stats
+from FlowCytometryTools.core import transforms as trans
+from FlowCytometryTools.core.fcs_io import MappedData
+from FlowCytometryTools.core.meta_index import MetaIndex
+from FlowCytometryTools.core.store import StoredData
+from FlowCytometryTools.core.utils import Cache
+
+
+class CountReads(object):
+    """ Counts the passes over the DATA segment of FCS files (calls to DataLayout.read). """
+
+    def __enter__(self):
+        self.count = 0
+        self._read = fcs_io.DataLayout.read
+
+        def read(layout, *args, **kwargs):
+            self.count += 1
+            return self._read(layout, *args, **kwargs)
+
+        fcs_io.DataLayout.read = read
+        return self
+
+    def __exit__(self, *exc_info):
+        fcs_io.DataLayout.read = self._read
+
+
+class TestDataCache(unittest.TestCase):
+    def setUp(self):
+        bases.data_cache.clear()
+
+    def tearDown(self):
+        bases.data_cache.clear()
+
+    def test_measurement_data_is_parsed_once(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        other = FCMeasurement(ID='other', datafile=test_data_file)
+        data = sample.data
+        self.assertTrue(sample.data.equals(data))
+        self.assertTrue(other.data.equals(data))
+        self.assertEqual(bases.data_cache.stats['misses'], 1)
+        self.assertEqual(bases.data_cache.stats['hits'], 2)
+        self.assertIsNone(sample._data)  # the measurement itself remains lazy
+
+        # The data returned is a copy of the cached data
+        data['FSC-A'] = -1.0
+        data['Y2-A'].values[:] = -1.0
+        fresh = FCMeasurement(ID='fresh', datafile=test_data_file).data
+        self.assertFalse((fresh[['FSC-A', 'Y2-A']] == -1.0).any().any())
+
+        # Different read parameters are cached separately
+        naming = FCMeasurement(ID='test', datafile=test_data_file,
+                               readdata_kwargs={'channel_naming': '$PnN'})
+        naming.data
+        self.assertEqual(bases.data_cache.stats['misses'], 2)
+
+        # Changes to the file invalidate the cached data
+        stat = os.stat(test_data_file)
+        try:
+            os.utime(test_data_file, (stat.st_atime, stat.st_mtime + 10))
+            sample.data
+            self.assertEqual(bases.data_cache.stats['misses'], 3)
+        finally:
+            os.utime(test_data_file, (stat.st_atime, stat.st_mtime))
+
+    def test_disabled_and_custom_cache(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        sample.data_cache = None
+        self.assertIsNot(sample.data, sample.data)
+        self.assertEqual(len(bases.data_cache), 0)
+
+        plate = FCPlate.from_dir('plate', test_data_dir)
+        cache = Cache(maxsize=2 * bases._nbytes(plate['A3'].data), getsizeof=bases._nbytes)
+        plate.set_data_cache(cache)
+        plate.apply(len, applyto='data')
+        self.assertEqual(cache.stats['entries'], 2)
+        self.assertEqual(cache.stats['evictions'], len(plate) - 2)
+        self.assertIs(plate['A3'].copy().data_cache, cache)
+
+    def test_transform_does_not_modify_cached_data(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        raw = sample.data['FSC-A'].copy()
+        sample.transform('tlog', channels=['FSC-A'])
+        self.assertTrue((sample.data['FSC-A'] == raw).all())
+
+
+class TestParallelApply(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.plate = FCPlate.from_dir('plate', test_data_dir)
+
+    def test_parallel_matches_serial(self):
+        gate = ThresholdGate(1000, 'FSC-A', 'above')
+        expected = self.plate.gate(gate).counts(output_format='dict')
+        for executor in ('thread', 'process'):
+            gated = self.plate.gate(gate, n_jobs=3, executor=executor, ID='gated')
+            self.assertIsInstance(gated, FCPlate)
+            self.assertEqual(gated.ID, 'gated')
+            self.assertEqual(gated.counts(output_format='dict', n_jobs=2, executor=executor),
+                             expected)
+
+        transformed = self.plate.transform('hlog', channels=['FSC-A'], n_jobs=2)
+        expected = self.plate.transform('hlog', channels=['FSC-A'])
+        for key in self.plate:
+            assert_array_equal(transformed[key].data.values, expected[key].data.values)
+
+    def test_exception_propagation(self):
+        gate = ThresholdGate(1000, 'missing channel', 'above')
+        first = list(self.plate.keys())[0]
+        for n_jobs in (None, 3):
+            with self.assertRaises(ValueError) as context:
+                self.plate.gate(gate, n_jobs=n_jobs)
+            self.assertIn('missing channel', str(context.exception))
+            self.assertIn('(raised for {0!r})'.format(first), str(context.exception))
+
+    def test_parallel_loading(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            for name in os.listdir(test_data_dir):
+                shutil.copy(os.path.join(test_data_dir, name), tmpdir)
+            corrupted = os.path.join(tmpdir, 'RFP_Well_H1.fcs')
+            with open(corrupted, 'wb') as f:
+                f.write(b'not an fcs file')
+            with self.assertRaises(IOError):
+                FCPlate.from_dir('plate', tmpdir)
+
+            def parser(path):
+                raise ValueError('no well ID')
+            with self.assertRaises(IOError) as context:
+                FCCollection.from_files('collection', [test_data_file], parser=parser)
+            self.assertIn(test_data_file, str(context.exception))
+
+            for executor in ('thread', 'process'):
+                plate = FCPlate.from_dir('plate', tmpdir, readdata=True, n_jobs=2,
+                                         executor=executor, errors='skip')
+                self.assertEqual(sorted(plate.keys()), sorted(self.plate.keys()))
+                self.assertEqual(list(plate.load_errors), [corrupted])
+                self.assertIsNotNone(plate['A3']._data)
+                self.assertEqual(plate['A3'].meta['$SRC'], self.plate['A3'].meta['$SRC'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestCompute(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.plate = FCPlate.from_dir('plate', test_data_dir)
+
+    def test_compute(self):
+        gate = ThresholdGate(1000, 'FSC-A', 'above')
+        queued = self.plate.transform('tlog', channels=['FSC-A'], use_spln=False,
+                                      apply_now=False).gate(gate, apply_now=False)
+        expected = self.plate.transform('tlog', channels=['FSC-A'], use_spln=False).gate(gate)
+        nbytes = max(m._estimated_nbytes() for m in queued.values())
+        for max_memory in (None, 2 * nbytes):
+            computed = queued.compute(ID='computed', n_jobs=2, max_memory=max_memory)
+            self.assertIsInstance(computed, FCPlate)
+            self.assertEqual(computed.ID, 'computed')
+            for key in self.plate:
+                self.assertEqual(computed[key].queue, [])
+                self.assertIsNotNone(computed[key]._data)
+                self.assertTrue(computed[key].data.equals(expected[key].data))
+        self.assertNotEqual(queued[key].queue, [])  # the original collection is unchanged
+
+
+class TestStats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.plate = FCPlate.from_dir('plate', test_data_dir)
+
+    def setUp(self):
+        bases.data_cache.clear()
+
+    def tearDown(self):
+        bases.data_cache.clear()
+
+    def test_stats(self):
+        gate = ThresholdGate(1000, 'FSC-A', 'above')
+        table = self.plate.stats(['FSC-A', 'SSC-A'], stats=['count', 'median', 'cv', 'p97.5'],
+                                 gate=gate, n_jobs=2)
+        self.assertEqual(list(table.columns), ['count', 'median', 'cv', 'p97.5'])
+        self.assertEqual(len(table), 2 * len(self.plate))
+        # The wells of the plate are left as they were (nothing is kept in memory)
+        self.assertTrue(all(m._view is None and m._data is None for m in self.plate.values()))
+        for key, measurement in self.plate.items():
+            values = measurement.gate(gate).data['SSC-A'].astype(float)
+            row = table.loc[(key, 'SSC-A')]
+            self.assertEqual(row['count'], len(values))
+            self.assertAlmostEqual(row['median'], values.median(), places=3)
+            self.assertAlmostEqual(row['cv'], values.std() / values.mean())
+            self.assertAlmostEqual(row['p97.5'], values.quantile(0.975), places=3)
+
+        layouts = self.plate.stats('FSC-A', stats=['median'], output_format='layout')
+        assert_array_almost_equal(layouts['FSC-A', 'median'].values,
+                                  self.plate.apply(lambda x: x.data['FSC-A'].median()).values,
+                                  decimal=2)
+        with self.assertRaises(ValueError):
+            self.plate.stats('FSC-A', stats=['mode'])
+
+    def test_single_read_per_file(self):
+        gate = ThresholdGate(1000, 'FSC-A', 'above')
+        for channels, kwargs in ((['FSC-A', 'SSC-A', 'Y2-A'], {}), (None, {}),
+                                 (['SSC-A', 'Y2-A'], {'gate': gate}),
+                                 (['SSC-A'], {'gate': gate, 'n_jobs': 3})):
+            bases.data_cache.clear()
+            with CountReads() as reads:
+                self.plate.stats(channels, stats=['count', 'median'], **kwargs)
+            self.assertEqual(reads.count, len(self.plate))
+
+
+class TestCopyOnWrite(unittest.TestCase):
+    def test_measurement_copies_share_data(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file, readdata=True)
+        copied = sample.copy()
+        self.assertIs(copied._data, sample._data)
+        self.assertEqual(list(copied.meta), list(sample.meta))
+        self.assertIs(copied.meta['_channels_'], sample.meta['_channels_'])
+        # The metadata dictionary itself is not shared
+        copied.meta['$SPILLOVER'] = 'changed'
+        self.assertNotIn('$SPILLOVER', sample.meta)
+        # Both the original and the copy now treat the data as shared
+        self.assertFalse(sample._owns_data)
+        self.assertFalse(copied._owns_data)
+        shared = sample._data
+        self.assertIsNot(sample.data, shared)
+        # The data handed out by get_data can be modified without affecting the other copy
+        data = copied.data
+        data['Y2-A'] = -1.0
+        self.assertIs(copied.data, data)
+        self.assertFalse((sample.data['Y2-A'] == -1.0).any())
+        copied.history.append('action')
+        self.assertEqual(sample.history, [])
+
+        transformed = sample.transform('tlog', channels=['FSC-A', 'SSC-A'], use_spln=False)
+        view = transformed._view
+        self.assertTrue(np.shares_memory(view.column('Y2-A'), sample._data['Y2-A'].values))
+        self.assertFalse(np.shares_memory(view.column('FSC-A'), sample._data.values))
+        self.assertEqual(list(transformed.data.columns), list(sample.data.columns))
+        assert_array_equal(transformed.data['SSC-A'],
+                           trans.tlog(sample.data['SSC-A'].astype(float)))
+        self.assertFalse((transformed.data['FSC-A'] == sample.data['FSC-A']).all())
+
+        subset = transformed.transform('tlog', channels=['Y2-A', 'FSC-A'], return_all=False)
+        self.assertEqual(list(subset.data.columns), ['FSC-A', 'Y2-A'])
+
+    def test_transform_channels(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file, readdata=True)
+        transforms = {'FSC-A': 'hlog', 'SSC-A': ('hlog', {'b': 10}),
+                      'Y2-A': trans.Transformation('tlog', th=2)}
+        transformed = sample.transform_channels(transforms, use_spln=False)
+        expected = sample.transform('hlog', channels='FSC-A', use_spln=False).transform(
+            'hlog', channels='SSC-A', b=10, use_spln=False).transform(
+            'tlog', channels='Y2-A', th=2, use_spln=False)
+        self.assertTrue(np.shares_memory(transformed._view.column('B1-A'),
+                                         sample._data['B1-A'].values))
+        assert_array_almost_equal(transformed.data.values, expected.data.values)
+        subset = sample.transform_channels(transforms, return_all=False, use_spln=False)
+        self.assertEqual(list(subset.data.columns), ['FSC-A', 'SSC-A', 'Y2-A'])
+        with self.assertRaises(KeyError):
+            sample.transform_channels({'missing channel': 'hlog'})
+
+        plate = FCPlate.from_dir('plate', test_data_dir)
+        transformed = plate.transform_channels(transforms, ID='transformed')
+        self.assertEqual(transformed.ID, 'transformed')
+        self.assertIsNone(transforms['Y2-A'].spln)  # the shared spline is fitted on a copy
+        expected = plate.transform('hlog', channels='FSC-A').transform(
+            'hlog', channels='SSC-A', b=10).transform('tlog', channels='Y2-A', th=2)
+        for key in plate:
+            assert_array_almost_equal(transformed[key].data.values, expected[key].data.values,
+                                      decimal=0)
+
+    def test_collection_copies(self):
+        plate = FCPlate.from_dir('plate', test_data_dir)
+        copied = plate.copy()
+        self.assertIsNot(copied['A3'], plate['A3'])
+        self.assertIsNot(copied['A3'].meta, plate['A3'].meta)
+        self.assertIs(copied['A3'].meta['_channels_'], plate['A3'].meta['_channels_'])
+        del copied['A3']
+        copied.get_positions(copy=False).pop('A3')
+        self.assertIn('A3', plate)
+        self.assertIn('A3', plate.get_positions())
+
+    def test_gating_selects_rows_of_shared_data(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file, readdata=True)
+        data = sample.data
+        gate1 = ThresholdGate(1000.0, 'FSC-A', region='above')
+        gate2 = ThresholdGate(2000.0, 'SSC-A', region='below')
+        gated = sample.gate(gate1).gate(gate2)
+        view = gated._view
+        self.assertIs(view.base, data)
+        self.assertEqual(view.rows.dtype, np.int32)
+        self.assertEqual(gated.counts, len(view))
+
+        expected = data[gate1._identify(data) & gate2._identify(data)]
+        self.assertTrue(gated.data.equals(expected))
+        self.assertTrue(sample.gate(gate1 & gate2).data.equals(expected))
+        self.assertEqual([name for name, _ in gated.history], ['gate', 'gate'])
+
+        subsampled = gated.subsample(10, order='end')
+        self.assertTrue(subsampled.data.equals(expected.iloc[-10:]))
+        subsampled = gated.subsample(slice(5, 100, 7))
+        self.assertTrue(subsampled.data.equals(expected.iloc[5:100:7]))
+        self.assertEqual(gated.subsample(0).counts, 0)
+
+        transformed = gated.transform('tlog', channels=['FSC-A'], use_spln=False)
+        assert_array_equal(transformed.data['FSC-A'], trans.tlog(expected['FSC-A'].astype(float)))
+        assert_array_equal(transformed.data.index, expected.index)
+
+
+class TestCompensation(unittest.TestCase):
+    def setUp(self):
+        self.datafile = os.path.join(os.path.dirname(test_data_dir), 'FlowCytometers',
+                                     'HTS_BD_LSR-II',
+                                     'HTS_BD_LSR_II_Mixed_Specimen_001_D6_D06.fcs')
+        self.sample = FCMeasurement(ID='test', datafile=self.datafile)
+
+    def test_compensate(self):
+        spillover = compensation.get_spillover(self.sample.meta)
+        channels = ['FITC-A', 'PerCP-Cy5-5-A', 'AmCyan-A', 'PE-TxRed YG-A']
+        self.assertEqual(list(spillover.columns), channels)
+        self.assertAlmostEqual(spillover.loc['AmCyan-A', 'FITC-A'], 0.16)
+
+        data = self.sample.data
+        expected = np.linalg.solve(spillover.values.T, data[channels].values.T.astype(float)).T
+        compensated = self.sample.compensate()
+        assert_array_almost_equal(compensated.data[channels].values, expected)
+        assert_array_equal(compensated.data['FSC-A'], data['FSC-A'])
+        self.assertEqual(compensated.history[-1][0], 'compensate')
+
+        chunked = compensation.compensate([data[c].values for c in channels],
+                                          compensation.inverse(spillover), chunksize=1000)
+        assert_array_almost_equal(chunked, expected)
+
+        collection = FCCollection('collection', measurements=[
+            self.sample, FCMeasurement(ID='copy', datafile=self.datafile)])
+        compensated = collection.compensate(n_jobs=2)
+        for key in collection:
+            assert_array_almost_equal(compensated[key].data[channels].values, expected)
+
+    def test_spillover_errors(self):
+        with self.assertRaises(ValueError):
+            compensation.parse_spillover('2,FITC-A,PE-A,1,0,0')
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        with self.assertRaises(ValueError):
+            sample.compensate()
+        spillover = pd.DataFrame(np.eye(2), index=['FSC-A', 'missing'],
+                                 columns=['FSC-A', 'missing'])
+        with self.assertRaises(KeyError):
+            sample.compensate(spillover)
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        bases.data_cache.clear()
+
+    def tearDown(self):
+        bases.data_cache.clear()
+
+    def test_iter_data(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        self.assertEqual(sample.counts, 10000)
+        gate = ThresholdGate(1000.0, 'FSC-A', region='above')
+        queued = sample.transform('tlog', channels=['FSC-A'], use_spln=False,
+                                  apply_now=False).gate(gate, apply_now=False)
+        chunks = list(queued.iter_data(chunksize=3000, channels=['FSC-A', 'SSC-A']))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(len(bases.data_cache), 0)  # the data was never loaded at once
+        self.assertEqual(queued.counts, sum(len(chunk) for chunk in chunks))
+
+        expected = queued.data[['FSC-A', 'SSC-A']]
+        self.assertTrue(pd.concat(chunks).equals(expected))
+        stats = queued.stats(['FSC-A', 'SSC-A'], chunksize=777)
+        described = expected.astype(float).describe().loc[stats.index]
+        assert_array_almost_equal(stats.values, described.values)
+
+        # Data in memory is iterated over without reading the file again
+        gated = sample.gate(gate)
+        self.assertTrue(pd.concat(list(gated.iter_data(chunksize=1000))).equals(gated.data))
+
+        # Operations that depend on all the events are not applied to each chunk
+        subsampled = queued.subsample(100, order='start', apply_now=False)
+        expected = queued.data.iloc[:100]
+        self.assertTrue(pd.concat(list(subsampled.iter_data(chunksize=30))).equals(expected))
+        self.assertEqual(subsampled.stats(chunksize=1000).loc['count', 'FSC-A'], 100)
+        self.assertEqual(sample.subsample(500, apply_now=False).counts, 500)
+        fitted = sample.transform('hlog', channels=['FSC-A'], apply_now=False)
+        self.assertTrue(pd.concat(list(fitted.iter_data(chunksize=1000))).equals(
+            sample.transform('hlog', channels=['FSC-A']).data))
+
+    def test_quantile_sketch(self):
+        values = np.random.RandomState(0).lognormal(size=200000)
+        sketch = stats.QuantileSketch(k=100, seed=0)
+        for start in range(0, len(values), 30000):
+            sketch.update(values[start:start + 30000])
+        self.assertEqual(sketch.count, len(values))
+        self.assertLess(sketch.retained, 1000)
+        qs = np.array([0.01, 0.25, 0.5, 0.9, 0.99])
+        ranks = np.searchsorted(np.sort(values), sketch.quantile(qs)) / len(values)
+        self.assertTrue(np.all(np.abs(ranks - qs) <= sketch.error))
+        low, high = sketch.bounds(0.5)
+        self.assertTrue(low <= np.median(values) <= high)
+
+        # Merging the sketches of parts of the values
+        merged = stats.QuantileSketch(k=100, seed=0)
+        for part in np.array_split(values, 7):
+            other = stats.QuantileSketch(k=100, seed=1)
+            other.update(part)
+            merged.merge(pickle.loads(pickle.dumps(other)))
+        self.assertEqual(merged.count, len(values))
+        ranks = np.searchsorted(np.sort(values), merged.quantile(qs)) / len(values)
+        self.assertTrue(np.all(np.abs(ranks - qs) <= merged.error))
+
+        # Sketches that hold all their values are exact
+        small = stats.QuantileSketch()
+        small.update([3, np.nan, 1, 2])
+        self.assertEqual((small.error, small.quantile(0.5), small.quantile(1)), (0, 2, 3))
+
+    def test_approximate_stats(self):
+        plate = FCPlate.from_dir('plate', test_data_dir)
+        gate = ThresholdGate(1000.0, 'FSC-A', region='above')
+        exact = plate.stats('SSC-A', stats=['count', 'mean', 'median', 'p90'], gate=gate)
+        bases.data_cache.clear()
+        approximate = plate.stats('SSC-A', stats=['count', 'mean', 'median', 'p90'], gate=gate,
+                                  approximate=True, k=50)
+        self.assertEqual(list(approximate.columns), list(exact.columns) + ['rank_error'])
+        assert_array_almost_equal(approximate[['count', 'mean']].values,
+                                  exact[['count', 'mean']].values, decimal=3)
+        self.assertEqual(len(bases.data_cache), 0)  # read in chunks
+
+        sketches = plate.quantile_sketches('SSC-A', gate=gate, k=50, n_jobs=2)
+        values = np.sort(pd.concat([m.gate(gate).data['SSC-A'] for m in plate.values()]))
+        self.assertEqual(sketches['SSC-A'].count, len(values))
+        rank = np.searchsorted(values, sketches['SSC-A'].quantile(0.5)) / len(values)
+        self.assertLessEqual(abs(rank - 0.5), sketches['SSC-A'].error)
+
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        result = sample.stats(['FSC-A'], chunksize=3000, percentiles=[50])
+        self.assertEqual(list(result.index), list(stats.RunningStats.index) + ['p50', 'rank_error'])
+        values = np.sort(sample.data['FSC-A'])
+        rank = np.searchsorted(values, result.loc['p50', 'FSC-A']) / len(values)
+        self.assertLessEqual(abs(rank - 0.5), result.loc['rank_error', 'FSC-A'])
+
+    def test_memory_map(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        mapped = FCMeasurement(ID='test', datafile=test_data_file,
+                               readdata_kwargs={'memory_map': True})
+        self.assertEqual(mapped.counts, 10000)
+        gate = ThresholdGate(1000.0, 'FSC-A', region='above') & ThresholdGate(500.0, 'SSC-A', 'above')
+        gated = mapped.gate(gate)
+        view = gated._view
+        self.assertIsInstance(view.base, MappedData)
+        self.assertEqual(len(bases.data_cache), 0)  # the data was never parsed
+        self.assertTrue(gated.data.equals(sample.gate(gate).data))
+        self.assertTrue(mapped.data.equals(sample.data))
+
+        # Pickling sends the path of the file rather than the events
+        restored = pickle.loads(pickle.dumps(view.base))
+        assert_array_equal(restored.column('FSC-A', view.rows), gated.data['FSC-A'].values)
+
+
+class TestPlanner(unittest.TestCase):
+    def test_queue_plan(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        gate1 = ThresholdGate(1000.0, 'FSC-A', region='above')
+        gate2 = ThresholdGate(1000.0, 'SSC-A', region='above')
+        operations = [
+            ('transform', dict(transform='hlog', channels='B1-A', use_spln=False)),
+            ('gate', dict(gate=gate1)),
+            ('subsample', dict(key=100, order='start')),
+            ('transform', dict(transform='tlog', channels=['FSC-A'], use_spln=False)),
+            ('gate', dict(gate=gate2)),
+            ('gate', dict(gate=ThresholdGate(3.0, 'FSC-A', region='above'))),
+            ('transform', dict(transform='hlog', channels=['SSC-A'])),  # fits a spline
+            ('subsample', dict(key=10, order='end')),
+        ]
+        queued = sample
+        expected = sample
+        for name, params in operations:
+            queued = getattr(queued, name)(apply_now=False, **params)
+            expected = getattr(expected, name)(**params)
+
+        plan = queued.explain()
+        self.assertEqual([kind for kind, _ in plan.steps],
+                         ['gate', 'subsample', 'gate', 'transform', 'gate', 'transform',
+                          'subsample'])
+        self.assertEqual(len(plan.steps[3][1]), 2)  # fused transformations
+        self.assertIn('transform tlog', repr(plan))
+
+        result = queued.apply_queued()
+        self.assertTrue(result.data.equals(expected.data))
+        self.assertEqual([name for name, _ in result.history],
+                         [name for name, _ in operations])
+        self.assertEqual(result.queue, [])
+
+
+class TestQueueCache(unittest.TestCase):
+    def setUp(self):
+        bases.data_cache.clear()
+        bases.queue_cache.clear()
+
+    def tearDown(self):
+        bases.data_cache.clear()
+        bases.queue_cache.clear()
+
+    def test_queue_cache(self):
+        cache = bases.queue_cache
+        gate = ThresholdGate(1000.0, 'FSC-A', region='above')
+
+        def queued():
+            sample = FCMeasurement(ID='test', datafile=test_data_file)
+            return sample.transform('tlog', channels=['FSC-A'], use_spln=False,
+                                    apply_now=False).gate(gate, apply_now=False)
+
+        sample = queued()
+        data = sample.data
+        self.assertTrue(sample.data.equals(data))
+        self.assertTrue(queued().data.equals(data))  # same file and queue contents
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        expected = FCMeasurement(ID='test', datafile=test_data_file).transform(
+            'tlog', channels=['FSC-A'], use_spln=False).gate(gate).data
+        self.assertTrue(data.equals(expected))
+
+        # A different queue, random operations, or data in memory are not looked up
+        self.assertFalse(sample.gate(~gate, apply_now=False).data.equals(data))
+        sampled = sample.subsample(10, apply_now=False)
+        self.assertIsNone(sampled._queue_key())
+        self.assertIsNotNone(sample.subsample(10, order='start', apply_now=False)._queue_key())
+        in_memory = FCMeasurement(ID='test', datafile=test_data_file, readdata=True)
+        self.assertIsNone(in_memory.gate(gate, apply_now=False)._queue_key())
+
+        # The cached data is not modified through the data handed out
+        data['Y2-A'] = -1.0
+        self.assertFalse((queued().data['Y2-A'] == -1.0).any())
+        # Reading channels of a lazy sample does not turn the cache off
+        lazy = FCMeasurement(ID='test', datafile=test_data_file)
+        lazy.get_data(['FSC-A'])
+        self.assertIsNotNone(lazy.gate(gate, apply_now=False)._queue_key())
+        mapped = FCMeasurement(ID='test', datafile=test_data_file,
+                               readdata_kwargs={'memory_map': True})
+        mapped._set_view(mapped._get_view())
+        self.assertIsNotNone(mapped.gate(gate, apply_now=False)._queue_key())
+
+
+class TestChannelProjection(unittest.TestCase):
+    def setUp(self):
+        bases.data_cache.clear()
+
+    def tearDown(self):
+        bases.data_cache.clear()
+
+    def test_channel_projection(self):
+        full = FCMeasurement(ID='test', datafile=test_data_file, readdata=True).data
+        bases.data_cache.clear()
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        self.assertTrue(sample.read_data(channels=['Y2-A']).equals(full[['Y2-A']]))
+        with CountReads() as reads:
+            data = sample.get_data(channels=['SSC-A', 'FSC-A'])
+        self.assertTrue(data.equals(full[['SSC-A', 'FSC-A']]))
+        self.assertEqual(reads.count, 1)  # both channels are read in a single pass
+        data['SSC-A'] = -1.0  # the data returned is not shared with the cache
+        self.assertTrue(sample.get_data(channels=['SSC-A']).equals(full[['SSC-A']]))
+
+        gate = ThresholdGate(1000.0, 'FSC-A', region='above')
+        gated = sample.gate(gate)
+        self.assertEqual(sorted(gated._view.base._values), ['FSC-A'])
+        self.assertIsNone(sample._view)  # the values read are not kept on the sample
+        self.assertEqual(len(bases.data_cache), 2)  # but they are in the data cache
+        self.assertTrue(gated.data.equals(full[full['FSC-A'] > 1000.0]))
+        self.assertTrue(sample.data.equals(full))
+
+    def test_projected_reads_go_through_the_data_cache(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        gates = [ThresholdGate(v, 'FSC-A', region='above') for v in (0, 500, 1000, 1500, 2000)]
+        with CountReads() as reads:
+            gated = [sample.gate(g) for g in gates]
+        self.assertEqual(reads.count, 1)
+        self.assertIn(sample._datafile_key(**sample.readdata_kwargs) + ('FSC-A',),
+                      bases.data_cache)
+        self.assertEqual([g.counts for g in gated],
+                         [sample.data['FSC-A'].gt(g.vert).sum() for g in gates])
+
+        # Operations needing several channels read the missing ones in a single pass
+        bases.data_cache.clear()
+        channels = ['SSC-A', 'Y2-A', 'B1-A']
+        with CountReads() as reads:
+            gated = sample.gate(gates[2])
+            gated.transform_channels(dict((c, 'tlog') for c in channels), use_spln=False)
+            gated.transform('tlog', channels=channels, use_spln=False)
+            gated.get_data(channels=['FSC-A'] + channels)
+        self.assertEqual(reads.count, 2)
+
+        with CountReads() as reads:
+            FCMeasurement(ID='other', datafile=test_data_file).gate(gates[2])
+        self.assertEqual(reads.count, 0)  # the values of FSC-A are in the cache
+        sample.data_cache = None
+        with CountReads() as reads:
+            sample.gate(gates[2])
+            sample.gate(gates[3])
+        self.assertEqual(reads.count, 2)
+
+
+    def test_missing_keywords_fall_back_to_fcsparser(self):
+        full = FCMeasurement(ID='test', datafile=test_data_file, readdata=True).data
+        bases.data_cache.clear()
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        meta = dict((k, v) for k, v in sample.meta.items() if not re.match(r'\$P\d+R$', k))
+        meta['_channels_'] = meta['_channels_'].drop('$PnR', axis=1)
+        sample.set_meta(meta)
+        with self.assertRaises(ValueError):
+            fcs_io.DataLayout(meta)
+        self.assertIsNone(sample._data_layout())
+
+        self.assertTrue(sample.get_data(channels=['SSC-A', 'FSC-A']).equals(
+            full[['SSC-A', 'FSC-A']]))
+        gate = ThresholdGate(1000.0, 'FSC-A', region='above')
+        self.assertTrue(sample.gate(gate).data.equals(full[full['FSC-A'] > 1000.0]))
+        self.assertTrue(sample.gate(gate, apply_now=False).data.equals(
+            full[full['FSC-A'] > 1000.0]))
+
+
+class TestSplineRange(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.plate = FCPlate.from_dir('plate', test_data_dir)
+
+    def setUp(self):
+        bases.data_cache.clear()
+        containers.extremes_cache.clear()
+
+    def tearDown(self):
+        bases.data_cache.clear()
+
+    def test_channel_range(self):
+        plate = self.plate
+        channels = ['FSC-A', 'SSC-A']
+        xmin, xmax = plate._channel_range(channels, 'meta')
+        assert_array_equal(xmin, [-262144, -262144])
+        assert_array_equal(xmax, [262144, 262144])
+        self.assertEqual(len(bases.data_cache), 0)  # no data was read
+
+        data = pd.concat([m.data[channels] for m in plate.values()])
+        for source in ('auto', 'data'):
+            containers.extremes_cache.clear()
+            xmin, xmax = plate._channel_range(channels, source)
+            assert_array_equal(xmin, data.min())
+            assert_array_equal(xmax, data.max())
+            self.assertEqual(len(containers.extremes_cache), len(plate) * len(channels))
+        self.assertEqual(stats.extremes(np.array([np.nan, 3, -1, 2]), chunksize=2), (-1, 3))
+
+        # The metadata does not describe the data once operations were applied
+        gated = plate.gate(ThresholdGate(1000, 'FSC-A', 'above'))
+        with self.assertRaises(ValueError):
+            gated._channel_range(channels, 'meta')
+        xmin, xmax = gated._channel_range(channels)
+        self.assertGreater(xmin['FSC-A'], 1000)
+
+    def test_integer_channels(self):
+        sample = FCMeasurement(ID='test', datafile=test_data_file)
+        meta = dict(sample.meta, **{'$DATATYPE': 'I'})
+        meta['_channels_'] = meta['_channels_'].copy()
+        meta['_channels_']['$PnB'] = '16'
+        sample.set_meta(meta)
+        # Values are masked to the bits needed for $PnR (2 ** 18), and stored in 16 bits
+        for source in ('auto', 'meta'):
+            xmin, xmax = sample._channel_range(['FSC-A'], source)
+            self.assertEqual((xmin['FSC-A'], xmax['FSC-A']), (0, 2 ** 16 - 1))
+        self.assertEqual(len(containers.extremes_cache), 0)  # no data was read
+
+    def test_default_covers_the_data(self):
+        # FSC-W goes well past its $PnR (262144) in the test plate
+        channels = ['FSC-W']
+        data = pd.concat([m.data[channels] for m in self.plate.values()])
+        self.assertLess(data.min().min(), -262144)
+
+        transformed = self.plate.transform('hlog', channels=channels)
+        expected = self.plate.transform('hlog', channels=channels,
+                                        spline_range=(data.min().min(), data.max().max()))
+        extrapolated = self.plate.transform('hlog', channels=channels, spline_range='meta')
+        exact = self.plate.transform('hlog', channels=channels, use_spln=False)
+        differs = False
+        for key in self.plate:
+            values = transformed[key].data[channels[0]].values
+            assert_array_equal(values, expected[key].data[channels[0]].values)
+            assert_array_almost_equal(values / 1e4, exact[key].data[channels[0]].values / 1e4,
+                                      decimal=2)
+            differs |= not np.allclose(extrapolated[key].data[channels[0]].values, values)
+        self.assertTrue(differs)
+
+        transformed = self.plate.transform_channels({'FSC-W': 'hlog', 'FSC-A': 'hlog'})
+        expected = self.plate.transform_channels({'FSC-W': 'hlog', 'FSC-A': 'hlog'},
+                                                 spline_range='data')
+        for key in self.plate:
+            assert_array_equal(transformed[key].data.values, expected[key].data.values)
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        plate = FCPlate.from_dir('plate', test_data_dir).dropna()
+        gate = ThresholdGate(1000.0, 'FSC-A', region='above')
+        plate = plate.transform('hlog', channels=['FSC-A'], use_spln=False).gate(gate,
+                                                                                apply_now=False)
+        plate.to_store(self.tmpdir)
+
+        loaded = FCPlate.from_store(self.tmpdir)
+        self.assertEqual(loaded.ID, 'plate')
+        self.assertEqual(loaded.shape, plate.shape)
+        self.assertEqual(loaded.get_positions(), plate.get_positions())
+        self.assertIsInstance(loaded['A3']._view.base, StoredData)
+        self.assertEqual([name for name, _ in loaded['A3'].history], ['transform', 'gate'])
+        assert_array_equal(loaded.counts(), plate.counts())
+        self.assertTrue(loaded['A3'].data.equals(plate['A3'].data))
+        self.assertEqual(loaded['A3'].meta['$TOT'], plate['A3'].meta['$TOT'])
+
+        subset = FCCollection.from_store(self.tmpdir, ids=['A3', 'B4'], ID='subset')
+        self.assertEqual(sorted(subset.keys()), ['A3', 'B4'])
+        self.assertTrue(subset['B4'].data.equals(plate['B4'].data))
+
+
+class TestMetaIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_plate_from_index(self):
+        path = os.path.join(self.tmpdir, 'meta.sqlite')
+        plate = FCPlate.from_dir('plate', test_data_dir, meta_index=MetaIndex(path))
+        self.assertEqual(len(MetaIndex(path)), len(plate))
+
+        # Files are not opened once they are in the index
+        read = []
+        original = FCMeasurement.read_meta
+        FCMeasurement.read_meta = lambda self, **kwargs: read.append(self.datafile)
+        try:
+            indexed = FCPlate.from_dir('plate', test_data_dir, meta_index=MetaIndex(path))
+            collection = FCCollection.from_dir('plate', test_data_dir, parser='read',
+                                               meta_index=MetaIndex(path))
+            self.assertEqual(sorted(collection.keys()), sorted(plate.keys()))
+            assert_array_equal(indexed.get_measurement_metadata(['$TOT', '$SRC']),
+                               plate.get_measurement_metadata(['$TOT', '$SRC']))
+            filtered = indexed.filter_by_meta({'$SRC': lambda x: x.startswith('A')})
+            self.assertEqual(sorted(filtered.keys()), ['A3', 'A4', 'A6', 'A7'])
+        finally:
+            FCMeasurement.read_meta = original
+        self.assertEqual(read, [])
+
+        # Modified files are read again
+        index = MetaIndex(path)
+        datafile = os.path.join(self.tmpdir, 'copy.fcs')
+        shutil.copy(test_data_file, datafile)
+        index.put(datafile, {'$TOT': '1'})
+        self.assertEqual(index.get(datafile), {'$TOT': '1'})
+        os.utime(datafile, (0, 0))
+        self.assertIsNone(index.get(datafile))
+        self.assertEqual(index.scan([datafile], lambda x: {'$TOT': '2'}), {datafile: {'$TOT': '2'}})
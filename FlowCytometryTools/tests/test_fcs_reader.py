@@ -3,9 +3,11 @@ import unittest
 
 from fcsparser import parse
 import numpy as np
+import pandas as pd
 from numpy.testing import assert_array_almost_equal
 
 from .. import test_data_file
+from ..core import fcs_io
 
 BASE_PATH = os.path.dirname(os.path.realpath(__file__))
 
@@ -162,3 +164,18 @@ class TestFCSParser(unittest.TestCase):
                                     [32.043865, -201.58234, 501.35455]], dtype=np.float32)
 
         assert_array_almost_equal(subset_of_data, expected_values)
+
+    def test_chunked_reading(self):
+        """Verify that the chunked reader gives the same data as the parser."""
+        bd_data_file = os.path.join(BASE_PATH, 'data', 'FlowCytometers', 'HTS_BD_LSR-II',
+                                    'HTS_BD_LSR_II_Mixed_Specimen_001_D6_D06.fcs')
+        for datafile in (test_data_file, bd_data_file):  # little and big endian
+            meta, df = parse(datafile, reformat_meta=True)
+            chunks = list(fcs_io.iter_data(datafile, meta, chunksize=4096))
+            self.assertEqual([len(chunk) for chunk in chunks[:-1]], [4096] * (len(chunks) - 1))
+            self.assertTrue(pd.concat(chunks).equals(df))
+
+            layout = fcs_io.DataLayout(meta)
+            with open(datafile, 'rb') as f:
+                subset = layout.read(f, 100, 200, channels=df.columns[[3, 1]])
+            self.assertTrue(subset.equals(df.iloc[100:200, [3, 1]]))
@@ -1,8 +1,12 @@
 import unittest
 
+import numpy as np
 import pandas as pd
+from matplotlib.path import Path
 
-from FlowCytometryTools.core.gates import IntervalGate
+from FlowCytometryTools.core import polygon
+from FlowCytometryTools.core.gates import (IntervalGate, PolyGate, QuadGate, ThresholdGate,
+                                           compile_gate)
 
 
 def _get_indexes_where_true(bool_series):
@@ -44,3 +48,51 @@ class TestGates(unittest.TestCase):
         empty_df = pd.DataFrame({'channel': []}, index=[])
         gate = IntervalGate((0, 1), ['channel'], 'in')
         self.assertEqual(_get_indexes_where_true(gate._identify(empty_df)), [])
+
+    def test_compiled_gates(self):
+        rs = np.random.RandomState(0)
+        df = pd.DataFrame(rs.randn(1000, 3), columns=['x', 'y', 'z'])
+        df.iloc[::50, 0] = np.nan
+        leaves = [ThresholdGate(0.1, 'x', 'above'), ThresholdGate(0.1, 'x', 'below'),
+                  IntervalGate((-1, 0.5), 'y', 'out'), QuadGate((0, 0), ['x', 'z'], 'top left'),
+                  PolyGate([(0, 0), (2, 0), (2, 2)], ['y', 'x'], 'in'),
+                  ThresholdGate(10, 'z', 'above')]  # passes no events
+
+        for _ in range(50):
+            gates = list(leaves)
+            for _ in range(12):
+                a, b = [gates[i] for i in rs.randint(len(gates), size=2)]
+                how = rs.choice(['and', 'or', 'xor', 'invert'])
+                gates.append(~a if how == 'invert' else {'and': a & b, 'or': a | b,
+                                                         'xor': a ^ b}[how])
+            gate = gates[-1]
+            expected = np.asarray(gate._identify_recursive(df), dtype=bool)
+            np.testing.assert_array_equal(compile_gate(gate)(df), expected)
+            np.testing.assert_array_equal(gate.mask(df), expected)
+
+        # Shared sub-gates are evaluated once
+        gate1, gate2 = leaves[0], leaves[2]
+        plan = compile_gate((gate1 & ~gate2) | (~gate2 & gate1) | ~leaves[1])
+        self.assertEqual(len(plan), 7)  # x >= 0.1, y <= 0.5, y >= -1 and 4 logical operations
+        self.assertEqual(len(compile_gate(gate1 & gate1)), 2)
+
+    def test_poly_gate_agrees_with_matplotlib(self):
+        rs = np.random.RandomState(0)
+        chunksize = polygon._chunksize
+        polygon._chunksize = 500  # test several chunks
+        try:
+            for i in range(20):
+                # Integer coordinates put many events on vertices and edges.
+                vert = rs.randint(0, 10, (rs.randint(3, 20), 2)).astype(float)
+                points = np.r_[rs.randint(-1, 11, (2000, 2)), rs.uniform(-1, 11, (2000, 2))]
+                df = pd.DataFrame(points, columns=['x', 'y'])
+                expected = Path(vert).contains_points(points)
+                for grid, n_jobs in ((None, None), (16, 2), (64, None)):
+                    gate = PolyGate(vert, ['x', 'y'], grid=grid, n_jobs=n_jobs)
+                    np.testing.assert_array_equal(gate._identify(df), expected)
+                    gate.region = 'out'
+                    np.testing.assert_array_equal(gate.mask(df), ~expected)
+        finally:
+            polygon._chunksize = chunksize
+        self.assertIs(polygon.edge_table([(0, 0), (1, 0), (1, 1)]),
+                      polygon.edge_table(np.array([[0, 0], [1, 0], [1, 1]])))
@@ -2,6 +2,8 @@
 @author: jonathanfriedman
 '''
 import os
+import shutil
+import tempfile
 import unittest
 
 import numpy as np
@@ -116,6 +118,101 @@ class TestTransforms(unittest.TestCase):
         d = (result1 - result2) / result1
         assert_almost_equal(d, np.zeros(len(d)), decimal=2)
 
+    def test_hlog_methods(self):
+        """The vectorized newton engine should agree with the brentq root finder."""
+        x = np.r_[_xall[::10], 0]
+        for b in (500, 10, 0.5, 0):
+            expected = trans.hlog(x, b=b, method='brentq')
+            assert_almost_equal(trans.hlog(x, b=b), expected, decimal=6)
+            assert_almost_equal(trans.hlog(x, b=b, tol=1.), expected, decimal=2)
+        assert_almost_equal(trans.hlog(100.), trans.hlog(100., method='brentq'))
+        for method in ('newton', 'brentq'):
+            self.assertEqual(np.ndim(trans.hlog(100., method=method)), 0)
+            self.assertNotIsInstance(trans.hlog(100., method=method), np.ndarray)
+        with self.assertRaises(ValueError):
+            trans.hlog(x, method='unknown')
+
+    def test_spline_cache(self):
+        cache = trans.spline_cache
+        cache.clear()
+        t1 = Transformation('hlog', b=10)
+        t1.set_spline(-100, 1000)
+        t2 = Transformation('hlog', b=10)
+        t2.set_spline(-100, 1000)
+        self.assertIs(t1.spln, t2.spln)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # Different parameters, range or direction must not share a spline
+        Transformation('hlog', b=20).set_spline(-100, 1000)
+        Transformation('hlog', b=10).set_spline(-100, 2000)
+        Transformation('hlog', 'inverse', b=10).set_spline(-100, 1000)
+        self.assertEqual(len(cache), 4)
+
+        # Unnamed transformations are not cached
+        Transformation(lambda x: 2 * x).set_spline(0, 10)
+        self.assertEqual(len(cache), 4)
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'splines.pickle')
+            cache.save(path)
+            cache.clear()
+            cache.load(path)
+            self.assertEqual(len(cache), 4)
+            t3 = Transformation('hlog', b=10)
+            t3.set_spline(-100, 1000)
+            assert_almost_equal(t3.spln(_xall), t1.spln(_xall))
+            self.assertEqual(cache.hits, 1)
+        finally:
+            shutil.rmtree(tmpdir)
+            cache.clear()
+
+    def test_eval_spline(self):
+        transformation = Transformation('hlog', b=10)
+        transformation.set_spline(-100, 1000, use_cache=False)
+        spln = transformation.spln
+        x = np.linspace(-100, 1000, 1001)
+        assert_almost_equal(trans.eval_spline(spln, np.r_[-200, x, 1500, np.nan]),
+                            spln(np.r_[-200, x, 1500, np.nan]))
+        # 2d arrays keep their shape and memory order, chunks may be evaluated concurrently
+        values = np.asfortranarray(np.column_stack([x, x[::-1]]))
+        result = trans.eval_spline(spln, values, chunksize=100, n_jobs=2)
+        self.assertTrue(result.flags.f_contiguous)
+        assert_almost_equal(result, spln(values.ravel()).reshape(values.shape))
+        assert_almost_equal(transformation(values[::2], use_spln=True),
+                            spln(values[::2].ravel()).reshape(values[::2].shape))
+
+        # Values outside the range follow the ext mode of the spline
+        outside = np.r_[-200, 0, 500, 5000, np.nan]
+        for ext in ('zeros', 'const'):
+            transformation.set_spline(-100, 1000, use_cache=False, ext=ext)
+            assert_almost_equal(transformation(outside, use_spln=True),
+                                transformation.spln(outside))
+        transformation.set_spline(-100, 1000, use_cache=False, ext='raise')
+        with self.assertRaises(ValueError):
+            trans.eval_spline(transformation.spln, outside)
+
+    def test_lookup_table(self):
+        x = np.random.RandomState(0).randint(0, 2 ** 12, 5000).astype(np.float32)
+        t = Transformation('hlog', b=100)
+        assert_equal(t(x, lut_bits=12), t(x))
+        self.assertIs(t.lut(12), Transformation('hlog', b=100).lut(12))
+        # Values that are not in the table fall back to the transformation
+        assert_equal(t(x + 0.5, lut_bits=12), t(x + 0.5))
+        assert_equal(t(x * 2, lut_bits=12), t(x * 2))
+
+        # Channels stored as integers are transformed with the table
+        sample = self.fc_measurement.copy()
+        meta = dict(sample.meta, **{'$DATATYPE': 'I'})
+        meta['_channels_'] = meta['_channels_'].copy()
+        meta['_channels_']['$PnB'] = '16'
+        sample.set_meta(meta)
+        sample.set_data(sample.data.clip(lower=0).round())
+        self.assertEqual(sample._lut_bits(['FSC-A', 'SSC-A'])['FSC-A'], 16)
+        expected = sample.transform('glog', channels=['FSC-A', 'SSC-A'], l=10, use_spln=False)
+        result = sample.transform('glog', channels=['FSC-A', 'SSC-A'], l=10, use_lut=True)
+        assert_equal(result.data.values, expected.data.values)
+
     def test_hlog_inv(self):
         expected = _xall
         result = trans.hlog_inv(trans.hlog(_xall))
@@ -126,6 +223,28 @@ class TestTransforms(unittest.TestCase):
         d = (result - expected) / expected
         assert_almost_equal(d, np.zeros(len(d)), decimal=2)
 
+    def test_logicle(self):
+        T = 2 ** 18
+        x = np.r_[-_xpos[::-1], 0, _xpos]
+        y = trans.logicle(x, T=T)
+        self.assertTrue(np.all(np.diff(y) > 0))
+        # 0 is at the top of the linear-like region (w = W / M), and T at the top of the scale
+        assert_almost_equal(trans.logicle([0, T], T=T), [_ymax * 0.5 / 4.5, _ymax])
+        # close to a log scale (M decades) for large values
+        assert_almost_equal(trans.logicle(T / 10., T=T) / _ymax, 1 - 1 / 4.5, decimal=3)
+        d = (trans.logicle_inv(y, T=T) - x) / np.maximum(1, np.abs(x))
+        assert_almost_equal(d, np.zeros(len(d)), decimal=10)
+        # with negative decades
+        y = trans.logicle(x, T=T, W=1, M=4, A=1)
+        assert_almost_equal(trans.logicle_inv(y, T=T, W=1, M=4, A=1), x, decimal=6)
+        with self.assertRaises(ValueError):
+            trans.logicle(x, W=3)
+        # named transformation, with T taken from $PnR
+        result = self.fc_measurement.transform('logicle', channels=['FSC-A'])
+        assert_almost_equal(result.data['FSC-A'].values,
+                            trans.logicle(self.fc_measurement.data['FSC-A'].values, T=T),
+                            decimal=3)
+
     def test_hlog_on_fc_measurement(self):
         fc_measurement = self.fc_measurement.transform(transform='hlog', b=10)
         data = fc_measurement.data.values[:3, :4]
@@ -0,0 +1,73 @@
+import unittest
+
+from FlowCytometryTools.core.utils import Cache, parallel_map
+
+
+class TestCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = Cache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # 'b' is now the least recently used
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b', 'missing'), 'missing')
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertEqual(cache.stats['misses'], 1)
+        self.assertEqual(cache.stats['evictions'], 1)
+
+        cache.maxsize = 1
+        self.assertEqual(list(cache._entries), ['c'])
+
+    def test_sized_entries(self):
+        cache = Cache(maxsize=10, getsizeof=len)
+        cache.put('a', 'x' * 6)
+        cache.put('b', 'x' * 6)
+        self.assertEqual((len(cache), cache.currsize), (1, 6))
+        cache.put('c', 'x' * 11)  # Larger than the cache, never stored
+        self.assertNotIn('c', cache)
+        self.assertIn('b', cache)
+
+    def test_policies(self):
+        for policy, expected in (('lru', ['a', 'c']), ('fifo', ['b', 'c']), ('lfu', ['a', 'c'])):
+            cache = Cache(maxsize=2, policy=policy)
+            cache.put('a', 1)
+            cache.put('b', 2)
+            cache.get('a')
+            cache.put('c', 3)
+            self.assertEqual(sorted(cache._entries), expected)
+
+        # With lfu, a new entry is never evicted in favour of entries that were used
+        cache = Cache(maxsize=2, policy='lfu')
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.get('b')
+        cache.put('c', 3)
+        self.assertIn('c', cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('c'), 3)
+
+        with self.assertRaises(ValueError):
+            Cache(policy='random')
+
+
+class TestParallelMap(unittest.TestCase):
+    def test_ordering_and_errors(self):
+        for n_jobs, executor in ((None, 'thread'), (4, 'thread'), (2, 'process')):
+            self.assertEqual(parallel_map(abs, range(-5, 5), n_jobs, executor),
+                             [abs(x) for x in range(-5, 5)])
+            with self.assertRaises(TypeError):
+                parallel_map(abs, [1, 'a', 2], n_jobs, executor)
+
+        with self.assertRaises(ValueError):
+            parallel_map(abs, [1, 2], 2, 'unknown')
+
+    def test_errors_name_the_failing_item(self):
+        for n_jobs in (None, 2):
+            with self.assertRaises(TypeError) as context:
+                parallel_map(abs, [1, 'a', 2], n_jobs)
+            self.assertIn('(raised for 1)', str(context.exception))
+            with self.assertRaises(TypeError) as context:
+                parallel_map(abs, [1, 'a', 2], n_jobs, keys=['A1', 'A2', 'A3'])
+            self.assertIn("(raised for 'A2')", str(context.exception))
@@ -0,0 +1,136 @@
+"""
+Benchmarks for evaluating trees of composite gates.
+
+Compares gates compiled into a single evaluation plan (compile_gate, used by
+CompositeGate._identify) to the recursive evaluator (CompositeGate._identify_recursive).
+
+Also compares the point-in-polygon engine used by PolyGate (core.polygon) to
+matplotlib's Path.contains_points.
+
+Run with FlowCytometryTools importable (e.g., after ``pip install -e .``):
+
+    python benchmarks/bench_gates.py
+"""
+from __future__ import print_function
+
+import time
+
+import numpy as np
+from matplotlib.path import Path
+from pandas import DataFrame
+
+from FlowCytometryTools.core import polygon
+from FlowCytometryTools.core.gates import (IntervalGate, PolyGate, QuadGate, ThresholdGate,
+                                           compile_gate)
+
+
+def _timeit(func, repeat=3):
+    """Return the best wall time (in seconds) out of `repeat` calls to func."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        best = min(best, time.time() - start)
+    return best
+
+
+def _events(n_events=10 ** 6, n_channels=8, seed=0):
+    rs = np.random.RandomState(seed)
+    columns = ['CH%d' % i for i in range(n_channels)]
+    return DataFrame(rs.randn(n_events, n_channels).astype(np.float32), columns=columns)
+
+
+def _leaves(columns, n, seed=0):
+    rs = np.random.RandomState(seed)
+    leaves = []
+    for i in range(n):
+        c1, c2 = rs.choice(columns, 2, replace=False)
+        kind = i % 4
+        if kind == 0:
+            leaves.append(ThresholdGate(rs.randn(), c1, rs.choice(['above', 'below'])))
+        elif kind == 1:
+            leaves.append(IntervalGate(tuple(sorted(rs.randn(2))), c1, rs.choice(['in', 'out'])))
+        elif kind == 2:
+            leaves.append(QuadGate(tuple(rs.randn(2)), [c1, c2], 'top right'))
+        else:
+            vert = [tuple(v) for v in 2 * rs.randn(6, 2)]
+            leaves.append(PolyGate(vert, [c1, c2], rs.choice(['in', 'out'])))
+    return leaves
+
+
+def _chain(leaves):
+    """A left-deep tree: ((((g0 & ~g1) | g2) & ~g3) | g4) ..."""
+    gate = leaves[0]
+    for i, leaf in enumerate(leaves[1:]):
+        gate = (gate & ~leaf) if i % 2 == 0 else (gate | leaf)
+    return gate
+
+
+def _balanced(leaves):
+    """A balanced tree alternating between and, or and xor."""
+    gates = list(leaves)
+    level = 0
+    while len(gates) > 1:
+        how = ('and', 'or', 'xor')[level % 3]
+        pairs = zip(gates[::2], gates[1::2])
+        gates = [{'and': a & b, 'or': a | b, 'xor': a ^ b}[how] for a, b in pairs] + \
+                gates[len(gates) // 2 * 2:]
+        level += 1
+    return gates[0]
+
+
+def _shared(leaves):
+    """Sub-gates reused across branches: g_{i+1} = (g_i & l_i) | (~g_i & l_{i+1})."""
+    gate = leaves[0]
+    for a, b in zip(leaves[1:], leaves[2:]):
+        gate = (gate & a) | (~gate & b)
+    return gate
+
+
+def bench_gates(n_events=10 ** 6):
+    data = _events(n_events)
+    trees = [('chain, 32 leaves', _chain(_leaves(data.columns, 32))),
+             ('balanced, 64 leaves', _balanced(_leaves(data.columns, 64))),
+             ('shared, depth 8', _shared(_leaves(data.columns, 10))),
+             ('empty branch, 32 leaves', ThresholdGate(100, 'CH0', 'above') &
+              _balanced(_leaves(data.columns, 32)))]
+
+    print('{:,} events'.format(n_events))
+    for name, gate in trees:
+        expected = np.asarray(gate._identify_recursive(data), dtype=bool)
+        assert (compile_gate(gate)(data) == expected).all()
+        t_recursive = _timeit(lambda: gate._identify_recursive(data), repeat=1)
+        t_compiled = _timeit(lambda: gate._identify(data))
+        print('  {:<24}: recursive {:>8.1f} ms | compiled {:>8.1f} ms ({} steps)'.format(
+            name, 1e3 * t_recursive, 1e3 * t_compiled, len(compile_gate(gate))))
+
+
+def _star(n_vert, seed=0):
+    """A simple (non self-intersecting) polygon with n_vert vertices."""
+    rs = np.random.RandomState(seed)
+    theta = np.sort(rs.uniform(0, 2 * np.pi, n_vert))
+    radius = rs.uniform(0.5, 2, n_vert)
+    return [(r * np.cos(t), r * np.sin(t)) for r, t in zip(radius, theta)]
+
+
+def bench_polygon(n_events=4 * 10 ** 6):
+    rs = np.random.RandomState(0)
+    x, y = 1.5 * rs.randn(2, n_events)
+    points = np.column_stack([x, y])
+
+    print('polygon, {:,} events'.format(n_events))
+    for n_vert in (6, 40, 200):
+        vert = _star(n_vert)
+        expected = Path(vert).contains_points(points)
+        t_path = _timeit(lambda: Path(vert).contains_points(points), repeat=1)
+        timings = []
+        for grid in (None, 256):
+            assert (polygon.contains_points(vert, x, y, grid=grid) == expected).all()
+            timings.append(_timeit(lambda: polygon.contains_points(vert, x, y, grid=grid)))
+        print('  {:>3} vertices: matplotlib {:>7.1f} ms | exact {:>7.1f} ms | '
+              'grid=256 {:>7.1f} ms'.format(n_vert, 1e3 * t_path, *[1e3 * t for t in timings]))
+
+
+if __name__ == '__main__':
+    bench_gates()
+    bench_polygon()
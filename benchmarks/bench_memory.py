@@ -0,0 +1,68 @@
+"""
+Peak memory used by chains of measurement operations.
+
+Compares copy-on-write measurements (the default) to the legacy behavior in which
+every derived measurement started from a deep copy of its parent.
+
+Run with FlowCytometryTools importable (e.g., after ``pip install -e .``):
+
+    python benchmarks/bench_memory.py
+"""
+from __future__ import print_function
+
+import tracemalloc
+
+import numpy as np
+from pandas import DataFrame
+
+from FlowCytometryTools import FCMeasurement, ThresholdGate
+from FlowCytometryTools.core.utils import BaseObject
+
+
+def _measurement(n_events=10 ** 6, n_channels=16, seed=0):
+    rs = np.random.RandomState(seed)
+    columns = ['CH%d' % i for i in range(n_channels)]
+    data = DataFrame(rs.lognormal(6, 2, (n_events, n_channels)).astype(np.float32),
+                     columns=columns)
+    measurement = FCMeasurement(ID='bench', readmeta=False)
+    measurement.set_data(data)
+    return measurement
+
+
+def _gate_chain(measurement, n_gates=5):
+    for i in range(n_gates):
+        measurement = measurement.gate(ThresholdGate(10 * i, 'CH%d' % i, 'above'))
+    return measurement
+
+
+def _transform_chain(measurement, n_transforms=5):
+    for i in range(n_transforms):
+        measurement = measurement.transform('tlog', channels=['CH%d' % i], auto_range=False,
+                                            use_spln=False)
+    return measurement
+
+
+def _peak_mb(func, *args):
+    tracemalloc.start()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak / 2. ** 20
+
+
+def bench_chains():
+    measurement = _measurement()
+    print('raw data: {:.0f} MB'.format(measurement.data.memory_usage().sum() / 2. ** 20))
+    for name, chain in (('5 gates', _gate_chain), ('5 transforms', _transform_chain)):
+        _, cow = _peak_mb(chain, measurement)
+        FCMeasurement.copy = BaseObject.copy  # deep copies
+        try:
+            _, legacy = _peak_mb(chain, measurement)
+        finally:
+            del FCMeasurement.copy
+        print('{:<13}: copy-on-write peak {:>6.0f} MB | deepcopy peak {:>6.0f} MB'.format(
+            name, cow, legacy))
+
+
+if __name__ == '__main__':
+    bench_chains()
@@ -0,0 +1,84 @@
+"""
+Benchmarks for the transformations in FlowCytometryTools.core.transforms.
+
+Run with FlowCytometryTools importable (e.g., after ``pip install -e .``):
+
+    python benchmarks/bench_transforms.py
+"""
+from __future__ import print_function
+
+import time
+
+import numpy as np
+
+from FlowCytometryTools.core import transforms as trans
+
+
+def _timeit(func, repeat=3):
+    """Return the best wall time (in seconds) out of `repeat` calls to func."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        best = min(best, time.time() - start)
+    return best
+
+
+def _events(n, seed=0):
+    """Simulated event values spanning the negative and positive range of a channel."""
+    rs = np.random.RandomState(seed)
+    return np.r_[-rs.lognormal(3, 2, n // 10), rs.lognormal(6, 2, n - n // 10)]
+
+
+def bench_hlog(n_brentq=10 ** 4, n_newton=10 ** 6):
+    """Compare the vectorized Newton hlog engine to the per-event brentq path."""
+    print('hlog (b=500)')
+    x = _events(n_brentq)
+    t_brentq = _timeit(lambda: trans.hlog(x, method='brentq'), repeat=1)
+    print('  brentq          : {:>10.0f} events/s'.format(n_brentq / t_brentq))
+
+    x = _events(n_newton)
+    reference = trans.hlog(x, tol=1e-12)
+    for tol in (1e-2, 1e-6, 1e-10):
+        t_newton = _timeit(lambda: trans.hlog(x, tol=tol))
+        error = np.abs(trans.hlog(x, tol=tol) - reference).max()
+        print('  newton tol={:<5g}: {:>10.0f} events/s  (max abs error {:.1e})'.format(
+            tol, n_newton / t_newton, error))
+
+
+def bench_logicle(n=10 ** 7):
+    """Throughput of the vectorized logicle transform and of its inverse."""
+    print('logicle (T=2**18, W=0.5, M=4.5)')
+    x = _events(n)
+    trans.logicle(x[:10])  # Computes (and caches) the parameters and the table
+    t_forward = _timeit(lambda: trans.logicle(x), repeat=1)
+    y = trans.logicle(x)
+    t_inverse = _timeit(lambda: trans.logicle_inv(y), repeat=1)
+    error = (np.abs(trans.logicle_inv(y) - x) / np.maximum(1, np.abs(x))).max()
+    print('  forward         : {:>10.0f} events/s  (max round trip error {:.1e})'.format(
+        n / t_forward, error))
+    print('  inverse         : {:>10.0f} events/s'.format(n / t_inverse))
+
+
+def bench_spline(n=10 ** 6, n_channels=20):
+    """Compare batched spline evaluation to applying the spline column by column."""
+    from numpy.lib.shape_base import apply_along_axis
+
+    print('hlog spline ({} x {})'.format(n, n_channels))
+    x = np.asfortranarray(np.column_stack([_events(n, seed) for seed in range(n_channels)]))
+    transformation = trans.Transformation('hlog')
+    transformation.set_spline(x.min(), x.max())
+    spln = transformation.spln
+    t_columns = _timeit(lambda: apply_along_axis(spln, 0, x), repeat=1)
+    print('  apply_along_axis: {:>10.0f} events/s'.format(x.size / t_columns))
+    for n_jobs in (None, -1):
+        t_batched = _timeit(lambda: trans.eval_spline(spln, x, n_jobs=n_jobs), repeat=1)
+        error = np.abs(trans.eval_spline(spln, x) - apply_along_axis(spln, 0, x)).max()
+        print('  batched n_jobs={:<2}: {:>10.0f} events/s  (max abs difference {:.1e})'.format(
+            str(n_jobs), x.size / t_batched, error))
+
+
+if __name__ == '__main__':
+    bench_hlog()
+    bench_logicle()
+    bench_spline()
@@ -24,13 +24,9 @@ plate = plate.dropna()
 from FlowCytometryTools import ThresholdGate
 y2_gate = ThresholdGate(1000.0, 'Y2-A', region='above')
 
-# Plot
-plate = plate.gate(y2_gate)
-
-def calculate_median_Y2(well):
-    return well.data['Y2-A'].median()
-
-output = plate.apply(calculate_median_Y2)
+# Median of the gated events of each well, in the layout of the plate
+medians = plate.stats('Y2-A', stats=['median'], gate=y2_gate, output_format='layout')
+output = medians['Y2-A', 'median']
 
 
 plot_heat_map(output, include_values=True, show_colorbar=True,